@@ -0,0 +1,1890 @@
+"""마우스 사용 분석 엔진 (GUI/pynput 없음).
+
+mouse_analytics.py 의 집계·단계·히트맵·엑셀 저장 핵심을 Tk 창 밖으로 꺼낸 것이다.
+입력은 (종류, wall_ns, mono_ns, x, y, a, obj) 이벤트 튜플을 put() 으로 넣기만 하면 되고,
+결과는 단계 기록(steps) · 단계 히트맵 PNG · 통합문서(.xlsx) · 세션 저널로 나온다.
+화면 캡처도 grab 함수로 주입받으므로 디스플레이 없는 리눅스 CI 에서도 그대로 돈다.
+
+    engine = AnalyticsEngine(temp_dir)
+    engine.start("out.xlsx", monitors, recorded=[0])
+    engine.put((EVT_CLICK, time.time_ns(), time.monotonic_ns(), 100, 200, 1, None))
+    engine.finalize_step()
+    engine.export("stop"); engine.end_session(); engine.close()
+
+재생 드라이버: 기록된 세션 저널(.mjournal) 또는 events CSV(.csv / .csv.gz)를 N배속
+(0 = 최대 속도)으로 엔진에 흘려 넣고 초당 처리 이벤트 수를 잰다.
+
+    python analytics_engine.py replay <세션.mjournal|events.csv[.gz]> [--speed 0]
+                                      [--monitor 1920x1080] [--xlsx out.xlsx]
+
+세션 저널만으로(DB 없이) 세션 전체 클릭 히트맵 PNG 를 다시 만든다.
+
+    python analytics_engine.py heatmap <세션.mjournal> [--monitor N] [--out heatmap.png]
+"""
+
+import io
+import os
+import csv
+import gzip
+import json
+import math
+import time
+import queue
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+import datetime
+import zipfile
+import tempfile
+import threading
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, LineChart, Reference
+from openpyxl.drawing.image import Image as XLImage
+from openpyxl.worksheet.hyperlink import Hyperlink
+
+from event_store import (EventStore, JournalWriter, EVENT_DTYPE, EVENT_COLUMNS,
+                         EVT_CLICK, EVT_MOVE, EVT_SCROLL, BUTTON_CODES,
+                         EVENT_TYPE_NAMES, event_rows, minute_activity, open_journal,
+                         click_grid, MINUTE_ACTIVITY_MAX)
+from session_store import SessionStore
+
+# --- 상수 -------------------------------------------------------------------
+DEFAULT_DPI = 96             # 화면 크기 미입력 시 기본 DPI
+INCH_TO_MM = 25.4
+MM_TO_CM = 0.1
+SCROLL_STEP_MM = 15          # 스크롤 한 칸의 추정 이동 거리(mm)
+POINT_CAP = 5000             # 메모리에 두는 최근 이벤트 수(전체 기록은 세션 저널에)
+JOURNAL_EXT = ".mjournal"    # 세션 저널 확장자(통합문서와 같은 이름으로 옆에 저장)
+EVENTS_CHUNK = 65536         # events 시트에 쓸 때 한 번에 문자열로 바꾸는 이벤트 수
+EXCEL_MAX_ROWS = 1_048_576   # 엑셀 시트 최대 행 수(넘으면 events_1, events_2… 로 나눔)
+EVENTS_SIDECAR_ROWS = 3_000_000   # 이벤트가 이보다 많으면 시트 대신 압축 사이드카 파일로
+EVENTS_SIDECAR_FORMAT = "csv"     # 사이드카 형식: "csv"(.csv.gz) 또는 "ndjson"(.ndjson.gz)
+SIDECAR_GZIP_LEVEL = 1       # 사이드카 gzip 압축 수준(속도 우선)
+MOVE_MIN_INTERVAL_S = 0.10   # 이동 이벤트 코얼레싱: 최소 시간 간격
+MOVE_MIN_INTERVAL_NS = int(MOVE_MIN_INTERVAL_S * 1e9)
+MOVE_MIN_DIST_PX = 50        # 이동 이벤트 코얼레싱: 최소 이동 거리
+INGEST_BATCH_MAX = 4096      # 집계 스레드가 입력 큐에서 한 번에 꺼내는 최대 이벤트 수
+RENDER_WORKERS = max(1, os.cpu_count() or 1)   # 단계 히트맵 동시 렌더 스레드 수
+DESKTOP_GAP_RGB = (90, 90, 90)   # 가상 데스크톱 히트맵에서 모니터가 없는 빈 영역 색
+BG_HASH_SIZE = 16            # 배경 지각 해시 격자(16x16 = 256비트 차이 해시)
+BG_HASH_MAX_DIST = 8         # 해시 해밍 거리가 이 이하면 같은 화면으로 보고 배경을 재사용
+BG_LUMA_MAX_DIFF = 4.0       # … 단 평균 밝기 차(0~255)도 이 이하일 때만(단색 화면끼리 혼동 방지)
+BG_CACHE_RESIDENT = 2        # 메모리에 그대로 두는 배경 수(나머지는 디스크로 내려 memmap 으로)
+GAUSS_SIGMA = 30             # 히트맵 가우시안 블러 반경
+BLUR_FFT_COST = 0.9          # 가로: 탭 수 ≤ 이 값 × log2(FFT 길이)면 직접 합성곱, 초과면 FFT(_blur_method)
+BLUR_FFT_COST_T = 1.8        # 세로: 같은 기준(FFT 쪽에 전치 비용이 더 붙어 교차점이 높다)
+BLUR_FFT_ROWS = 64           # FFT 블러를 한 번에 처리하는 줄 수(복소 스펙트럼이 캐시에 들게)
+SPLAT_COST_RATIO = 16        # 점수×커널면적 < 이 값×화면면적이면 전체 블러 대신 스탬프 찍기
+HEAT_GRID_SCALE = 2          # 라이브 클릭 누적 격자 축소 배율(1=원본 해상도)
+EMBED_MAX_WIDTH = 1280       # 시트에 넣는 히트맵 미리보기 최대 폭(0=원본 그대로). 원본은 옆 파일로
+EMBED_FORMAT = "JPEG"        # 미리보기 인코딩: "JPEG" 또는 "PNG"
+EMBED_JPEG_QUALITY = 85
+# 히트맵 PNG 인코딩 프로필(Pillow save 인자). 녹화 중 렌더는 빠르게, 정지 후 최종 저장이
+# 끝나면 원본 PNG 를 가장 작게 다시 인코딩한다.
+PNG_PROFILES = {
+    "fastest": {"compress_level": 1},
+    "balanced": {"compress_level": 6},
+    "smallest": {"compress_level": 9, "optimize": True},
+}
+RENDER_PNG_PROFILE = "fastest"
+FINAL_PNG_PROFILE = "smallest"
+HEAT_ALPHA_GAMMA = 0.55      # 히트맵 알파 감마(작을수록 중간 밀도도 잘 보임)
+HEAT_MAX_ALPHA = 0.85        # 핫스팟 최대 불투명도
+BLUE_BASE_DEFAULT = 0.13     # 배경에 깔리는 옅은 파란 기운(0=없음) — UI 슬라이더로 조절
+BLUE_BASE_RGB = (70, 110, 225)
+
+
+_kernel_cache = {}
+
+
+def _gaussian_kernel(sigma):
+    """1D 가우시안 커널(float32, 합=1). 반경 3σ. sigma 별로 캐시한다."""
+    key = float(sigma)
+    k = _kernel_cache.get(key)
+    if k is None:
+        radius = int(max(1, round(3.0 * sigma)))
+        xs = np.arange(-radius, radius + 1, dtype=np.float32)
+        k = np.exp(-(xs * xs) / (2.0 * sigma * sigma)).astype(np.float32)
+        k /= k.sum()
+        _kernel_cache[key] = k
+    return k
+
+
+def _fast_fft_len(n):
+    """n 이상인 가장 작은 5-smooth 수(2·3·5 의 곱). FFT 가 빠른 길이."""
+    while True:
+        m = n
+        for p in (2, 3, 5):
+            while m % p == 0:
+                m //= p
+        if m == 1:
+            return n
+        n += 1
+
+
+def _blur_axis_direct(arr, k, axis):
+    """짧은 커널: 탭마다 배열 전체를 밀어 더한다(np.convolve mode='same' 과 동일, 0 패딩)."""
+    n = arr.shape[axis]
+    r = len(k) // 2
+    out = np.zeros_like(arr)
+    src = np.moveaxis(arr, axis, 0)
+    dst = np.moveaxis(out, axis, 0)
+    for i, w in enumerate(k):
+        off = i - r                      # 출력[j] += 입력[j - off] * k[i]
+        lo, hi = max(0, off), min(n, n + off)
+        if lo < hi:
+            dst[lo:hi] += w * src[lo - off:hi - off]
+    return out
+
+
+def _blur_axis_fft(arr, k, axis):
+    """긴 커널: 한 축 전체를 rfft 로 합성곱(0 패딩이라 'same' 과 수치적으로 동일).
+
+    rfft 는 메모리가 연속인 마지막 축에서 훨씬 빨라 세로 방향은 전치해 가로로 돌린다.
+    중간 복소 스펙트럼이 캐시를 넘지 않게 BLUR_FFT_ROWS 줄씩 나눠 처리한다."""
+    if axis == 0:
+        return np.ascontiguousarray(_blur_axis_fft(np.ascontiguousarray(arr.T), k, 1).T)
+    n = arr.shape[1]
+    r = len(k) // 2
+    size = _fast_fft_len(n + len(k) - 1)
+    kf = np.fft.rfft(k, size)
+    out = np.empty(arr.shape, dtype=np.float32)
+    for i in range(0, arr.shape[0], BLUR_FFT_ROWS):
+        spec = np.fft.rfft(arr[i:i + BLUR_FFT_ROWS], size, axis=1)
+        spec *= kf
+        out[i:i + BLUR_FFT_ROWS] = np.fft.irfft(spec, size, axis=1)[:, r:r + n]
+    return out
+
+
+def _blur_method(taps, n, axis=1):
+    """길이 n 인 축을 taps 탭 커널로 블러할 때 더 싼 방식('direct' | 'fft').
+
+    원소당 비용이 직접 합성곱은 탭 수에, FFT 는 log2(FFT 길이)에 비례한다. 960x540~4K,
+    sigma 1~30 에서 잰 교차점(탭 수 / log2(FFT 길이))은 가로 0.7~1.1(1080p 7탭: 직접
+    40ms / FFT 42ms, 13탭: 65ms / 43ms), 세로는 전치 비용 때문에 1.7~2.0(1080p 13탭:
+    40ms / 58ms, 25탭: 82ms / 57ms)이라 그 사이를 BLUR_FFT_COST(_T) 로 둔다."""
+    ratio = BLUR_FFT_COST if axis == 1 else BLUR_FFT_COST_T
+    return "direct" if taps <= ratio * np.log2(_fast_fft_len(n + taps - 1)) else "fft"
+
+
+def _gaussian_blur(arr, sigma, method="auto"):
+    """numpy 만으로 float 분리형 가우시안 블러.
+
+    Pillow 의 uint8 GaussianBlur 은 sigma 가 크면 희소한 클릭의 블러 값이 1 미만으로
+    뭉개져 전부 0 이 되어 히트맵이 텅 비는 버그가 있었다. float 로 블러해 작은 값도
+    보존한다(scipy.ndimage.gaussian_filter 과 동일한 효과, 의존성 없이).
+
+    예전엔 행/열마다 np.convolve 를 파이썬 루프로 돌려 4K 에서 수 초간 창이 멈췄다.
+    지금은 배열 전체를 축 단위로 한 번에 처리한다. method='auto' 면 축마다 커널 탭 수와
+    그 축 길이로 비용을 따져(_blur_method) 직접 합성곱과 FFT 중 싼 쪽을 고른다 — 둘 다
+    예전 루프 결과와 float 오차(1e-6) 범위에서 같다.
+    """
+    arr = np.asarray(arr, dtype=np.float32)
+    k = _gaussian_kernel(sigma)
+    out = arr
+    for axis in (1, 0):                  # 가로 방향, 세로 방향
+        how = _blur_method(len(k), arr.shape[axis], axis) if method == "auto" else method
+        blur_axis = _blur_axis_direct if how == "direct" else _blur_axis_fft
+        out = blur_axis(out, k, axis)
+    return out
+
+
+_stamp_cache = {}
+
+
+def _gaussian_stamp(sigma):
+    """2D 가우시안 스탬프(1D 커널의 외적). 분리형 블러와 같은 값이라 결과가 일치한다."""
+    key = float(sigma)
+    stamp = _stamp_cache.get(key)
+    if stamp is None:
+        k = _gaussian_kernel(sigma)
+        stamp = np.outer(k, k).astype(np.float32)
+        _stamp_cache[key] = stamp
+    return stamp
+
+
+def _splat_density(points, w, h, sigma, weights=None):
+    """클릭 위치마다 미리 계산한 스탬프를 더한다(가장자리는 잘라냄).
+
+    비용이 화면 면적이 아니라 '서로 다른 클릭 위치 수 × 커널 면적'에 비례한다.
+    같은 위치의 클릭은 묶어 가중치로 한 번만 찍는다(weights 를 주면 points 가 이미
+    서로 다르다고 보고 그대로 쓴다). 0 패딩 블러와 같은 결과."""
+    stamp = _gaussian_stamp(sigma)
+    r = stamp.shape[0] // 2
+    out = np.zeros((h, w), dtype=np.float32)
+    if len(points) == 0:
+        return out
+    if weights is None:
+        uniq, counts = np.unique(points, axis=0, return_counts=True)
+    else:
+        uniq, counts = np.asarray(points), np.asarray(weights)
+    for (x, y), n in zip(uniq.tolist(), counts.tolist()):
+        x0, x1 = max(0, x - r), min(w, x + r + 1)
+        y0, y1 = max(0, y - r), min(h, y + r + 1)
+        patch = stamp[y0 - y + r:y1 - y + r, x0 - x + r:x1 - x + r]
+        out[y0:y1, x0:x1] += patch if n == 1 else n * patch
+    return out
+
+
+def _grid_density(grid, sigma=GAUSS_SIGMA):
+    """클릭 누적 격자 -> 블러된 밀도(float32, 같은 크기). 방식은 비용으로 자동 선택.
+
+    클릭이 찍힌 칸이 적으면(칸 수 × 커널면적 < SPLAT_COST_RATIO × 격자면적) 스탬프
+    찍기, 많으면 격자 전체를 _gaussian_blur."""
+    h, w = grid.shape
+    ys, xs = np.nonzero(grid)
+    taps = len(_gaussian_kernel(sigma))
+    if len(xs) * taps * taps < SPLAT_COST_RATIO * w * h:
+        return _splat_density(np.stack([xs, ys], axis=1), w, h, sigma, weights=grid[ys, xs])
+    return _gaussian_blur(grid, sigma)
+
+
+def _new_heat_grid(w, h, scale=HEAT_GRID_SCALE):
+    """w×h 화면용 클릭 누적 격자(1/scale 해상도, float32 0)."""
+    return np.zeros((-(-h // scale), -(-w // scale)), dtype=np.float32)
+
+
+def _desktop_rect(monitors):
+    """모니터들을 모두 덮는 가상 데스크톱 사각형(x/y/width/height 객체)."""
+    x0 = min(m.x for m in monitors)
+    y0 = min(m.y for m in monitors)
+    x1 = max(m.x + m.width for m in monitors)
+    y1 = max(m.y + m.height for m in monitors)
+    return SimpleNamespace(x=x0, y=y0, width=x1 - x0, height=y1 - y0, name="가상 데스크톱")
+
+
+class _MonitorIndex:
+    """화면 좌표 -> 모니터 번호 조회표. 이벤트 묶음을 numpy 로 한 번에 나눈다.
+
+    모니터들의 x 경계·y 경계를 각각 정렬해 두고, 경계로 나뉜 칸마다 어느 모니터인지
+    표(table)로 미리 채운다. 좌표 하나는 정렬 경계 두 개에 searchsorted(O(log M)) 후
+    표 한 칸을 읽으면 끝나 모니터 수만큼 도는 반복이 없다. 세로로 쌓이거나 크기가 다른
+    배치도 그대로 된다(겹치는 모니터는 뒤의 것이 이김). ids 는 표에 넣을 모니터 번호."""
+
+    def __init__(self, monitors, ids=None):
+        ids = list(range(len(monitors))) if ids is None else list(ids)
+        self.xs = np.unique([v for m in monitors for v in (m.x, m.x + m.width)])
+        self.ys = np.unique([v for m in monitors for v in (m.y, m.y + m.height)])
+        self.table = np.full((max(0, len(self.xs) - 1), max(0, len(self.ys) - 1)), -1,
+                             dtype=np.int16)
+        size = max(ids, default=0) + 1
+        self.ox = np.zeros(size, dtype=np.int64)       # 모니터 번호 -> 원점
+        self.oy = np.zeros(size, dtype=np.int64)
+        for i, m in zip(ids, monitors):
+            x0, x1 = np.searchsorted(self.xs, (m.x, m.x + m.width))
+            y0, y1 = np.searchsorted(self.ys, (m.y, m.y + m.height))
+            self.table[x0:x1, y0:y1] = i
+            self.ox[i], self.oy[i] = m.x, m.y
+
+    def route(self, x, y):
+        """좌표 배열 -> (모니터 번호(-1=어느 모니터에도 없음), 모니터 안 x, 모니터 안 y)."""
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        ix = np.searchsorted(self.xs, x, side="right") - 1
+        iy = np.searchsorted(self.ys, y, side="right") - 1
+        ok = (ix >= 0) & (ix < self.table.shape[0]) & (iy >= 0) & (iy < self.table.shape[1])
+        mon = np.full(x.shape, -1, dtype=np.int16)
+        mon[ok] = self.table[ix[ok], iy[ok]]
+        safe = np.maximum(mon, 0)
+        return mon, x - self.ox[safe], y - self.oy[safe]
+
+
+def _turbo_rgb(t):
+    """[0,1] 2D 배열 -> (H,W,3) float RGB. Google 'Turbo' 컬러맵 다항식 근사.
+
+    jet 보다 색 띠(rings)가 적고 매끄러워 위치 표현이 자연스럽다. matplotlib 없이
+    numpy 만으로 계산한다(PyInstaller 패키징 경량/안정).
+    """
+    t = np.clip(t, 0.0, 1.0)
+    t2, t3, t4, t5 = t * t, t ** 3, t ** 4, t ** 5
+    r = 0.13572138 + 4.61539260 * t - 42.66032258 * t2 + 132.13108234 * t3 - 152.94239396 * t4 + 59.28637943 * t5
+    g = 0.09140261 + 2.19418839 * t + 4.84296658 * t2 - 14.18503333 * t3 + 4.27729857 * t4 + 2.82956604 * t5
+    b = 0.10667330 + 12.64194608 * t - 60.58204836 * t2 + 110.36276771 * t3 - 89.90310912 * t4 + 27.34824973 * t5
+    return np.clip(np.stack([r, g, b], axis=-1), 0.0, 1.0)
+
+
+HEAT_LEVELS_FINE = 4096      # 밀도 -> 단계 변환 전 1차 양자화 칸 수
+
+_heat_lut_cache = []
+
+
+def _heat_luts():
+    """히트맵 색표(처음 한 번만 계산해 캐시).
+
+    반환 (fine_to_level, turbo, alpha):
+      fine_to_level  uint8[HEAT_LEVELS_FINE]  정규화 밀도(4096칸) -> 256 단계
+      turbo          uint8[256, 3]            단계별 Turbo 색
+      alpha          float32[256]             단계별 알파(0~1), 최대 HEAT_MAX_ALPHA
+    단계는 알파 감마(HEAT_ALPHA_GAMMA) 공간에서 균등하게 나눈다. 감마가 0 근처에서
+    가팔라 선형으로 나누면 옅은 가장자리가 통째로 투명해지기 때문이다."""
+    if not _heat_lut_cache:
+        fine = np.arange(HEAT_LEVELS_FINE, dtype=np.float64) / (HEAT_LEVELS_FINE - 1)
+        fine_to_level = np.rint((fine ** HEAT_ALPHA_GAMMA) * 255).astype(np.uint8)
+        level = np.arange(256, dtype=np.float64) / 255.0         # = 밀도 ** 감마
+        norm = level ** (1.0 / HEAT_ALPHA_GAMMA)
+        turbo = (_turbo_rgb(norm) * 255).astype(np.uint8)
+        alpha = ((level * HEAT_MAX_ALPHA * 255).astype(np.uint8) / 255.0).astype(np.float32)
+        _heat_lut_cache.append((fine_to_level, turbo, alpha))
+    return _heat_lut_cache[0]
+
+
+def _composite_tables(base_a):
+    """밀도 단계 q 별 합성 계수: 결과 = 배경 × scale[q] + offset[q].
+
+    배경 위에 옅은 파란 베이스(알파 base_a), 그 위에 Turbo 히트맵(알파 a[q])을
+    차례로 alpha_composite 한 것과 같은 식을 단계마다 미리 풀어 둔 것이다."""
+    _, turbo, ah = _heat_luts()
+    ab = int(np.clip(base_a, 0.0, 1.0) * 255) / 255.0
+    blue = np.asarray(BLUE_BASE_RGB, dtype=np.float32)
+    scale = ((1.0 - ab) * (1.0 - ah)).astype(np.float32)
+    offset = (ab * (1.0 - ah))[:, None] * blue + ah[:, None] * turbo.astype(np.float32)
+    return scale, offset.astype(np.float32)
+
+
+def _density_levels(density, peak=None):
+    """밀도(float) -> 256 단계(uint8, 같은 크기). 피크로 정규화하고 _heat_luts 로 양자화.
+
+    peak 를 주면 그 값으로 정규화한다(여러 모니터 격자를 같은 눈금으로 이어 붙일 때)."""
+    if peak is None:
+        peak = float(density.max())
+    top = HEAT_LEVELS_FINE - 1
+    inv = top / peak if peak > 0 else 0.0         # 빈 세션 NaN 방지
+    fine_to_level = _heat_luts()[0]
+    fine = np.clip(density * inv + 0.5, 0, top).astype(np.uint16)
+    return fine_to_level[fine]
+
+
+def _composite_heatmap(density, background=None, base_a=BLUE_BASE_DEFAULT, size=None,
+                       peak=None):
+    """밀도(float) + 배경 -> 최종 RGB 이미지. 한 번의 numpy 패스로 합성한다.
+
+    밀도를 피크로 정규화해 uint8 단계로 양자화한 뒤 색/알파는 256칸 표(_heat_luts)에서
+    찾는다. 결과 크기는 배경 크기(없으면 size=(w, h), 둘 다 없으면 밀도 크기)이고,
+    밀도가 축소 격자면 단계 영상(uint8)만 쌍선형으로 늘린다. background 가 None 이면
+    흰 캔버스(결과가 단계별 색표 하나로 끝남), 아니면 그 RGB 버퍼에 행 묶음 단위로
+    바로 덮어써 전체 화면 float 사본을 만들지 않는다. peak 는 _density_levels 참고."""
+    if background is not None:
+        size = background.size
+    elif size is None:
+        size = (density.shape[1], density.shape[0])
+    w, h = size
+    levels = _density_levels(density, peak)
+    if levels.shape != (h, w):
+        levels = np.asarray(Image.fromarray(levels, mode="L").resize(
+            (w, h), Image.BILINEAR))
+    scale, offset = _composite_tables(base_a)
+    if background is None:
+        table = np.rint(255.0 * scale[:, None] + offset).clip(0, 255).astype(np.uint8)
+        out = np.empty((h, w, 3), dtype=np.uint8)
+    else:
+        out = np.array(background.convert("RGB"), dtype=np.uint8)
+    rows = max(1, (1 << 20) // max(1, w))      # 약 1M 픽셀씩 처리
+    for y0 in range(0, h, rows):
+        y1 = min(h, y0 + rows)
+        q = levels[y0:y1]
+        if background is None:
+            out[y0:y1] = table[q]
+        else:
+            blk = out[y0:y1] * scale[q][..., None] + offset[q]
+            np.rint(blk, out=blk)
+            out[y0:y1] = blk.clip(0, 255)
+    return Image.fromarray(out, mode="RGB")
+
+
+# 입력 큐 전용 이벤트 종류(EVT_* 와 겹치지 않게)
+_FLUSH = 0
+_KEY_DOWN = 100
+_KEY_UP = 101
+_STOP = -1                   # 집계 스레드 종료(AnalyticsEngine.close)
+
+
+def _save_png(img, path, profile, name=None):
+    """PNG_PROFILES[profile] 로 저장하고 인코딩 시간·크기를 로그에 남긴다."""
+    t0 = time.perf_counter()
+    img.save(path, format="PNG", **PNG_PROFILES[profile])
+    logging.info("PNG encoded (%s): %s, %.0f ms, %d KB", profile,
+                 name or os.path.basename(path),
+                 (time.perf_counter() - t0) * 1e3, os.path.getsize(path) // 1024)
+
+
+def _recompress_png(path, profile=FINAL_PNG_PROFILE):
+    """이미 저장된 PNG 를 다른 프로필로 다시 인코딩(임시 파일에 쓴 뒤 교체)."""
+    with Image.open(path) as img:
+        img.load()
+    tmp = path + ".tmp"
+    _save_png(img, tmp, profile, name=os.path.basename(path))
+    os.replace(tmp, path)
+    return path
+
+
+def _embed_bytes(img):
+    """시트에 넣을 미리보기 인코딩 바이트(EMBED_MAX_WIDTH 폭으로 축소, EMBED_FORMAT)."""
+    if EMBED_MAX_WIDTH and img.width > EMBED_MAX_WIDTH:
+        h = max(1, round(img.height * EMBED_MAX_WIDTH / img.width))
+        img = img.resize((EMBED_MAX_WIDTH, h), Image.BILINEAR, reducing_gap=2.0)
+    buf = io.BytesIO()
+    if EMBED_FORMAT == "JPEG":
+        img.convert("RGB").save(buf, format="JPEG", quality=EMBED_JPEG_QUALITY)
+    else:
+        img.save(buf, format="PNG", **PNG_PROFILES[RENDER_PNG_PROFILE])
+    return buf.getvalue()
+
+
+def _screen_hash(img):
+    """배경 지각 해시 -> (차이 해시 bool[BG_HASH_SIZE, BG_HASH_SIZE], 평균 밝기).
+
+    한 번의 BOX 축소로 (N+1)xN 흑백 썸네일을 만들고 가로 이웃 밝기 비교를 비트로 쓴다.
+    시계·커서처럼 작은 변화에는 그대로이고 다른 화면이면 절반 가까이 바뀐다."""
+    thumb = img.resize((BG_HASH_SIZE + 1, BG_HASH_SIZE), Image.BOX).convert("L")
+    g = np.asarray(thumb, dtype=np.int16)
+    return g[:, 1:] > g[:, :-1], float(g.mean())
+
+
+class _BackgroundCache:
+    """단계 배경 스크린샷 저장소. 같은(거의 같은) 화면은 한 번만 보관한다.
+
+    새 캡처의 해시(_screen_hash)가 기존 항목과 해밍 거리 BG_HASH_MAX_DIST 이내이고 평균
+    밝기도 비슷하면 그 항목의 키를 돌려준다 — 같은 화면에서 단계를 여러 번 나눠도 배경
+    메모리와 통합문서 속 배경 미리보기는 하나다. 최근에 쓴 BG_CACHE_RESIDENT 개만
+    메모리에 두고 나머지는 spill_dir 의 .npy 로 내렸다가 필요할 때 memmap 으로 다시
+    읽는다. 캡처 스레드와 렌더 스레드가 함께 쓰므로 내부에서 잠근다."""
+
+    def __init__(self, spill_dir, resident=BG_CACHE_RESIDENT):
+        self._dir = spill_dir
+        self._resident = max(1, resident)
+        self._lock = threading.Lock()
+        self._entries = {}       # 키 -> {"bits", "luma", "size", "image", "path", "embed"}
+        self._recent = []        # 최근에 쓴 키(끝이 최신). 앞에서부터 디스크로 내린다
+        self.reused = 0          # 기존 배경을 재사용한 캡처 수
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, img):
+        """캡처 이미지(RGB)를 넣고 키를 돌려준다. 거의 같은 화면이 있으면 그 키."""
+        bits, luma = _screen_hash(img)
+        with self._lock:
+            for key, e in self._entries.items():
+                if (e["size"] == img.size and abs(e["luma"] - luma) <= BG_LUMA_MAX_DIFF
+                        and np.count_nonzero(e["bits"] != bits) <= BG_HASH_MAX_DIST):
+                    self.reused += 1
+                    self._touch(key)
+                    logging.info("Background reused: %s", key)
+                    return key
+            key = f"{np.packbits(bits).tobytes().hex()[:16]}_{img.width}x{img.height}"
+            while key in self._entries:
+                key += "_"
+            self._entries[key] = {"bits": bits, "luma": luma, "size": img.size,
+                                  "image": img, "path": None, "embed": None}
+            self._touch(key)
+            return key
+
+    def get(self, key):
+        """키 -> RGB 이미지. 디스크로 내려간 항목이면 memmap 에서 다시 올린다."""
+        with self._lock:
+            e = self._entries[key]
+            if e["image"] is None:
+                e["image"] = Image.fromarray(np.load(e["path"], mmap_mode="r"), "RGB")
+            img = e["image"]
+            self._touch(key)
+            return img
+
+    def embed(self, key):
+        """배경 미리보기 바이트(_embed_bytes). 항목마다 한 번만 인코딩한다."""
+        with self._lock:
+            data = self._entries[key]["embed"]
+        if data is None:
+            data = _embed_bytes(self.get(key))
+            with self._lock:
+                self._entries[key]["embed"] = data
+        return data
+
+    def _touch(self, key):
+        if key in self._recent:
+            self._recent.remove(key)
+        self._recent.append(key)
+        while len(self._recent) > self._resident:
+            self._spill(self._recent.pop(0))
+
+    def _spill(self, key):
+        """항목 이미지를 .npy 로 내리고(처음 한 번만 쓴다) 메모리에서 놓는다."""
+        e = self._entries[key]
+        if e["image"] is None:
+            return
+        if e["path"] is None:
+            path = os.path.join(self._dir, f"bg_{key}.npy")
+            try:
+                np.save(path, np.asarray(e["image"]))
+            except OSError as err:
+                logging.error("Background spill failed (%s): %s", path, err)
+                return
+            e["path"] = path
+        e["image"] = None
+
+
+def _overlay_bytes(density, base_a, size):
+    """배경 없이 히트맵 층만(RGBA) 담은 미리보기 PNG 바이트. 배경 미리보기 위에 겹쳐 넣는다.
+
+    _composite_tables 의 '배경 × scale + offset' 을 알파 = 1 − scale, 색 = offset / 알파
+    인 층 하나로 옮긴 것이라 겹쳐 보이는 모습은 합성 이미지와 같다. 크기는 EMBED_MAX_WIDTH
+    에 맞춰 밀도 단계에서 바로 만든다."""
+    w, h = size
+    if EMBED_MAX_WIDTH and w > EMBED_MAX_WIDTH:
+        w, h = EMBED_MAX_WIDTH, max(1, round(h * EMBED_MAX_WIDTH / w))
+    levels = _density_levels(density)
+    if levels.shape != (h, w):
+        levels = np.asarray(Image.fromarray(levels, mode="L").resize(
+            (w, h), Image.BILINEAR))
+    scale, offset = _composite_tables(base_a)
+    alpha = 1.0 - scale
+    table = np.empty((256, 4), dtype=np.uint8)
+    table[:, :3] = np.rint(offset / np.maximum(alpha, 1e-6)[:, None]).clip(0, 255)
+    table[:, 3] = np.rint(alpha * 255).clip(0, 255)
+    img = Image.fromarray(levels, mode="L").convert("P")   # 단계 = 팔레트 색인(픽셀당 1바이트)
+    img.putpalette(table.tobytes(), rawmode="RGBA")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", **PNG_PROFILES[RENDER_PNG_PROFILE])
+    return buf.getvalue()
+
+
+def _render_step_png(grid, background, base_a, size, png_path, profile=RENDER_PNG_PROFILE,
+                     layered=False):
+    """단계 히트맵 렌더(작업 스레드용, Tk 접근 없음): 밀도 → 컬러맵/합성 → PNG.
+
+    원본 해상도 PNG 는 png_path 에 한 번만(PNG_PROFILES[profile]) 쓰고, 통합문서에 넣을
+    미리보기 인코딩 바이트(_embed_bytes)를 돌려준다. 저장할 때마다 원본을 다시 읽지 않는다.
+    layered=True 면 합성 미리보기 대신 히트맵 층(_overlay_bytes)만 돌려준다 — 배경
+    미리보기는 _BackgroundCache 가 배경마다 한 번 만든다."""
+    # 가우시안 밀도를 축소 격자에서 float 로 계산(희소 클릭도 보존). 클릭이 적으면
+    # 스탬프 찍기라 전체 격자 블러도 건너뛴다. 화면 크기로는 합성 단계에서 늘린다.
+    density = _grid_density(grid, GAUSS_SIGMA / HEAT_GRID_SCALE)
+    # 옅은 파란 베이스(슬라이더로 조절) + turbo 컬러맵(부드러운 그라데이션) + 밀도
+    # 비례 알파(빈 곳 투명, 핫스팟 진하게)를 배경 위에 한 번에 합성
+    combined = _composite_heatmap(density, background, base_a, size=size)
+    _save_png(combined, png_path, profile)
+    if layered:
+        return _overlay_bytes(density, base_a, combined.size)
+    return _embed_bytes(combined)
+
+
+def _render_desktop_png(grids, backgrounds, monitors, base_a, png_path,
+                        profile=RENDER_PNG_PROFILE):
+    """모니터별 격자를 가상 데스크톱 한 장으로 이어 붙인 히트맵(작업 스레드용).
+
+    grids/backgrounds/monitors 는 모두 모니터 번호를 키로 하는 dict(배경은 없을 수 있음).
+    밀도는 모니터마다 따로 구하되 전체 최대값으로 정규화해 화면끼리 색을 비교할 수 있고,
+    각 모니터 합성 결과를 제 위치에 붙인다. 모니터가 없는 빈 영역은 DESKTOP_GAP_RGB.
+    원본 해상도 PNG 를 png_path 에 쓰고 미리보기 바이트(_embed_bytes)를 돌려준다."""
+    desk = _desktop_rect([monitors[i] for i in grids])
+    densities = {i: _grid_density(g, GAUSS_SIGMA / HEAT_GRID_SCALE) for i, g in grids.items()}
+    peak = max((float(d.max()) for d in densities.values()), default=0.0)
+    canvas = Image.new("RGB", (desk.width, desk.height), DESKTOP_GAP_RGB)
+    for i, density in densities.items():
+        m = monitors[i]
+        img = _composite_heatmap(density, backgrounds.get(i), base_a,
+                                 size=(m.width, m.height), peak=peak)
+        if img.size != (m.width, m.height):          # 축소 보관한 배경(CAPTURE_MAX_WIDTH)
+            img = img.resize((m.width, m.height), Image.BILINEAR)
+        canvas.paste(img, (m.x - desk.x, m.y - desk.y))
+    _save_png(canvas, png_path, profile)
+    return _embed_bytes(canvas)
+
+
+# 직접 조립하는 워크시트 XML. 행/셀에 r(좌표) 속성을 두지 않아 조각을 어느 위치에
+# 이어 붙여도 그대로 유효하다(빈 칸도 <c/> 로 자리를 지킨다).
+_SHEET_XML_HEAD = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                   b'<worksheet xmlns="http://schemas.openxmlformats.org/'
+                   b'spreadsheetml/2006/main"><sheetData>')
+_SHEET_XML_TAIL = b"</sheetData></worksheet>"
+
+
+def _rows_xml(rows):
+    """행(값 튜플) 이터러블 -> <row> XML 바이트. 값은 int/float/str/None 만."""
+    out = []
+    for row in rows:
+        cells = []
+        for v in row:
+            if v is None or v == "":
+                cells.append("<c/>")
+            elif isinstance(v, str):
+                cells.append(f'<c t="inlineStr"><is><t>{escape(v)}</t></is></c>')
+            else:
+                cells.append(f"<c><v>{v}</v></c>")
+        out.append("<row>" + "".join(cells) + "</row>")
+    return "".join(out).encode("utf-8")
+
+
+def _write_events_parts(prefix, step_no, events):
+    """한 단계의 이벤트 행을 EVENTS_CHUNK 행씩 시트 XML 조각 파일들로 쓴다 -> 경로 목록."""
+    paths = []
+    for i in range(0, len(events), EVENTS_CHUNK):
+        path = f"{prefix}_{i // EVENTS_CHUNK}.xml"
+        with open(path, "wb") as f:
+            f.write(_rows_xml((step_no,) + row
+                              for row in event_rows(events[i:i + EVENTS_CHUNK])))
+        paths.append(path)
+    return paths
+
+
+def _shard_events(counts, max_rows=EXCEL_MAX_ROWS - 1):
+    """단계별 이벤트 수 -> 시트 샤드 목록(샤드마다 [(단계 순번, 조각 순번, 행 수), ...]).
+
+    조각(EVENTS_CHUNK 행)은 쪼개지 않고 머리글 한 줄을 뺀 max_rows 안에 차례로 채운다.
+    이벤트가 없어도 머리글만 있는 샤드 하나는 돌려준다."""
+    shards, cur, used = [], [], 0
+    for si, n in enumerate(counts):
+        for pi, lo in enumerate(range(0, n, EVENTS_CHUNK)):
+            rows = min(EVENTS_CHUNK, n - lo)
+            if cur and used + rows > max_rows:
+                shards.append(cur)
+                cur, used = [], 0
+            cur.append((si, pi, rows))
+            used += rows
+    if cur or not shards:
+        shards.append(cur)
+    return shards
+
+
+def _write_sidecar_part(path, step_no, events, fmt=EVENTS_SIDECAR_FORMAT):
+    """한 단계의 이벤트를 gzip 멤버 하나로 쓴다. gzip 멤버는 이어 붙여도 유효한 gzip 이라
+    완료된 단계 조각은 다음 저장에서 바이트 복사만 하면 된다."""
+    keys = ["step"] + EVENT_COLUMNS
+    with gzip.GzipFile(path, "wb", compresslevel=SIDECAR_GZIP_LEVEL, mtime=0) as gz:
+        for i in range(0, len(events), EVENTS_CHUNK):
+            rows = ((step_no,) + row for row in event_rows(events[i:i + EVENTS_CHUNK]))
+            buf = io.StringIO()
+            if fmt == "ndjson":
+                for row in rows:
+                    buf.write(json.dumps({k: (None if v == "" else v)
+                                          for k, v in zip(keys, row)}, ensure_ascii=False))
+                    buf.write("\n")
+            else:
+                csv.writer(buf).writerows(rows)
+            gz.write(buf.getvalue().encode("utf-8"))
+    return path
+
+
+def _sidecar_header(fmt=EVENTS_SIDECAR_FORMAT):
+    """사이드카 맨 앞 gzip 멤버(CSV 머리글). NDJSON 은 머리글이 없다."""
+    if fmt == "ndjson":
+        return b""
+    buf = io.StringIO()
+    csv.writer(buf).writerow(["step"] + EVENT_COLUMNS)
+    return gzip.compress(buf.getvalue().encode("utf-8"), SIDECAR_GZIP_LEVEL, mtime=0)
+
+
+def _sidecar_path(xlsx_path, fmt=EVENTS_SIDECAR_FORMAT):
+    return f"{os.path.splitext(xlsx_path)[0]}_events.{fmt}.gz"
+
+
+def _splice_sheet_parts(xlsx_path, parts):
+    """저장된 xlsx 의 워크시트 파일을 미리 만든 조각으로 바꿔 끼운다.
+
+    parts: {zip 내부 시트 경로: [bytes 또는 조각 파일 경로, ...]}. 나머지 항목은 그대로
+    옮겨 담는다. openpyxl 이 셀마다 XML 을 만드는 비용 없이 파일 복사 수준으로 끝난다.
+    내용이 같은 이미지(xl/media, 단계끼리 공유하는 배경 미리보기)는 하나만 남기고
+    드로잉 관계(rels)가 그 하나를 가리키게 고친다."""
+    tmp = xlsx_path + ".splice"
+    with zipfile.ZipFile(xlsx_path) as src, \
+            zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as dst:
+        first, alias = {}, {}                # 내용 해시 -> 남길 경로 / 중복 경로 -> 남길 경로
+        for info in src.infolist():
+            if info.filename.startswith("xl/media/"):
+                digest = hashlib.blake2b(src.read(info), digest_size=16).digest()
+                keep = first.setdefault(digest, info.filename)
+                if keep != info.filename:
+                    alias[info.filename] = keep
+        for info in src.infolist():
+            if info.filename in alias:
+                continue
+            chunks = parts.get(info.filename)
+            if chunks is None:
+                data = src.read(info)
+                if alias and info.filename.startswith("xl/drawings/_rels/"):
+                    for dup, keep in alias.items():
+                        data = data.replace(f'Target="/{dup}"'.encode(),
+                                            f'Target="/{keep}"'.encode())
+                if info.filename.startswith("xl/media/"):
+                    info.compress_type = zipfile.ZIP_STORED   # 이미 압축된 이미지
+                dst.writestr(info, data)
+                continue
+            with dst.open(info.filename, "w", force_zip64=True) as f:
+                f.write(_SHEET_XML_HEAD)
+                for chunk in chunks:
+                    if isinstance(chunk, bytes):
+                        f.write(chunk)
+                    else:
+                        with open(chunk, "rb") as part:
+                            shutil.copyfileobj(part, f, 1 << 20)
+                f.write(_SHEET_XML_TAIL)
+    os.replace(tmp, xlsx_path)
+
+
+class _BackgroundWorker:
+    """히트맵 렌더 / 엑셀 저장을 호출 스레드(Tk 메인 스레드 등) 밖에서 차례로 실행하는 작업 스레드.
+
+    submit() 한 작업은 넣은 순서대로(FIFO) 실행되고, 결과나 예외는 완료 큐에 쌓인다.
+    호출 쪽(Tk 앱이면 메인 스레드)이 poll() 을 주기적으로 불러 완료 콜백
+    (on_done(result, error))을 그 스레드에서 실행한다. coalesce 키가 같은 작업이 아직 시작 전이면 새로 쌓지 않고
+    그 작업의 인자만 최신 스냅샷으로 바꾼다(자동저장 중복 방지)."""
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._done = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._waiting = {}               # coalesce 키 -> 아직 시작 전인 작업
+        self._running = None             # 실행 중인 작업 이름
+        self._thread = threading.Thread(target=self._run, name="mouse-analytics-worker",
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, label, fn, *args, on_done=None, coalesce=None):
+        """작업 추가. 같은 coalesce 작업에 합쳐졌으면 False."""
+        with self._lock:
+            job = self._waiting.get(coalesce) if coalesce is not None else None
+            if job is not None:
+                job[2] = args
+                job[3] = on_done
+                return False
+            job = [label, fn, args, on_done, coalesce]
+            if coalesce is not None:
+                self._waiting[coalesce] = job
+        self._jobs.put(job)
+        return True
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            with self._lock:
+                label, fn, args, on_done, key = job
+                if key is not None:
+                    self._waiting.pop(key, None)
+                self._running = label
+            result, error = None, None
+            try:
+                result = fn(*args)
+            except Exception as e:
+                logging.error("Background job failed (%s): %s", label, e)
+                error = e
+            with self._lock:
+                self._running = None
+            self._done.put((on_done, result, error))
+            self._jobs.task_done()
+
+    def poll(self):
+        """완료된 작업의 콜백을 호출한다. poll 하는 스레드 하나에서만 부른다."""
+        while True:
+            try:
+                on_done, result, error = self._done.get_nowait()
+            except queue.Empty:
+                return
+            if on_done is not None:
+                try:
+                    on_done(result, error)
+                except Exception as e:
+                    logging.error("Background job callback failed: %s", e)
+
+    def status(self):
+        """(실행 중인 작업 이름 또는 None, 대기 중인 작업 수)."""
+        with self._lock:
+            return self._running, self._jobs.qsize()
+
+    def close(self):
+        """남은 작업을 모두 끝낸 뒤 스레드를 멈춘다(종료 시에만, 블로킹)."""
+        self._jobs.put(None)
+        self._thread.join()
+
+
+_COUNTED_BUTTONS = (BUTTON_CODES["left"], BUTTON_CODES["right"], BUTTON_CODES["middle"])
+
+
+def _new_click_counts():
+    """버튼 코드(BUTTON_CODES) -> 클릭 수. 좌/우/휠만 센다."""
+    return {code: 0 for code in _COUNTED_BUTTONS}
+
+
+class AnalyticsEngine:
+    """입력 집계 → 단계 → 히트맵 → 엑셀 저장까지의 핵심(GUI/pynput 없음).
+
+    이벤트는 put() 으로 입력 큐에 넣고, 집계 스레드가 묶음으로 비워 _apply_batch 로
+    반영한다. 단계 히트맵은 렌더 스레드 풀, 통합문서 쓰기는 작업 스레드(worker)가 맡는다.
+    worker 의 완료 콜백은 poll() 을 부른 스레드에서 돈다 — Tk 앱은 메인 스레드에서
+    주기적으로, 헤드리스 드라이버는 필요할 때 부르면 된다.
+
+    temp_dir 은 events 조각·배경 캐시가 쓰는 작업 폴더(호출 쪽이 정리). grab 은
+    모니터 -> RGB 이미지 캡처 함수(없으면 화면 배경 없이 흰 캔버스로 렌더)."""
+
+    def __init__(self, temp_dir, grab=None, point_cap=POINT_CAP):
+        self.temp_dir = temp_dir
+        self.grab = grab
+
+        # 공유 상태 (self.lock으로 보호)
+        self.lock = threading.Lock()
+        self._heat_grids = {}       # 모니터 번호 -> 현재 단계 클릭 누적 격자(1/HEAT_GRID_SCALE 해상도)
+        self.click_counts = _new_click_counts()
+        self.total_distance_mm = 0.0
+        self.scroll_count = 0       # 스크롤 칸 수(누적)
+        self.key_count = 0          # 키보드 입력 수(누적). 키 '내용'은 절대 저장하지 않음
+        self._keys_down = set()     # 오토리피트 중복 제거용 임시 보관(저장/기록 안 함)
+        self.events = EventStore(point_cap)   # 세션 최근 이벤트(열 저장 링 버퍼)
+        self._journal = None        # 세션 저널(JournalWriter). 모든 이벤트를 디스크에
+        # 이벤트는 세션 전체에서 0,1,2… 번호를 갖는다(링 버퍼 total = 저널 레코드 번호).
+        # 단계는 이 번호의 구간 rec["span"] = (start, end) 로만 기억한다(복사 없음).
+        self._step_event_start = 0  # 현재 단계의 첫 이벤트 번호
+        self._db = None             # 세션 DB(SessionStore). db_path 를 줬을 때만
+        self._db_session = None     # 현재 세션의 DB id
+
+        # 세션 상태
+        self.session_start = None
+        self.session_file = None
+        self.steps = []                  # 완료된 단계 기록(각 단계 = 히트맵 PNG + 통계)
+        self.step_no = 1                 # 현재 단계 번호
+        self._step_start = None          # 현재 단계 시작 시각
+        self._session_shot = None        # 현재 단계 배경 캡처(Future -> {모니터: 배경 저장소 키})
+
+        # 세션 시작 시 고정되는 값(집계 스레드가 읽음)
+        self.monitors = []               # 모니터 배치 전체(저널 헤더용)
+        self._active_monitor = None      # 기록 모니터(여럿이면 가상 데스크톱 사각형)
+        self._active_monitor_idx = 0     # 여럿이면 -1
+        self._rec_monitors = {}          # 기록하는 모니터(번호 -> 모니터)
+        self._monitor_index = _MonitorIndex([])   # 좌표 -> 모니터 조회표(start 때 채움)
+        self._ppm = DEFAULT_DPI / INCH_TO_MM   # pixels per mm
+        self.rec_key = True
+        self.heatmap_mode = "blank"      # "screenshot"(캡처 배경) 또는 "blank"(흰 캔버스)
+        self.blue_base = BLUE_BASE_DEFAULT
+
+        # 이동 이벤트 코얼레싱 상태
+        self._last_move_pos = None
+        self._last_sample_pos = None
+        self._last_sample_ns = 0
+        self._win_dist = 0.0
+
+        self._change_seq = 0             # 집계 상태가 바뀔 때마다 +1 (self.lock)
+        self._saved_seq = -1             # 마지막으로 저장을 마친 스냅샷의 _change_seq
+        self.dirty = False               # 마지막으로 통계를 읽은 뒤 새 이벤트가 집계됐는지
+
+        # 입력 파이프라인: put() -> 입력 큐 -> 집계 스레드(묶음 처리)
+        self._intake = queue.SimpleQueue()
+        self._ingest_stats = {"depth": 0, "max_depth": 0, "latency_ms": 0.0,
+                              "max_latency_ms": 0.0, "batches": 0, "events": 0}
+        self._ingest_thread = threading.Thread(
+            target=self._aggregate_loop, name="mouse-analytics-ingest", daemon=True)
+        self._ingest_thread.start()
+
+        # 렌더/저장 작업 스레드(호출 쪽은 스냅샷만 만들어 넘기고 완료 콜백만 받는다)
+        self.worker = _BackgroundWorker()
+        # 단계 히트맵은 코어 수만큼의 렌더 스레드에서 동시에(numpy FFT·PIL 인코딩은 GIL 을
+        # 놓는다). 격자/배경은 스레드끼리 그대로 공유해 복사·피클링이 없다.
+        self._render_pool = ThreadPoolExecutor(RENDER_WORKERS, thread_name_prefix="heatmap")
+        self._renders = []               # 아직 안 끝난 렌더 Future(진행 표시용)
+        # 배경 캡처 전용 스레드. 하나라 연속 단계 전환의 캡처도 순서대로 찍힌다.
+        self._capture_pool = ThreadPoolExecutor(1, thread_name_prefix="capture")
+        self._bg_cache = _BackgroundCache(temp_dir)   # 같은 화면 배경은 한 번만 보관
+
+    # --- 세션 ---------------------------------------------------------------
+    def start(self, session_file, monitors, recorded, ppm=DEFAULT_DPI / INCH_TO_MM,
+              rec_key=True, heatmap_mode="blank", db_path=None, session_start=None):
+        """새 세션을 시작한다. 카운터·단계·링 버퍼를 비우고 저널(과 DB)을 연다.
+
+        monitors 는 모니터 배치 전체(x/y/width/height 객체 목록), recorded 는 그중 기록할
+        모니터 번호들. 여럿이면 가상 데스크톱 전체를 하나의 세션으로 기록한다."""
+        self.session_start = session_start or datetime.datetime.now()
+        self.session_file = session_file
+        self.monitors = list(monitors)
+        self._rec_monitors = {i: self.monitors[i] for i in recorded}
+        if len(self._rec_monitors) == 1:
+            (self._active_monitor_idx, self._active_monitor), = self._rec_monitors.items()
+        else:
+            self._active_monitor_idx = -1
+            self._active_monitor = _desktop_rect(list(self._rec_monitors.values()))
+        self._monitor_index = _MonitorIndex(list(self._rec_monitors.values()),
+                                            self._rec_monitors.keys())
+        self._ppm = ppm
+        self.rec_key = rec_key
+        self.heatmap_mode = heatmap_mode
+
+        journal = self._open_journal()
+        db, db_session = self._open_db(db_path, journal)
+        with self.lock:
+            self._journal = journal
+            self._db, self._db_session = db, db_session
+            self._step_event_start = 0
+            self._heat_grids = self._new_heat_grids()
+            self.click_counts = _new_click_counts()
+            self.total_distance_mm = 0.0
+            self.scroll_count = 0
+            self.key_count = 0
+            self._keys_down.clear()
+            self.events.clear()
+            self._last_move_pos = None
+            self._last_sample_pos = None
+            self._last_sample_ns = 0
+            self._win_dist = 0.0
+            self._ingest_stats.update(depth=0, max_depth=0, latency_ms=0.0,
+                                      max_latency_ms=0.0, batches=0, events=0)
+            self._change_seq += 1
+        self.steps = []
+        self.step_no = 1
+        self._step_start = self.session_start
+        self._session_shot = None
+
+    def _open_journal(self):
+        """세션 저널을 만든다. 실패하면 None(링 버퍼만으로 계속 기록)."""
+        path = os.path.splitext(self.session_file)[0] + JOURNAL_EXT
+        meta = {
+            "session_start_ns": time.time_ns(),
+            "monitors": [[m.x, m.y, m.width, m.height] for m in self.monitors],
+            "active_monitor": self._active_monitor_idx,          # -1 = 모든 모니터
+            "recorded_monitors": sorted(self._rec_monitors),
+            "dpi": self._ppm * INCH_TO_MM,
+        }
+        try:
+            return JournalWriter(path, meta)
+        except OSError as e:
+            logging.error("Session journal open failed (%s): %s", path, e)
+            return None
+
+    def _close_journal(self):
+        with self.lock:
+            journal, self._journal = self._journal, None
+        if journal is not None:
+            try:
+                journal.close()
+            except OSError as e:
+                logging.error("Session journal close failed: %s", e)
+
+    def _open_db(self, path, journal):
+        """path 가 있으면 세션 DB 를 열고 세션 행을 만든다 -> (store, id)."""
+        if not path:
+            return None, None
+        try:
+            db = SessionStore(path)
+            sid = db.begin_session(
+                int(self.session_start.timestamp() * 1e9), self._active_monitor,
+                self._active_monitor_idx, self._ppm * INCH_TO_MM,
+                workbook=self.session_file,
+                journal=journal.path if journal is not None else None)
+            return db, sid
+        except (sqlite3.Error, OSError) as e:
+            logging.error("Session DB open failed (%s): %s", path, e)
+            return None, None
+
+    def _close_db(self):
+        with self.lock:
+            db, self._db = self._db, None
+        if db is not None:
+            try:
+                db.end_session(self._db_session, time.time_ns())
+                db.close()
+            except sqlite3.Error as e:
+                logging.error("Session DB close failed: %s", e)
+
+    def end_session(self):
+        """세션 저널과 DB 를 닫는다(단계 마무리·최종 저장을 건 뒤에)."""
+        self._close_journal()
+        self._close_db()
+
+    def sync(self):
+        """저널/DB 버퍼를 디스크로(1초마다 불러 비정상 종료 시 손실을 줄인다)."""
+        journal = self._journal
+        if journal is not None:
+            try:
+                journal.flush()
+            except OSError as e:
+                logging.error("Session journal flush failed: %s", e)
+        db = self._db
+        if db is not None:
+            try:
+                db.flush()                 # 입력이 뜸해도 DB_FLUSH_S 안에는 DB 에 반영
+            except sqlite3.Error as e:
+                logging.error("Session DB flush failed: %s", e)
+
+    @property
+    def active_monitor(self):
+        """기록 모니터(x/y/width/height). 여럿이면 가상 데스크톱 사각형."""
+        return self._active_monitor
+
+    @property
+    def active_monitor_index(self):
+        """기록 모니터 번호(여럿이면 -1)."""
+        return self._active_monitor_idx
+
+    @property
+    def ppm(self):
+        """이동 거리 환산에 쓰는 mm 당 픽셀 수."""
+        return self._ppm
+
+    def unsaved(self):
+        """마지막 저장 이후 집계 상태가 바뀌었는지(자동저장 건너뛰기 판단용)."""
+        with self.lock:
+            return self._change_seq != self._saved_seq
+
+    def poll(self):
+        """작업 스레드 완료 콜백을 이 스레드에서 실행한다."""
+        self.worker.poll()
+
+    def status(self):
+        """진행 표시용 (실행 중 작업 이름 또는 None, 대기 작업 수, 렌더 중인 단계 수)."""
+        running, waiting = self.worker.status()
+        self._renders = [f for f in self._renders if not f.done()]
+        return running, waiting, len(self._renders)
+
+    def close(self):
+        """남은 렌더/저장 작업을 모두 끝내고 스레드를 멈춘다(블로킹)."""
+        self.worker.close()
+        self._capture_pool.shutdown(wait=True)
+        self._render_pool.shutdown(wait=True)
+        self._intake.put((_STOP, 0, time.monotonic_ns(), 0, 0, 0, None))
+        self._ingest_thread.join()
+
+    def optimize_step_pngs(self):
+        """최종 저장 뒤에 단계 원본 PNG 를 FINAL_PNG_PROFILE 로 다시 인코딩한다.
+
+        통합문서에는 미리보기만 들어가므로 저장 완료 알림을 늦추지 않는다. 작업 스레드가
+        렌더가 끝나길 기다렸다가 단계들을 렌더 스레드 풀에서 동시에 처리한다."""
+        if FINAL_PNG_PROFILE == RENDER_PNG_PROFILE:
+            return
+        steps = list(self.steps)
+
+        def job():
+            paths = []
+            for rec in steps:
+                if rec.get("render") is not None:
+                    try:
+                        rec["render"].result()
+                    except Exception:
+                        continue                   # 실패는 저장 작업이 이미 기록함
+                if rec["png"] and os.path.exists(rec["png"]):
+                    paths.append(rec["png"])
+            for path, future in [(p, self._render_pool.submit(_recompress_png, p))
+                                 for p in paths]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error("PNG recompress failed (%s): %s", path, e)
+            return len(paths)
+
+        self.worker.submit("원본 PNG 최적화", job)
+
+    # --- 단계 ---------------------------------------------------------------
+    def capture_background(self, delay_s=0.0):
+        """현재 단계의 배경 캡처를 캡처 스레드에 건다(grab 이 없으면 아무것도 안 함).
+
+        단계 렌더가 결과를 기다리는 Future 를 돌려준다. delay_s 는 캡처 전에 기다리는
+        시간(그 사이 GUI 가 자기 창을 숨긴다)."""
+        self._session_shot = None
+        if self.grab is None:
+            return None
+        self._session_shot = self._capture_pool.submit(
+            self._capture_background, dict(self._rec_monitors), delay_s)
+        return self._session_shot
+
+    def _capture_background(self, monitors, delay_s=0.0):
+        """delay_s 뒤 모니터마다 캡처해 배경 저장소에 넣는다 -> {모니터 번호: 키}(캡처 스레드)."""
+        if delay_s > 0:
+            time.sleep(delay_s)            # 그 사이 GUI 가 자기 창을 숨긴다
+        return {i: self._bg_cache.add(self.grab(m)) for i, m in monitors.items()}
+
+    def _new_heat_grids(self):
+        """기록하는 모니터마다 빈 클릭 누적 격자."""
+        return {i: _new_heat_grid(m.width, m.height) for i, m in self._rec_monitors.items()}
+
+    def finalize_step(self, mode=None, base_a=None):
+        """현재 단계의 통계를 기록하고 카운터를 리셋한다. 히트맵은 렌더 스레드에 맡긴다.
+
+        이벤트는 세션 저장소(저널/링 버퍼)에 그대로 두고 단계에는 구간만 남긴다 — O(1).
+        mode/base_a 를 안 주면 heatmap_mode/blue_base. 단계 기록(dict)을 돌려준다."""
+        self.flush()           # 경계 이전 이벤트는 모두 이 단계로
+        with self.lock:
+            rec = {
+                "no": self.step_no, "png": None, "embed": None, "embed_bg": None,
+                "background": None,            # {모니터: 배경 저장소 키}(같은 화면이면 단계끼리 같다)
+                "left": self.click_counts[BUTTON_CODES["left"]],
+                "right": self.click_counts[BUTTON_CODES["right"]],
+                "middle": self.click_counts[BUTTON_CODES["middle"]],
+                "scroll": self.scroll_count,
+                "keys": self.key_count,
+                "distance_mm": self.total_distance_mm,
+                "span": (self._step_event_start, self.events.total),   # 이벤트 번호 [start, end)
+                "start": self._step_start or self.session_start,
+                "end": datetime.datetime.now(),
+            }
+            self._step_event_start = self.events.total
+            self.step_no += 1              # 구간을 자른 락 안에서 올려야 DB 행의 단계가 구간과 맞는다
+            self._step_start = rec["end"]
+            grids = self._heat_grids       # 누적 격자는 통째로 넘겨받고 새 격자로 교체(O(1))
+            self._heat_grids = self._new_heat_grids()
+            self.click_counts = _new_click_counts()
+            self.total_distance_mm = 0.0
+            self.scroll_count = 0
+            self.key_count = 0
+            self._keys_down.clear()
+            self._last_move_pos = None
+            self._last_sample_pos = None
+            self._last_sample_ns = 0
+            self._win_dist = 0.0
+            self._change_seq += 1
+        db = self._db
+        if db is not None:
+            try:
+                db.add_step(self._db_session, rec["no"], int(rec["start"].timestamp() * 1e9),
+                            int(rec["end"].timestamp() * 1e9), rec["left"], rec["right"],
+                            rec["middle"], rec["scroll"], rec["keys"], rec["distance_mm"])
+            except sqlite3.Error as e:
+                logging.error("Session DB step write failed: %s", e)
+        try:
+            self._build_heatmap_png(
+                mode or self.heatmap_mode, grids, rec,
+                png_path=f"{os.path.splitext(self.session_file)[0]}_step{rec['no']}.png",
+                base_a=base_a)
+        except Exception as e:
+            logging.error("Step %d heatmap build failed: %s", rec["no"], e)
+        self._session_shot = None        # 다음 단계 배경은 capture_background 로 새로
+        self.steps.append(rec)
+        return rec
+
+    # --- 입력 (아무 스레드) -------------------------------------------------
+    def put(self, event):
+        """(종류, wall_ns, mono_ns, x, y, a, obj) 이벤트 튜플 하나를 입력 큐에 넣는다.
+
+        종류는 EVT_CLICK(a = 버튼 코드) · EVT_MOVE · EVT_SCROLL(a = 칸 수) · _KEY_DOWN /
+        _KEY_UP(obj = 오토리피트 구분용 키 객체, 기록 안 함). 좌표는 화면(가상 데스크톱) 좌표."""
+        self._intake.put(event)
+
+    # --- 입력 집계 (집계 스레드) --------------------------------------------
+    def _aggregate_loop(self):
+        """입력 큐를 묶음으로 비워 _apply_batch 에 넘긴다. close() 가 _STOP 을 넣을 때까지 돈다."""
+        intake = self._intake
+        while True:
+            batch = [intake.get()]
+            while len(batch) < INGEST_BATCH_MAX:
+                try:
+                    batch.append(intake.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1][0] == _STOP       # close() 는 마지막에 넣는다
+            if stop:
+                batch.pop()
+                if not batch:
+                    return
+            try:
+                self._apply_batch(batch)
+            except Exception as e:
+                logging.error("Event batch failed (%d events): %s", len(batch), e)
+            now_ns = time.monotonic_ns()
+            with self.lock:
+                st = self._ingest_stats
+                st["batches"] += 1
+                st["events"] += len(batch)
+                st["depth"] = intake.qsize()
+                st["max_depth"] = max(st["max_depth"], st["depth"] + len(batch))
+                st["latency_ms"] = (now_ns - batch[0][2]) / 1e6    # 가장 오래된 이벤트 기준
+                st["max_latency_ms"] = max(st["max_latency_ms"], st["latency_ms"])
+            for ev in batch:
+                if ev[0] == _FLUSH:
+                    ev[6].set()
+            self.dirty = True              # GUI 는 이 표시를 보고 라벨을 다시 그린다(totals)
+            if stop:
+                return
+
+    def _apply_batch(self, batch):
+        """이벤트 묶음을 집계 상태에 반영한다. 이동 거리는 묶음 전체를 numpy 로 한 번에.
+
+        기록할 이벤트 행은 모아 두었다가 링 버퍼와 세션 저널에 배열 하나로 덧붙인다.
+        어느 모니터의 이벤트인지(기록 대상이 아니면 -1)와 모니터 안 좌표도 묶음 전체를
+        _MonitorIndex.route 로 한 번에 구한다."""
+        moves = [(ev[3], ev[4]) for ev in batch if ev[0] == EVT_MOVE]
+        mons, rxs, rys = (v.tolist() for v in self._monitor_index.route(
+            [ev[3] for ev in batch], [ev[4] for ev in batch]))
+        rows = []
+        with self.lock:
+            if any(ev[0] != _FLUSH for ev in batch):
+                self._change_seq += 1
+            if moves:
+                pts = np.asarray(moves, dtype=np.float64)
+                prev = self._last_move_pos if self._last_move_pos is not None else moves[0]
+                seg = np.hypot(*(np.diff(np.vstack((prev, pts)), axis=0).T))
+                self.total_distance_mm += float(seg.sum()) / self._ppm   # 거리는 매 이벤트 누적
+                self._last_move_pos = moves[-1]
+                seg = iter(seg.tolist())
+            grids = self._heat_grids
+            for (kind, wall_ns, mono_ns, x, y, a, obj), mon, rx, ry in zip(batch, mons, rxs, rys):
+                if kind == EVT_MOVE:
+                    self._win_dist += next(seg)
+                    if self._last_sample_pos is None:
+                        moved = float("inf")
+                    else:
+                        moved = math.hypot(x - self._last_sample_pos[0],
+                                           y - self._last_sample_pos[1])
+                    # 코얼레싱: 100ms 경과 또는 50px 이동 시에만 샘플 1행 기록
+                    if ((mono_ns - self._last_sample_ns) >= MOVE_MIN_INTERVAL_NS
+                            or moved >= MOVE_MIN_DIST_PX):
+                        if mon >= 0:
+                            rows.append((wall_ns, mono_ns, EVT_MOVE, 0, mon,
+                                         rx, ry, self._win_dist))
+                        self._last_sample_pos = (x, y)
+                        self._last_sample_ns = mono_ns
+                        self._win_dist = 0.0
+                elif kind == EVT_CLICK or kind == EVT_SCROLL:
+                    if mon < 0:
+                        continue
+                    if kind == EVT_CLICK:
+                        if a in self.click_counts:
+                            self.click_counts[a] += 1
+                        grids[mon][ry // HEAT_GRID_SCALE, rx // HEAT_GRID_SCALE] += 1
+                        rows.append((wall_ns, mono_ns, EVT_CLICK, a, mon, rx, ry, np.nan))
+                    else:
+                        self.scroll_count += a
+                        rows.append((wall_ns, mono_ns, EVT_SCROLL, 0, mon, rx, ry, np.nan))
+                elif kind == _KEY_DOWN:
+                    if obj not in self._keys_down:     # 누르고 있는 동안의 오토리피트 무시
+                        self._keys_down.add(obj)
+                        self.key_count += 1
+                elif kind == _KEY_UP:
+                    self._keys_down.discard(obj)
+            if rows:
+                records = np.array(rows, dtype=EVENT_DTYPE)
+                self.events.extend(records)
+                if self._journal is not None:
+                    try:
+                        self._journal.append(records)
+                    except OSError as e:       # 디스크 가득 참 등: 링 버퍼만으로 계속
+                        logging.error("Session journal write failed, disabled: %s", e)
+                        self._journal = None
+                if self._db is not None:
+                    try:
+                        self._db.add_events(self._db_session, self.step_no, records)
+                    except sqlite3.Error as e:
+                        logging.error("Session DB write failed, disabled: %s", e)
+                        self._db = None
+
+    def flush(self, timeout=1.0):
+        """지금까지 큐에 들어온 이벤트가 모두 집계될 때까지 기다린다(단계 경계용)."""
+        done = threading.Event()
+        self._intake.put((_FLUSH, 0, time.monotonic_ns(), 0, 0, 0, done))
+        if not done.wait(timeout):
+            logging.warning("Event intake flush timed out (depth %d)", self._intake.qsize())
+
+    def ingest_stats(self):
+        """입력 파이프라인 지표 사본: 큐 깊이, 마지막/최대 처리 지연(ms), 묶음/이벤트 수."""
+        with self.lock:
+            return dict(self._ingest_stats)
+
+    def totals(self):
+        """현재 단계 통계 사본(라벨 표시용) -> (좌, 우, 휠 클릭, 이동 mm, 스크롤, 키)."""
+        with self.lock:
+            self.dirty = False
+            c = self.click_counts
+            return (c[BUTTON_CODES["left"]], c[BUTTON_CODES["right"]], c[BUTTON_CODES["middle"]],
+                    self.total_distance_mm, self.scroll_count, self.key_count)
+
+    @staticmethod
+    def fmt_hms(seconds):
+        """초 -> 'HH:MM:SS'."""
+        s = int(seconds)
+        return f"{s // 3600:02d}:{(s % 3600) // 60:02d}:{s % 60:02d}"
+
+    # --- 히트맵 -------------------------------------------------------------
+    def _build_heatmap_png(self, mode, grids, rec, png_path=None, base_a=None):
+        """클릭 위치 히트맵 PNG 생성 (mouse_click_move2.py:275-324 재사용).
+
+        grids 는 녹화 중 집계 스레드(_apply_batch)가 채운 모니터별 클릭 누적 격자({모니터 번호: 격자}).
+        배경 캡처(Future)와 옵션은 여기(호출 스레드)서 정하고, 블러·컬러맵·인코딩은 작업
+        스레드가 해서 끝나면 rec["png"](원본 해상도 파일)과 rec["embed"](시트용 미리보기
+        바이트)를 채운다. 렌더는 렌더 스레드 풀에서 단계끼리 동시에 돌고, rec["render"]
+        (Future)를 엑셀 저장 작업이 단계 순서대로 기다린다.
+        mode='screenshot'면 화면 캡처 위에, 'blank'면 흰 캔버스 위에 합성한다. 모니터가
+        여럿이면 가상 데스크톱 한 장으로 이어 붙인다(_render_desktop_png).
+        png_path 는 원본 PNG 위치(단계마다 통합문서 옆 <세션>_stepN.png).
+        """
+        monitors = {i: self.monitors[i] for i in grids}
+        for m in monitors.values():
+            if m.width <= 0 or m.height <= 0:   # 방어: 잘못된 화면 크기
+                raise ValueError(f"화면 크기가 잘못됨({m.width}x{m.height}) — 모니터 선택을 확인하세요.")
+        if mode == "screenshot" and self._session_shot is not None:
+            # 단계 시작 때 걸어 둔 배경 캡처(Future). 아직 찍는 중이면 렌더 스레드가 기다린다.
+            # 결과 이미지는 단계가 바뀌면 새 Future 로 교체될 뿐 수정되지 않는다.
+            shot = self._session_shot
+        elif mode == "screenshot" and self.grab is not None:
+            # 세션 캡처가 없으면(녹화 중이 아닐 때 등) 지금 화면을 캡처 스레드에서 찍는다.
+            shot = self._capture_pool.submit(self._capture_background, monitors)
+        else:
+            shot = None                    # 흰 캔버스(합성 단계에서 색표만으로 처리)
+
+        base_a = self.blue_base if base_a is None else base_a
+        png_path = png_path or os.path.join(self.temp_dir, "heatmap.png")
+
+        cache = self._bg_cache
+
+        def job():
+            backgrounds = {}
+            if shot is not None:
+                try:
+                    rec["background"] = shot.result()
+                    backgrounds = {i: cache.get(k) for i, k in rec["background"].items()}
+                except Exception as e:
+                    logging.error("Step %s background capture failed: %s", rec["no"], e)
+            if len(grids) == 1:
+                (i, grid), = grids.items()
+                background = backgrounds.get(i)            # 그 크기가 곧 렌더 크기
+                rec["embed"] = _render_step_png(
+                    grid, background, base_a, (monitors[i].width, monitors[i].height),
+                    png_path, layered=background is not None)
+                if background is not None:
+                    rec["embed_bg"] = cache.embed(rec["background"][i])
+            else:
+                rec["embed"] = _render_desktop_png(grids, backgrounds, monitors, base_a, png_path)
+            rec["png"] = png_path
+            return png_path
+
+        rec["render"] = self._render_pool.submit(job)
+        self._renders.append(rec["render"])
+
+    # --- 엑셀 저장 ----------------------------------------------------------
+    def export(self, reason, on_done=None):
+        """summary(단계별 표) + 단계별 히트맵 시트(step1, step2…) + events 를 session_file 에 저장.
+
+        호출 스레드는 스냅샷만 만들고 실제 쓰기는 작업 스레드가 한다. 자동저장은 아직
+        시작 전인 자동저장이 있으면 그 스냅샷만 최신으로 바꿔 하나로 합친다. 저장이
+        끝나면 on_done(백업 경로 또는 None, 예외 또는 None) 을 poll() 스레드에서 부른다."""
+
+        with self.lock:                                  # 진행 중인 현재 단계 스냅샷
+            seq = self._change_seq
+            cur = {
+                "left": self.click_counts[BUTTON_CODES["left"]],
+                "right": self.click_counts[BUTTON_CODES["right"]],
+                "middle": self.click_counts[BUTTON_CODES["middle"]],
+                "scroll": self.scroll_count,
+                "keys": self.key_count,
+                "distance_mm": self.total_distance_mm,
+                "n_events": self.events.total - self._step_event_start,
+            }
+            # 저널이 없을 때(열기/쓰기 실패)만 링 버퍼에 남은 최근 이벤트로 대신한다
+            ring = self.events.since(0) if self._journal is None else None
+        journal = self._journal
+        if journal is not None:
+            try:
+                journal.flush()            # 완료된 단계 구간은 작업 스레드가 파일에서 읽는다
+            except OSError as e:
+                logging.error("Session journal flush failed: %s", e)
+        snap = {
+            "reason": reason,
+            "file": self.session_file,
+            "steps": list(self.steps),                 # 완료된 단계(png 는 앞선 렌더 작업이 채움)
+            "cur": cur,
+            "start": self.session_start,
+            "end": datetime.datetime.now(),
+            "monitor": self._active_monitor,
+            "mon_idx": self._active_monitor_idx,
+            "dpi": self._ppm * INCH_TO_MM,
+            "bg": "화면 캡처" if self.heatmap_mode == "screenshot" else "빈 캔버스",
+            "rec_key": self.rec_key,
+            "journal": journal.path if journal is not None else None,
+            "ring": ring,
+            "parts": os.path.join(self.temp_dir, "parts",
+                                  os.path.splitext(os.path.basename(self.session_file))[0]),
+        }
+        self.worker.submit(
+            "자동저장" if reason == "autosave" else "엑셀 저장", self._write_workbook, snap,
+            on_done=lambda result, error: self._on_export_done(result, error, on_done, seq),
+            coalesce="autosave" if reason == "autosave" else None)
+
+    def _write_workbook(self, snap):
+        """스냅샷으로 통합문서를 만들어 저장(작업 스레드). 잠겨서 백업했으면 그 경로를 돌려준다.
+
+        write_only 통합문서라 행은 만들자마자 임시 파일로 흘려보낸다 — 세션이 길어져도
+        셀 객체가 메모리에 쌓이지 않는다(대신 시트는 위에서 아래로 한 번에 써야 한다)."""
+        for rec in snap["steps"]:                       # 단계 순서대로 렌더 결과를 모은다
+            render = rec.get("render")
+            if render is not None:
+                try:
+                    render.result()
+                except Exception as e:
+                    logging.error("Step %d heatmap render failed: %s", rec["no"], e)
+        wb = openpyxl.Workbook(write_only=True)
+        layout = self._events_layout(snap["steps"], snap["journal"], snap["file"], snap["ring"])
+        self._write_summary_sheet(wb, snap, layout)
+        self._write_timeline_sheet(wb, snap["steps"], layout)
+        for rec in snap["steps"]:
+            ws = wb.create_sheet(f"step{rec['no']}")
+            if rec["png"] and os.path.exists(rec["png"]):     # 원본 해상도 파일 링크
+                link = WriteOnlyCell(ws, value=f"원본 해상도: {os.path.basename(rec['png'])}")
+                link.hyperlink = os.path.basename(rec["png"])
+                ws.append([link])
+            if rec["embed"]:
+                try:                       # 렌더 때 인코딩해 둔 미리보기 바이트를 그대로.
+                    if rec.get("embed_bg"):    # 배경 미리보기 위에 히트맵 층을 겹친다
+                        ws.add_image(XLImage(io.BytesIO(rec["embed_bg"])), "A2")
+                    ws.add_image(XLImage(io.BytesIO(rec["embed"])), "A2")
+                except Exception as e:
+                    logging.error("Embed step%d image failed: %s", rec["no"], e)
+        parts = self._write_events(wb, snap["steps"], layout, snap["parts"])
+        return self._atomic_save(wb, snap["file"], snap["reason"], parts)
+
+    def _on_export_done(self, backup, error, on_done, seq):
+        """저장 완료 콜백(poll 스레드): 저장을 마친 변경 번호를 남기고 on_done 에 넘긴다."""
+        if error is None:
+            self._saved_seq = max(self._saved_seq, seq)
+        if on_done is not None:
+            on_done(backup, error)
+
+    def _write_summary_sheet(self, wb, snap, layout=None):
+        ws = wb.create_sheet("summary")
+        ws.column_dimensions["A"].width = 14          # write_only: 행보다 먼저 정한다
+        for col in "BCDEFGHI":
+            ws.column_dimensions[col].width = 10
+        steps, cur, monitor = snap["steps"], snap["cur"], snap["monitor"]
+        start, end = snap["start"], snap["end"]
+        cur_active = (cur["left"] + cur["right"] + cur["middle"] + cur["n_events"]) > 0
+
+        def bold(values):
+            out = []
+            for v in values:
+                cell = WriteOnlyCell(ws, value=v)
+                cell.font = openpyxl.styles.Font(bold=True)
+                out.append(cell)
+            return out
+
+        info = [
+            ("세션 시작", start.strftime("%Y-%m-%d %H:%M:%S")),
+            ("세션 종료", end.strftime("%Y-%m-%d %H:%M:%S")),
+            ("지속 시간", self.fmt_hms((end - start).total_seconds())),
+            ("모니터", f"{'전체(가상 데스크톱)' if snap['mon_idx'] < 0 else snap['mon_idx']}: "
+                      f"{monitor.width}x{monitor.height} at ({monitor.x},{monitor.y})"),
+            ("사용 DPI", round(snap["dpi"], 1)),
+            ("히트맵 배경", snap["bg"]),
+            ("키보드 기록", "켜짐(횟수만)" if snap["rec_key"] else "꺼짐"),
+            ("단계 수", len(steps) + (1 if cur_active else 0)),
+        ]
+        for label, value in info:
+            ws.append([label, value])
+        ws.append([])                                   # 빈 줄
+        ws.append(bold(["단계", "좌클릭", "우클릭", "휠클릭", "총클릭",
+                        "스크롤(칸)", "키입력", "이동(cm)", "지속"]))
+        header_row = len(info) + 2                      # 차트가 참조할 단계 표 위치
+
+        tot = {"left": 0, "right": 0, "middle": 0, "scroll": 0, "keys": 0, "dist": 0.0}
+
+        def step_row(label, left, right, middle, scroll, keys, dist_mm, dur):
+            return [label, left, right, middle, left + right + middle,
+                    scroll, keys, round(dist_mm * MM_TO_CM, 1), dur]
+
+        for rec in steps:
+            ws.append(step_row(rec["no"], rec["left"], rec["right"], rec["middle"],
+                               rec["scroll"], rec["keys"], rec["distance_mm"],
+                               self.fmt_hms((rec["end"] - rec["start"]).total_seconds())))
+            tot["left"] += rec["left"]; tot["right"] += rec["right"]
+            tot["middle"] += rec["middle"]; tot["scroll"] += rec["scroll"]
+            tot["keys"] += rec["keys"]; tot["dist"] += rec["distance_mm"]
+        if cur_active:
+            ws.append(step_row("현재(진행중)", cur["left"], cur["right"], cur["middle"],
+                               cur["scroll"], cur["keys"], cur["distance_mm"], ""))
+            tot["left"] += cur["left"]; tot["right"] += cur["right"]
+            tot["middle"] += cur["middle"]; tot["scroll"] += cur["scroll"]
+            tot["keys"] += cur["keys"]; tot["dist"] += cur["distance_mm"]
+
+        ws.append(bold(step_row("합계", tot["left"], tot["right"], tot["middle"],
+                                tot["scroll"], tot["keys"], tot["dist"], "")))
+        n_rows = len(steps) + (1 if cur_active else 0)
+        if n_rows:
+            self._add_step_charts(ws, header_row, n_rows)
+
+        if layout is None:
+            return
+        ws.append([])                                   # 이벤트 기록 위치(시트 샤드/사이드카)
+        ws.append(bold(["이벤트 기록", "단계", "이벤트 수"]))
+        for name, first, last, rows in self._events_targets(steps, layout):
+            link = WriteOnlyCell(ws, value=name)
+            if layout["sidecar"]:
+                link.hyperlink = name                   # 통합문서 옆 파일(상대 경로)
+            else:
+                link.hyperlink = Hyperlink(ref="", location=f"'{name}'!A1")
+            link.font = openpyxl.styles.Font(color="0563C1", underline="single")
+            ws.append([link, f"{first}–{last}" if first != last else first, rows])
+
+    @staticmethod
+    def _add_step_charts(ws, header_row, n_rows):
+        """단계 표 셀을 참조하는 엑셀 차트(단계별 클릭 누적 막대, 단계별 이동 거리)."""
+        cats = Reference(ws, min_col=1, min_row=header_row + 1, max_row=header_row + n_rows)
+
+        clicks = BarChart()
+        clicks.type, clicks.grouping, clicks.overlap = "col", "stacked", 100
+        clicks.title, clicks.y_axis.title = "단계별 클릭", "클릭"
+        clicks.add_data(Reference(ws, min_col=2, max_col=4, min_row=header_row,
+                                  max_row=header_row + n_rows), titles_from_data=True)
+        clicks.set_categories(cats)
+        ws.add_chart(clicks, "K2")
+
+        dist = BarChart()
+        dist.type = "col"
+        dist.title, dist.y_axis.title = "단계별 이동 거리", "cm"
+        dist.legend = None
+        dist.add_data(Reference(ws, min_col=8, min_row=header_row,
+                                max_row=header_row + n_rows), titles_from_data=True)
+        dist.set_categories(cats)
+        ws.add_chart(dist, "K18")
+
+    @staticmethod
+    def _write_timeline_sheet(wb, steps, layout):
+        """완료된 단계 이벤트의 분당 활동량 표 + 꺾은선 차트(timeline 시트).
+
+        단계별 분당 집계(minute_activity)는 단계가 바뀌지 않으므로 rec["minutes"] 에
+        한 번만 계산해 두고, 저장 때는 세션 구간으로 이어 붙이기만 한다."""
+        per_step = []
+        for rec, events in zip(steps, layout["events"]):
+            if rec.get("minutes") is None:
+                rec["minutes"] = minute_activity(events)
+            if rec["minutes"][0] is not None:
+                per_step.append(rec["minutes"])
+        ws = wb.create_sheet("timeline")
+        ws.column_dimensions["A"].width = 16
+        if not per_step:
+            ws.append(["기록된 이벤트 없음"])
+            return
+        m0 = min(m[0] for m in per_step)
+        n = min(max(m[0] + len(m[1]) for m in per_step) - m0, MINUTE_ACTIVITY_MAX)
+        clicks, scrolls, dist = np.zeros(n, np.int64), np.zeros(n, np.int64), np.zeros(n)
+        for first, c, sc, d in per_step:
+            lo = min(first - m0, n - 1)        # 단계 사이에 시계가 크게 튄 경우도 n 안에서
+            k = min(len(c), n - lo)
+            clicks[lo:lo + k] += c[:k]
+            scrolls[lo:lo + k] += sc[:k]
+            dist[lo:lo + k] += d[:k]
+            clicks[-1] += c[k:].sum()          # 넘친 분은 minute_activity 처럼 마지막 분에
+            scrolls[-1] += sc[k:].sum()
+            dist[-1] += d[k:].sum()
+
+        header = [WriteOnlyCell(ws, value=v) for v in ("시각(분)", "클릭", "스크롤", "이동(px)")]
+        for cell in header:
+            cell.font = openpyxl.styles.Font(bold=True)
+        ws.append(header)
+        start = datetime.datetime.fromtimestamp(m0 * 60)
+        fmt = "%H:%M" if n <= 24 * 60 else "%m-%d %H:%M"
+        for i, (c, sc, d) in enumerate(zip(clicks.tolist(), scrolls.tolist(),
+                                           dist.round(1).tolist())):
+            ws.append([(start + datetime.timedelta(minutes=i)).strftime(fmt), c, sc, d])
+
+        chart = LineChart()
+        chart.title, chart.y_axis.title = "분당 활동", "클릭 / 스크롤"
+        chart.add_data(Reference(ws, min_col=2, max_col=3, min_row=1, max_row=n + 1),
+                       titles_from_data=True)
+        chart.set_categories(Reference(ws, min_col=1, min_row=2, max_row=n + 1))
+        moved = LineChart()                             # 이동 거리는 보조 축
+        moved.add_data(Reference(ws, min_col=4, min_row=1, max_row=n + 1),
+                       titles_from_data=True)
+        moved.y_axis.axId, moved.y_axis.title = 200, "이동(px)"
+        moved.y_axis.crosses = "max"
+        chart += moved
+        chart.width, chart.height = 24, 9
+        ws.add_chart(chart, "F2")
+
+    @staticmethod
+    def _events_layout(steps, journal_path=None, xlsx_path=None, ring=None):
+        """이벤트를 어디에 쓸지 정한다(요약 시트의 링크와 실제 쓰기가 같은 배치를 쓴다).
+
+        단계별 이벤트는 rec["span"] 구간을 세션 저널 memmap 에서 잘라 본다(복사 없음).
+        저널이 없거나 구간이 저널 밖이면 ring = (첫 번호, 링 버퍼 사본)에 남은 부분만
+        쓴다. 합계가 EVENTS_SIDECAR_ROWS 를 넘으면 시트 대신 사이드카 파일, 아니면
+        시트 샤드."""
+        records = None
+        if journal_path and os.path.exists(journal_path):
+            try:
+                records = open_journal(journal_path)[1]
+            except (OSError, ValueError) as e:
+                logging.error("Session journal read failed (%s): %s", journal_path, e)
+        empty = np.zeros(0, dtype=EVENT_DTYPE)
+        events = []
+        for rec in steps:
+            lo, hi = rec["span"]
+            if records is not None and hi <= len(records):
+                events.append(records[lo:hi])
+            elif ring is not None:
+                base, kept = ring
+                events.append(kept[max(lo - base, 0):max(hi - base, 0)])
+            else:
+                events.append(empty)
+        total = sum(len(ev) for ev in events)
+        sidecar = None
+        if total > EVENTS_SIDECAR_ROWS and xlsx_path:
+            sidecar = _sidecar_path(xlsx_path)
+        return {"events": events, "total": total, "sidecar": sidecar,
+                "shards": None if sidecar else _shard_events([len(ev) for ev in events])}
+
+    @staticmethod
+    def _events_targets(steps, layout):
+        """요약 시트에 적을 (시트/파일 이름, 첫 단계, 끝 단계, 이벤트 수) 목록."""
+        if layout["sidecar"]:
+            nos = [rec["no"] for rec in steps] or [""]
+            return [(os.path.basename(layout["sidecar"]), nos[0], nos[-1], layout["total"])]
+        shards = layout["shards"]
+        out = []
+        for i, shard in enumerate(shards, start=1):
+            name = "events" if len(shards) == 1 else f"events_{i}"
+            nos = [steps[si]["no"] for si, _, _ in shard] or [""]
+            out.append((name, nos[0], nos[-1], sum(rows for _, _, rows in shard)))
+        return out
+
+    @staticmethod
+    def _write_events(wb, steps, layout, part_dir=None):
+        """이벤트를 시트 샤드(events 또는 events_1, events_2…)나 사이드카 파일로 쓴다.
+
+        완료된 단계는 바뀌지 않으므로 단계마다 조각(시트 XML / gzip 멤버)을 처음 저장할 때
+        한 번만 만들어(rec["events_parts"]) 이후 저장에서는 파일째 재사용한다. 시트는 빈
+        자리만 만들고 {워크시트: 조각 목록} 을 돌려줘 _atomic_save 가 끼워 넣게 한다."""
+        part_dir = part_dir or tempfile.gettempdir()
+        os.makedirs(part_dir, exist_ok=True)
+        fmt = "xml" if layout["sidecar"] is None else EVENTS_SIDECAR_FORMAT
+        pieces = []
+        for rec, events in zip(steps, layout["events"]):
+            cache = rec.setdefault("events_parts", {})
+            cached = cache.get(fmt)
+            if cached is None or not all(os.path.exists(p) for p in cached):
+                prefix = os.path.join(part_dir, f"events_step{rec['no']}")
+                if fmt == "xml":
+                    cached = _write_events_parts(prefix, rec["no"], events)
+                else:
+                    cached = [_write_sidecar_part(f"{prefix}.{fmt}.gz", rec["no"], events, fmt)]
+                cache[fmt] = cached
+            pieces.append(cached)
+
+        if layout["sidecar"] is not None:
+            final = layout["sidecar"]
+            tmp = final + ".tmp"
+            with open(tmp, "wb") as out:
+                out.write(_sidecar_header(fmt))
+                for paths in pieces:
+                    for path in paths:
+                        with open(path, "rb") as part:
+                            shutil.copyfileobj(part, out, 1 << 20)
+            os.replace(tmp, final)
+            logging.info("Events sidecar saved (%d events): %s", layout["total"], final)
+            return {}
+
+        header = _rows_xml([["step"] + EVENT_COLUMNS])
+        parts = {}
+        for (name, _, _, _), shard in zip(AnalyticsEngine._events_targets(steps, layout),
+                                          layout["shards"]):
+            ws = wb.create_sheet(name)
+            parts[ws] = [header] + [pieces[si][pi] for si, pi, _ in shard]
+        return parts
+
+    @staticmethod
+    def _atomic_save(wb, final, reason, parts=None):
+        """temp 파일에 쓴 뒤 원자적 교체. 원본이 잠겨 있으면 백업본으로 저장하고 그 경로를 돌려준다.
+
+        parts({워크시트: 조각 목록})가 있으면 교체 전에 그 시트를 조각으로 바꿔 끼운다
+        (같은 내용의 이미지도 이때 하나로 합친다).
+        write_only 시트의 zip 내부 경로는 저장할 때 정해지므로 저장 뒤에 읽는다."""
+        tmp = final + ".tmp"
+        wb.save(tmp)
+        _splice_sheet_parts(tmp, {ws.path.lstrip("/"): c for ws, c in (parts or {}).items()})
+        logging.info("Workbook written (%s, embeds %s/%s): %d KB", reason, EMBED_FORMAT,
+                     RENDER_PNG_PROFILE, os.path.getsize(tmp) // 1024)
+        try:
+            os.replace(tmp, final)
+            logging.info("Excel saved (%s): %s", reason, final)
+            return None
+        except (PermissionError, OSError):
+            stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup = os.path.join(os.path.dirname(final),
+                                  f"MouseAnalytics_backup_{stamp}.xlsx")
+            os.replace(tmp, backup)
+            logging.warning("Final locked; saved backup: %s", backup)
+            return backup
+
+
+# --- 재생 드라이버 -----------------------------------------------------------
+def _journal_monitors(meta):
+    """저널 헤더의 모니터 배치 -> x/y/width/height 객체 목록."""
+    return [SimpleNamespace(x=x, y=y, width=w, height=h, name=str(i))
+            for i, (x, y, w, h) in enumerate(meta["monitors"])]
+
+
+def load_replay(path, monitor_size=(1920, 1080)):
+    """세션 저널(.mjournal) 또는 events 파일(.csv / .csv.gz, 사이드카 .ndjson.gz) -> (모니터 목록, 이벤트 배열).
+
+    이벤트는 EVENT_DTYPE 이고 x/y 는 모니터 원점을 더한 화면 좌표(엔진이 다시 모니터를
+    나눈다). 저널은 헤더의 모니터 배치를 그대로 쓰고, CSV 에는 배치가 없으므로 모든
+    이벤트를 monitor_size 크기 모니터 하나(원점 0,0)의 좌표로 본다."""
+    if path.endswith(JOURNAL_EXT):
+        meta, records = open_journal(path)
+        monitors = _journal_monitors(meta)
+        events = np.array(records)                     # 좌표를 고치므로 memmap 에서 복사
+        ox = np.array([m.x for m in monitors], dtype=np.int64)
+        oy = np.array([m.y for m in monitors], dtype=np.int64)
+        mon = np.clip(events["monitor"], 0, len(monitors) - 1)
+        events["x"] += ox[mon].astype(np.int32)
+        events["y"] += oy[mon].astype(np.int32)
+        return monitors, events
+
+    cols = _read_event_columns(path)
+    missing = [name for name in EVENT_COLUMNS[:5] if name not in cols]
+    if missing:
+        raise ValueError(f"events 열이 없음: {', '.join(missing)}")
+    events = np.zeros(len(cols["timestamp"]), dtype=EVENT_DTYPE)
+    if len(events):
+        events["wall_ns"] = np.array(cols["timestamp"], dtype="datetime64[ns]").astype(np.int64)
+        events["mono_ns"] = events["wall_ns"] - events["wall_ns"][0]
+        type_codes = {name: i for i, name in enumerate(EVENT_TYPE_NAMES) if name}
+        events["type"] = [type_codes.get(t, 0) for t in cols["event_type"]]
+        events["button"] = [BUTTON_CODES.get(b, 0) for b in cols["button"]]
+        events["x"] = np.array(cols["x"], dtype=np.int64)
+        events["y"] = np.array(cols["y"], dtype=np.int64)
+    w, h = monitor_size
+    return [SimpleNamespace(x=0, y=0, width=w, height=h, name="0")], events
+
+
+def _read_event_columns(path):
+    """events CSV / NDJSON(.gz 가능) -> {열 이름: 값 목록}. 열은 머리글 이름으로 찾는다.
+
+    앱이 쓰는 사이드카(<세션>_events.csv.gz)와 events 시트처럼 맨 앞에 step 열이 있어도
+    된다. 머리글이 없으면 EVENT_COLUMNS 순서로 보되, 열이 하나 더 많으면 앞의 step 열로 본다."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8-sig", newline="") as f:
+        if ".ndjson" in os.path.basename(path):
+            recs = [json.loads(line) for line in f if line.strip()]
+            return {name: [r.get(name) for r in recs] for name in ["step"] + EVENT_COLUMNS}
+        rows = [r for r in csv.reader(f) if r]
+    if rows and EVENT_COLUMNS[0] in rows[0]:
+        names, rows = rows[0], rows[1:]
+    elif rows and len(rows[0]) > len(EVENT_COLUMNS):
+        names = ["step"] + EVENT_COLUMNS
+    else:
+        names = EVENT_COLUMNS
+    cols = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: list(col) for name, col in zip(names, cols)}
+
+
+def replay(engine, events, speed=0.0):
+    """이벤트 배열을 speed 배속으로 engine.put 에 흘려 넣는다(0 = 기다리지 않고 최대 속도).
+
+    mono_ns 는 넣는 순간의 시계로 다시 찍는다(원래 간격 / speed 를 지키며) — 처리 지연
+    지표가 실제 큐 대기 시간이 되게. 모든 이벤트가 집계될 때까지 기다린 뒤 이벤트 수 ·
+    걸린 초 · 초당 이벤트 수와 입력 파이프라인 지표(ingest_stats)를 dict 로 돌려준다."""
+    n = len(events)
+    kinds = events["type"].tolist()
+    walls = events["wall_ns"].tolist()
+    xs, ys = events["x"].tolist(), events["y"].tolist()
+    amounts = np.where(events["type"] == EVT_CLICK, events["button"],
+                       (events["type"] == EVT_SCROLL).astype(np.uint8)).tolist()
+    due = None
+    if speed > 0 and n:
+        due = ((events["mono_ns"] - events["mono_ns"][0]) / speed).astype(np.int64).tolist()
+    put = engine.put
+    t0 = time.monotonic_ns()
+    for i, (kind, wall_ns, x, y, a) in enumerate(zip(kinds, walls, xs, ys, amounts)):
+        if due is not None:
+            ahead = t0 + due[i] - time.monotonic_ns()
+            if ahead > 1_000_000:                      # 1ms 넘게 이르면 잠깐 쉰다
+                time.sleep(ahead / 1e9)
+        put((kind, wall_ns, time.monotonic_ns(), x, y, a, None))
+    engine.flush(timeout=max(5.0, n / 1e4))
+    seconds = (time.monotonic_ns() - t0) / 1e9
+    return dict(engine.ingest_stats(), fed=n, seconds=seconds,
+                events_per_s=n / seconds if seconds > 0 else float("inf"))
+
+
+def journal_heatmap(path, png_path, monitor=None, base_a=BLUE_BASE_DEFAULT):
+    """세션 저널 -> 세션 전체 클릭 히트맵 PNG(DB 없이, 흰 캔버스) -> 클릭 수.
+
+    저널 memmap 을 click_grid 로 나눠 읽어 모니터별 격자를 만들고, 기록한 모니터들을
+    가상 데스크톱 한 장으로 렌더한다(_render_desktop_png). monitor 를 주면 그 모니터만."""
+    meta, records = open_journal(path)
+    monitors = _journal_monitors(meta)
+    if monitor is not None:
+        recorded = [monitor]
+    elif meta.get("recorded_monitors"):
+        recorded = meta["recorded_monitors"]
+    elif meta.get("active_monitor", -1) >= 0:
+        recorded = [meta["active_monitor"]]
+    else:
+        recorded = range(len(monitors))
+    if any(not 0 <= i < len(monitors) for i in recorded):
+        raise ValueError(f"저널에 없는 모니터 번호: {list(recorded)} (모니터 {len(monitors)}대)")
+    grids = {i: click_grid(records, monitors[i].width, monitors[i].height, HEAT_GRID_SCALE,
+                           monitor=i) for i in recorded}
+    _render_desktop_png(grids, {}, {i: monitors[i] for i in grids}, base_a, png_path,
+                        FINAL_PNG_PROFILE)
+    return int(sum(g.sum() for g in grids.values()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="마우스 분석 엔진 재생 드라이버")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("replay", help="저널/CSV 를 N배속으로 엔진에 넣어 처리량 측정")
+    rp.add_argument("source", help=f"세션 저널({JOURNAL_EXT}) 또는 events CSV(.csv/.csv.gz, 사이드카 포함)")
+    rp.add_argument("--speed", type=float, default=0.0, help="재생 배속(0 = 최대 속도)")
+    rp.add_argument("--monitor", default="1920x1080", help="CSV 좌표의 모니터 크기(WxH)")
+    rp.add_argument("--xlsx", help="재생 결과를 단계 하나로 마무리해 이 통합문서로 저장")
+    hp = sub.add_parser("heatmap", help="세션 저널의 클릭으로 세션 전체 히트맵 PNG(DB 없이)")
+    hp.add_argument("journal", help=f"세션 저널({JOURNAL_EXT})")
+    hp.add_argument("--monitor", type=int, help="이 모니터만(기본: 기록한 모니터 전부)")
+    hp.add_argument("--out", help="PNG 경로(기본: <저널>_heatmap.png)")
+    args = ap.parse_args()
+
+    if args.cmd == "heatmap":
+        if not os.path.exists(args.journal):
+            ap.error(f"파일이 없음: {args.journal}")
+        out = args.out or os.path.splitext(args.journal)[0] + "_heatmap.png"
+        try:
+            clicks = journal_heatmap(args.journal, out, args.monitor)
+        except ValueError as e:
+            ap.error(f"읽을 수 없음({args.journal}): {e}")
+        print(f"클릭 {clicks:,}개 -> {out}")
+        return 0
+
+    if not os.path.exists(args.source):
+        ap.error(f"파일이 없음: {args.source}")
+    try:
+        size = tuple(int(v) for v in args.monitor.lower().split("x"))
+    except ValueError:
+        ap.error(f"--monitor 는 WxH 형식: {args.monitor}")
+    if args.xlsx and (os.path.abspath(os.path.splitext(args.xlsx)[0] + JOURNAL_EXT)
+                      == os.path.abspath(args.source)):
+        ap.error("--xlsx 의 세션 저널이 재생할 저널을 덮어씀 — 다른 이름을 쓰세요")
+    try:
+        monitors, events = load_replay(args.source, size)
+    except ValueError as e:
+        ap.error(f"읽을 수 없음({args.source}): {e}")
+    tmp = tempfile.mkdtemp(prefix="mouse_analytics_replay_")
+    engine = AnalyticsEngine(tmp)
+    saved = []
+    try:
+        session_file = os.path.abspath(args.xlsx) if args.xlsx else os.path.join(tmp, "replay.xlsx")
+        engine.start(session_file, monitors, range(len(monitors)))
+        st = replay(engine, events, args.speed)
+        print(f"이벤트 {st['fed']:,}개  ·  {st['seconds']:.3f} s  ·  {st['events_per_s']:,.0f} events/s")
+        print(f"묶음 {st['batches']:,}개  ·  최대 큐 {st['max_depth']:,}  ·  "
+              f"최대 처리 지연 {st['max_latency_ms']:.1f} ms")
+        if args.xlsx:
+            engine.finalize_step()
+            engine.export("stop", on_done=lambda backup, error: saved.append(error))
+        engine.end_session()
+    finally:
+        engine.close()
+        engine.poll()
+        shutil.rmtree(tmp, ignore_errors=True)
+    if args.xlsx:
+        if saved and saved[0] is None:
+            print(f"저장: {session_file}")
+        else:
+            print(f"저장 실패: {saved[0] if saved else '알 수 없음'}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
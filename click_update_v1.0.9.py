@@ -20,6 +20,7 @@ DPI = 96             # 이동 픽셀 -> 물리 거리 환산에 쓰는 화면 DP
 MM_TO_CM = 0.1       # mm -> cm
 INCH_TO_MM = 25.4    # inch -> mm
 SCROLL_STEP_MM = 15  # 스크롤 한 칸의 추정 이동 거리(mm)
+UI_REFRESH_HZ = 20   # 라벨 최대 갱신 빈도. 이벤트마다 after(0) 을 쌓지 않는다
 
 
 class MouseTrackerApp:
@@ -34,13 +35,19 @@ class MouseTrackerApp:
         self.last_position = None
         self.is_running = False
 
+        # 리스너 스레드는 더티 플래그만 세우고, 라벨은 _refresh_loop 가 주기적으로 그린다.
+        self._dirty = False
+        self._label_text = {}
+        self.skipped_redraws = 0   # _refresh_loop 에서 값이 그대로라 건너뛴 라벨 갱신 수
+
         self.setup_ui()
+        self.root.after(1000 // UI_REFRESH_HZ, self._refresh_loop)
 
         # 마우스/키보드 리스너는 GUI를 막지 않도록 데몬 스레드에서 돌린다.
         threading.Thread(target=self._run_mouse_listener, daemon=True).start()
         threading.Thread(target=self._run_keyboard_listener, daemon=True).start()
 
-        self.root.protocol("WM_DELETE_WINDOW", self.root.destroy)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def setup_ui(self):
         self.left_click_label = tk.Label(self.root, text="좌클릭: 0", font=("Arial", 8))
@@ -56,14 +63,37 @@ class MouseTrackerApp:
         self.reset_button = tk.Button(self.root, text="리셋", font=("Arial", 8), command=self.reset_counts)
         self.reset_button.pack(pady=10)
 
+    def _set_label(self, label, text):
+        """텍스트가 바뀐 라벨만 다시 그린다 -> 같아서 건너뛰었으면 True."""
+        if self._label_text.get(label) == text:
+            return True
+        self._label_text[label] = text
+        label.config(text=text)
+        return False
+
     def update_labels(self):
-        self.left_click_label.config(text=f"좌클릭: {self.click_counts[Button.left]}")
-        self.right_click_label.config(text=f"우클릭: {self.click_counts[Button.right]}")
-        self.middle_click_label.config(text=f"휠 클릭: {self.click_counts[Button.middle]}")
+        """클릭 라벨 갱신 -> 건너뛴 라벨 수."""
+        return sum((
+            self._set_label(self.left_click_label, f"좌클릭: {self.click_counts[Button.left]}"),
+            self._set_label(self.right_click_label, f"우클릭: {self.click_counts[Button.right]}"),
+            self._set_label(self.middle_click_label, f"휠 클릭: {self.click_counts[Button.middle]}"),
+        ))
 
     def update_distance_label(self):
-        self.distance_label.config(text=f"이동 거리: \n {self.total_distance_mm * MM_TO_CM:.2f} cm")
-        self.scroll_label.config(text=f"스크롤 거리: \n {self.total_scroll_mm * MM_TO_CM:.2f} cm")
+        """이동/스크롤 거리 라벨 갱신 -> 건너뛴 라벨 수."""
+        return sum((
+            self._set_label(self.distance_label,
+                            f"이동 거리: \n {self.total_distance_mm * MM_TO_CM:.2f} cm"),
+            self._set_label(self.scroll_label,
+                            f"스크롤 거리: \n {self.total_scroll_mm * MM_TO_CM:.2f} cm"),
+        ))
+
+    def _refresh_loop(self):
+        """UI_REFRESH_HZ 주기로, 값이 바뀌었을 때만 라벨을 다시 그린다."""
+        if self._dirty:
+            self._dirty = False
+            self.skipped_redraws += self.update_labels() + self.update_distance_label()
+        self.root.after(1000 // UI_REFRESH_HZ, self._refresh_loop)
 
     def reset_counts(self):
         """결과를 파일로 저장한 뒤 모든 집계를 0으로 되돌린다."""
@@ -96,10 +126,15 @@ class MouseTrackerApp:
             # 저장 실패는 조용히 넘기지 않는다.
             print(f"결과 저장 실패: {e}")
 
+    def on_close(self):
+        """창을 닫으며 갱신 루프가 건너뛴 라벨 갱신 수를 알린다(더티 플래그 효과 확인용)."""
+        print(f"라벨 갱신 건너뜀: {self.skipped_redraws}회")
+        self.root.destroy()
+
     def on_click(self, x, y, button, pressed):
         if self.is_running and pressed:
             self.click_counts[button] += 1
-            self.root.after(0, self.update_labels)
+            self._dirty = True
 
     def on_move(self, x, y):
         if not self.is_running:
@@ -108,12 +143,12 @@ class MouseTrackerApp:
             distance_pixels = math.hypot(x - self.last_position[0], y - self.last_position[1])
             self.total_distance_mm += distance_pixels / DPI * INCH_TO_MM
         self.last_position = (x, y)
-        self.root.after(0, self.update_distance_label)
+        self._dirty = True
 
     def on_scroll(self, x, y, dx, dy):
         if self.is_running:
             self.total_scroll_mm += abs(dy) * SCROLL_STEP_MM
-            self.root.after(0, self.update_distance_label)
+            self._dirty = True
 
     def toggle_running(self):
         self.is_running = not self.is_running
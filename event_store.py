@@ -0,0 +1,236 @@
+"""마우스 이벤트 열(column) 저장소.
+
+리스너 콜백이 이벤트마다 파이썬 튜플(문자열 타임스탬프 포함, 수백 바이트)을 리스트에
+쌓고 상한을 넘으면 list.pop(0)(O(n))으로 버리던 것을, 미리 잡아 둔 numpy 구조화 배열
+링 버퍼에 O(1)로 덮어쓰는 방식으로 바꾼다. 이벤트 하나는 EVENT_DTYPE 한 칸(32바이트).
+
+열: wall_ns(time.time_ns) · mono_ns(time.monotonic_ns) · type(EVT_*) ·
+    button(BUTTON_NAMES 인덱스) · monitor · x · y ·
+    dist(이동 샘플의 누적 이동 px, 해당 없으면 NaN)
+
+타임스탬프는 정수 ns 그대로 담고, 사람이 읽는 문자열(마이크로초까지)로는 내보낼 때
+열 전체를 한 번에 바꾼다(format_timestamps). 리스너 콜백에서 strftime 을 하지 않는다.
+
+세션 저널: 모든 이벤트를 같은 EVENT_DTYPE 레코드로 통합문서 옆 바이너리 파일에
+덧붙여 쓴다(JournalWriter). 앞 JOURNAL_HEADER_SIZE 바이트는 모니터 배치·DPI 등을 담은
+헤더, 그 뒤는 고정 길이 레코드 배열이라 open_journal 이 복사 없이 numpy memmap 으로
+연다. 메모리 상한(링 버퍼) 때문에 버려지는 이벤트 없이 세션 전체가 디스크에 남는다.
+
+GUI/pynput 의존성이 없어 내보내기·분석 코드에서도 그대로 쓴다.
+"""
+
+import os
+import json
+import time
+
+import numpy as np
+
+EVT_CLICK = 1
+EVT_MOVE = 2
+EVT_SCROLL = 3
+EVENT_TYPE_NAMES = ("", "click", "move", "scroll")
+
+# pynput Button.name -> 코드. 0 은 '버튼 없음'(이동/스크롤)
+BUTTON_NAMES = ("", "left", "right", "middle", "x1", "x2", "unknown")
+BUTTON_CODES = {name: i for i, name in enumerate(BUTTON_NAMES) if name}
+
+EVENT_DTYPE = np.dtype([
+    ("wall_ns", "<i8"),
+    ("mono_ns", "<i8"),
+    ("type", "u1"),
+    ("button", "u1"),
+    ("monitor", "<i2"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("dist", "<f4"),
+])
+
+EVENT_COLUMNS = ["timestamp", "event_type", "button", "x", "y",
+                 "monitor_index", "distance_delta_px"]
+
+
+class EventStore:
+    """고정 용량 링 버퍼. 가득 차면 가장 오래된 이벤트를 덮어쓴다.
+
+    스레드 안전하지 않다 — 호출 쪽 락(AnalyticsEngine.lock) 안에서 쓴다."""
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(self.capacity, dtype=EVENT_DTYPE)
+        self._count = 0              # 지금까지 덧붙인 총 개수
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def extend(self, records):
+        """EVENT_DTYPE 배열을 한 번에 덧붙인다(넘치면 앞쪽부터 덮어씀)."""
+        n = len(records)
+        if n >= self.capacity:
+            records = records[n - self.capacity:]
+            self._count += n - self.capacity
+            n = self.capacity
+        head = self._count % self.capacity
+        first = min(n, self.capacity - head)
+        self._buf[head:head + first] = records[:first]
+        self._buf[:n - first] = records[first:]
+        self._count += n
+
+    @property
+    def total(self):
+        """지금까지 덧붙인 총 개수 = 다음 이벤트의 세션 번호(세션 저널 번호와 같다)."""
+        return self._count
+
+    def clear(self):
+        self._count = 0
+
+    def snapshot(self):
+        """보관 중인 이벤트를 시간순으로 담은 독립 사본(EVENT_DTYPE 배열)."""
+        if self._count <= self.capacity:
+            return self._buf[:self._count].copy()
+        head = self._count % self.capacity
+        return np.concatenate((self._buf[head:], self._buf[:head]))
+
+    def since(self, start):
+        """세션 번호 start 이후로 아직 보관 중인 이벤트 -> (첫 이벤트 번호, 시간순 사본)."""
+        snap = self.snapshot()
+        base = self._count - len(snap)
+        skip = max(0, start - base)
+        return base + skip, snap[skip:]
+
+
+_NS_PER_HOUR = 3600 * 10 ** 9
+
+
+def format_timestamps(wall_ns):
+    """epoch ns 배열 -> 'YYYY-MM-DD HH:MM:SS.ffffff'(로컬 시각) 문자열 배열.
+
+    로컬 UTC 오프셋은 이벤트가 걸친 '시간(hour)'마다 한 번씩만 구해(서머타임 경계도
+    반영) 더한 뒤 numpy datetime64 로 한 번에 문자열화한다."""
+    wall_ns = np.asarray(wall_ns, dtype=np.int64)
+    if wall_ns.size == 0:
+        return np.empty(0, dtype="<U26")
+    hours, inverse = np.unique(wall_ns // _NS_PER_HOUR, return_inverse=True)
+    offsets = np.array([time.localtime(int(h) * 3600).tm_gmtoff for h in hours.tolist()],
+                       dtype=np.int64) * 10 ** 9
+    local = (wall_ns + offsets[inverse]).astype("datetime64[ns]").astype("datetime64[us]")
+    return np.char.replace(np.datetime_as_string(local, unit="us"), "T", " ")
+
+
+def event_rows(events):
+    """EVENT_DTYPE 배열 -> 엑셀/CSV 행(EVENT_COLUMNS 순서) 이터레이터.
+
+    열 단위로 한 번에 변환한 뒤 묶기만 한다. dist 가 NaN 이면 빈 칸."""
+    ts = format_timestamps(events["wall_ns"]).tolist()
+    types = np.asarray(EVENT_TYPE_NAMES, dtype=object)[events["type"]].tolist()
+    buttons = np.asarray(BUTTON_NAMES, dtype=object)[events["button"]].tolist()
+    dist = events["dist"].astype(np.float64).round(1)
+    dist = np.where(np.isnan(dist), "", dist.astype(object)).tolist()
+    return zip(ts, types, buttons, events["x"].tolist(), events["y"].tolist(),
+               events["monitor"].tolist(), dist)
+
+
+# --- 세션 저널 ---------------------------------------------------------------
+JOURNAL_MAGIC = b"MAJRNL01"
+JOURNAL_HEADER_SIZE = 4096         # 헤더 고정 크기(레코드 시작을 페이지 경계에 맞춤)
+JOURNAL_BUFFER_BYTES = 1 << 20     # 쓰기 버퍼(1MB 단위로 디스크에 씀)
+
+
+class JournalWriter:
+    """EVENT_DTYPE 레코드를 파일 끝에 덧붙이는 저널. 쓰기 스레드는 하나(집계 스레드).
+
+    meta 는 JSON 으로 직렬화되는 dict(모니터 배치, DPI, 세션 시작 등). flush() 는
+    다른 스레드(저장 작업)에서 불러도 된다 — 버퍼드 파일 객체가 내부적으로 잠근다."""
+
+    def __init__(self, path, meta):
+        header = json.dumps(dict(meta, version=1, dtype=EVENT_DTYPE.descr),
+                            ensure_ascii=False).encode("utf-8")
+        if len(JOURNAL_MAGIC) + 4 + len(header) > JOURNAL_HEADER_SIZE:
+            raise ValueError("저널 헤더가 너무 큼")
+        self.path = path
+        self.count = 0                  # 지금까지 쓴 레코드 수
+        self._f = open(path, "wb", buffering=JOURNAL_BUFFER_BYTES)
+        block = JOURNAL_MAGIC + len(header).to_bytes(4, "little") + header
+        self._f.write(block.ljust(JOURNAL_HEADER_SIZE, b"\0"))
+
+    def append(self, records):
+        self._f.write(np.ascontiguousarray(records, dtype=EVENT_DTYPE).data)
+        self.count += len(records)
+
+    def flush(self):
+        if not self._f.closed:
+            self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+def read_journal_header(path):
+    """저널 헤더(meta dict)만 읽는다."""
+    with open(path, "rb") as f:
+        block = f.read(JOURNAL_HEADER_SIZE)
+    if not block.startswith(JOURNAL_MAGIC):
+        raise ValueError(f"세션 저널 파일이 아님: {path}")
+    n = int.from_bytes(block[len(JOURNAL_MAGIC):len(JOURNAL_MAGIC) + 4], "little")
+    start = len(JOURNAL_MAGIC) + 4
+    return json.loads(block[start:start + n].decode("utf-8"))
+
+
+def open_journal(path):
+    """저널 -> (meta, 레코드 memmap(읽기 전용, EVENT_DTYPE)). 복사 없이 파일을 그대로 본다.
+
+    기록 중인 파일이면 마지막으로 flush 된 완전한 레코드까지만 보인다."""
+    meta = read_journal_header(path)
+    n = max(0, (os.path.getsize(path) - JOURNAL_HEADER_SIZE) // EVENT_DTYPE.itemsize)
+    if n == 0:
+        return meta, np.empty(0, dtype=EVENT_DTYPE)
+    return meta, np.memmap(path, dtype=EVENT_DTYPE, mode="r",
+                           offset=JOURNAL_HEADER_SIZE, shape=(n,))
+
+
+def click_grid(events, w, h, scale=1, monitor=None, chunk=1 << 20):
+    """이벤트 배열(memmap 가능)의 클릭을 (ceil(h/scale), ceil(w/scale)) 격자로 누적.
+
+    monitor 를 주면 그 모니터의 클릭만(좌표는 모니터 안 좌표). chunk 개씩 나눠 읽어
+    수천만 이벤트 저널도 일정한 메모리로 처리한다."""
+    grid = np.zeros((-(-h // scale), -(-w // scale)), dtype=np.float32)
+    for i in range(0, len(events), chunk):
+        part = events[i:i + chunk]
+        keep = part["type"] == EVT_CLICK
+        if monitor is not None:
+            keep &= part["monitor"] == monitor
+        part = part[keep]
+        ok = (part["x"] >= 0) & (part["x"] < w) & (part["y"] >= 0) & (part["y"] < h)
+        part = part[ok]
+        np.add.at(grid, (part["y"] // scale, part["x"] // scale), 1)
+    return grid
+
+
+_NS_PER_MINUTE = 60 * 10 ** 9
+MINUTE_ACTIVITY_MAX = 7 * 24 * 60   # 분당 활동량 배열 최대 길이(시계가 앞으로 크게 튀어도 이 이상 안 잡음)
+
+
+def minute_activity(events, chunk=1 << 20):
+    """이벤트 배열(memmap 가능) -> 분 단위 활동량 (첫 분(epoch 분), 클릭, 스크롤, 이동 px).
+
+    각 배열은 첫 분부터 마지막 분까지 빈 분 없이 이어진다. 이벤트가 없으면 (None, 빈 배열…).
+    벽시계는 NTP·수동 조정으로 뒤로 갈 수 있어 범위는 처음/끝이 아니라 최소/최대 시각으로
+    잡고, 앞으로 크게 건너뛰어도 배열이 MINUTE_ACTIVITY_MAX 분을 넘지 않게 자른다(넘는
+    이벤트는 마지막 분에 더한다)."""
+    empty = np.zeros(0, dtype=np.int64)
+    if len(events) == 0:
+        return None, empty, empty, np.zeros(0)
+    lo = min(int(events["wall_ns"][i:i + chunk].min()) for i in range(0, len(events), chunk))
+    hi = max(int(events["wall_ns"][i:i + chunk].max()) for i in range(0, len(events), chunk))
+    m0 = lo // _NS_PER_MINUTE
+    n = min(hi // _NS_PER_MINUTE - m0 + 1, MINUTE_ACTIVITY_MAX)
+    clicks, scrolls = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    dist = np.zeros(n)
+    for i in range(0, len(events), chunk):
+        part = events[i:i + chunk]
+        idx = np.clip(part["wall_ns"] // _NS_PER_MINUTE - m0, 0, n - 1)
+        clicks += np.bincount(idx, weights=part["type"] == EVT_CLICK, minlength=n).astype(np.int64)
+        scrolls += np.bincount(idx, weights=part["type"] == EVT_SCROLL, minlength=n).astype(np.int64)
+        moved = np.nan_to_num(part["dist"].astype(np.float64))
+        dist += np.bincount(idx, weights=moved, minlength=n)
+    return m0, clicks, scrolls, dist
@@ -7,6 +7,9 @@
   · 마우스 이동 거리 (픽셀 + 물리 cm)
   · 버튼별 클릭 횟수 + 스크롤
   · 위 기록을 엑셀(.xlsx)로 주기적·자동 저장 (summary / events / heatmap 시트)
+  · 모든 원시 이벤트를 통합문서 옆 세션 저널(.mjournal)에 빠짐없이 기록
+  · (선택) 모든 세션을 SQLite DB 하나에 모아 기간별 조회(session_store.py)
+  · (선택) 모든 모니터 동시 기록 — 모니터별 격자를 이어 붙인 가상 데스크톱 히트맵
 
 전역 단축키:
     Ctrl+Shift+F9  : 녹화 시작/정지
@@ -15,6 +18,10 @@
 기존 도구(mouse_click_move2.py / click_update_v1.0.9.py / mouse_distance1.0.6.py)의
 검증된 패턴을 재사용해 하나로 통합했다. Windows 전용.
 
+이 파일은 Tk 창 · pynput 리스너 · 화면 캡처만 맡는다. 집계 · 단계 · 히트맵 렌더 ·
+엑셀 저장은 analytics_engine.AnalyticsEngine 이 하고(GUI 없이 재생·테스트 가능),
+리스너 콜백은 원시 이벤트를 engine.put() 으로 넘기기만 한다.
+
 자기 UI 클릭 제외: 우리 창/다이얼로그를 누른 클릭은 분석 데이터에서 제외해
 잘못된 기록이 남지 않게 한다(_own_rect / _suppress). 녹화 중에는 단축키로
 제어하거나 '시작 시 창 최소화'를 쓰면 우리 UI 클릭 자체가 발생하지 않는다.
@@ -27,7 +34,6 @@ import shutil
 import logging
 import datetime
 import tempfile
-import threading
 import ctypes
 from ctypes import wintypes
 from types import SimpleNamespace
@@ -35,64 +41,40 @@ from types import SimpleNamespace
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
-import numpy as np
 from PIL import Image, ImageGrab
 from pynput import mouse, keyboard
-from pynput.mouse import Button
 from screeninfo import get_monitors
 
-import openpyxl
-from openpyxl.drawing.image import Image as XLImage
+from event_store import EVT_CLICK, EVT_MOVE, EVT_SCROLL, BUTTON_CODES
+from session_store import DB_FILE_NAME
+from analytics_engine import (AnalyticsEngine, DEFAULT_DPI, INCH_TO_MM, MM_TO_CM,
+                              BLUE_BASE_DEFAULT, _KEY_DOWN, _KEY_UP)
 
 # --- 상수 -------------------------------------------------------------------
-DEFAULT_DPI = 96             # 화면 크기 미입력 시 기본 DPI
-INCH_TO_MM = 25.4
-MM_TO_CM = 0.1
-SCROLL_STEP_MM = 15          # 스크롤 한 칸의 추정 이동 거리(mm)
-POINT_CAP = 5000             # 히트맵 포인트/이벤트 로그 최대 보관 수(메모리 한계)
-MOVE_MIN_INTERVAL_S = 0.10   # 이동 이벤트 코얼레싱: 최소 시간 간격
-MOVE_MIN_DIST_PX = 50        # 이동 이벤트 코얼레싱: 최소 이동 거리
 DEFAULT_AUTOSAVE_S = 30
-GAUSS_SIGMA = 30             # 히트맵 가우시안 블러 반경
-HEAT_ALPHA_GAMMA = 0.55      # 히트맵 알파 감마(작을수록 중간 밀도도 잘 보임)
-HEAT_MAX_ALPHA = 0.85        # 핫스팟 최대 불투명도
-BLUE_BASE_DEFAULT = 0.13     # 배경에 깔리는 옅은 파란 기운(0=없음) — UI 슬라이더로 조절
-BLUE_BASE_RGB = (70, 110, 225)
+UI_REFRESH_HZ = 20           # 실시간 통계 라벨 최대 갱신 빈도(이벤트가 아무리 많아도)
+WORKER_POLL_MS = 15          # 백그라운드 작업 완료 확인 주기(60Hz 이상으로 UI 반응 유지)
+CAPTURE_HIDE_DELAY_MS = 200  # 배경 캡처 전 우리 창이 화면에서 사라질 때까지 기다리는 시간
+CAPTURE_MAX_WIDTH = 0        # 배경 캡처 보관 최대 폭(0=원본). 원본 PNG 해상도가 필요 없으면 줄임
 APP_DIR_NAME = "MouseAnalytics"
 
 
-def _gaussian_blur(arr, sigma):
-    """numpy 만으로 float 분리형 가우시안 블러.
-
-    Pillow 의 uint8 GaussianBlur 은 sigma 가 크면 희소한 클릭의 블러 값이 1 미만으로
-    뭉개져 전부 0 이 되어 히트맵이 텅 비는 버그가 있었다. float 로 블러해 작은 값도
-    보존한다(scipy.ndimage.gaussian_filter 과 동일한 효과, 의존성 없이).
-    """
-    arr = np.asarray(arr, dtype=np.float32)
-    radius = int(max(1, round(3.0 * sigma)))
-    xs = np.arange(-radius, radius + 1, dtype=np.float32)
-    k = np.exp(-(xs * xs) / (2.0 * sigma * sigma)).astype(np.float32)
-    k /= k.sum()
-    out = np.empty_like(arr)
-    for i in range(arr.shape[0]):          # 가로 방향
-        out[i] = np.convolve(arr[i], k, mode="same")
-    for j in range(out.shape[1]):          # 세로 방향
-        out[:, j] = np.convolve(out[:, j], k, mode="same")
-    return out
-
-
-def _turbo_rgb(t):
-    """[0,1] 2D 배열 -> (H,W,3) float RGB. Google 'Turbo' 컬러맵 다항식 근사.
-
-    jet 보다 색 띠(rings)가 적고 매끄러워 위치 표현이 자연스럽다. matplotlib 없이
-    numpy 만으로 계산한다(PyInstaller 패키징 경량/안정).
-    """
-    t = np.clip(t, 0.0, 1.0)
-    t2, t3, t4, t5 = t * t, t ** 3, t ** 4, t ** 5
-    r = 0.13572138 + 4.61539260 * t - 42.66032258 * t2 + 132.13108234 * t3 - 152.94239396 * t4 + 59.28637943 * t5
-    g = 0.09140261 + 2.19418839 * t + 4.84296658 * t2 - 14.18503333 * t3 + 4.27729857 * t4 + 2.82956604 * t5
-    b = 0.10667330 + 12.64194608 * t - 60.58204836 * t2 + 110.36276771 * t3 - 89.90310912 * t4 + 27.34824973 * t5
-    return np.clip(np.stack([r, g, b], axis=-1), 0.0, 1.0)
+def _grab_background(monitor, max_width=CAPTURE_MAX_WIDTH):
+    """모니터 영역 캡처 -> RGB 이미지(캡처 스레드용, Tk 접근 없음).
+
+    ImageGrab bbox 는 (left, top, right, bottom), all_screens=True 로 보조/음수 좌표까지
+    정확히. 알파 채널 없이 RGB 로 보관하고, max_width 를 넘으면 비율을 유지해 줄인다."""
+    t0 = time.perf_counter()
+    img = ImageGrab.grab(bbox=(monitor.x, monitor.y, monitor.x + monitor.width,
+                               monitor.y + monitor.height), all_screens=True)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if max_width and img.width > max_width:
+        h = max(1, round(img.height * max_width / img.width))
+        img = img.resize((max_width, h), Image.BILINEAR, reducing_gap=2.0)
+    logging.info("Background captured %dx%d in %.0f ms", img.width, img.height,
+                 (time.perf_counter() - t0) * 1000)
+    return img
 
 
 class MouseAnalytics(tk.Tk):
@@ -121,47 +103,30 @@ class MouseAnalytics(tk.Tk):
         if not self.monitors:
             self.monitors = [SimpleNamespace(x=0, y=0, width=1920, height=1080, name="기본")]
 
-        # 공유 상태 (self.lock으로 보호)
-        self.lock = threading.Lock()
-        self.click_positions = []   # 히트맵용 (모니터 상대좌표), POINT_CAP 캡
-        self.click_counts = {Button.left: 0, Button.right: 0, Button.middle: 0}
-        self.total_distance_mm = 0.0
-        self.scroll_count = 0       # 스크롤 칸 수(누적)
-        self.key_count = 0          # 키보드 입력 수(누적). 키 '내용'은 절대 저장하지 않음
-        self._keys_down = set()     # 오토리피트 중복 제거용 임시 보관(저장/기록 안 함)
-        self.events = []            # (ts, type, button, x, y, monitor_idx, dist_px)
+        # 집계·단계·히트맵·엑셀 저장 엔진(입력 큐·집계/렌더/저장 스레드를 가진다)
+        self.engine = AnalyticsEngine(self.temp_dir, grab=_grab_background)
 
         # 세션/리스너 상태
         self.is_recording = False
         self.listener = None
         self.kbd_listener = None
-        self.session_start = None
-        self.session_file = None
-        self._last_heatmap_png = None
-        self._session_shot = None        # 현재 단계의 배경(스크린샷). 단계가 바뀔 때마다 캡처
-        self._steps = []                 # 완료된 단계 기록(각 단계 = 히트맵 PNG + 통계)
-        self._step_no = 1                # 현재 단계 번호
-        self._step_start = None          # 현재 단계 시작 시각
-
-        # 녹화 시작 시 고정되는 캐시값(리스너 스레드가 읽음)
-        self._active_monitor = None
-        self._active_monitor_idx = 0
-        self._ppm = DEFAULT_DPI / INCH_TO_MM   # pixels per mm
+        self._capture_hide = None        # 창을 숨기고 기다리는 캡처(끝나면 _poll_worker 가 창 복원)
+
+        # 녹화 시작 시 고정되는 옵션(리스너 스레드가 읽음)
         self._rec_move = True
         self._rec_scroll = True
         self._rec_key = True
 
-        # 이동 이벤트 코얼레싱 상태
-        self._last_move_pos = None
-        self._last_sample_pos = None
-        self._last_sample_t = 0.0
-        self._win_dist = 0.0
-
         # 자기 UI 클릭 제외용
         self._own_rect = None       # (x1,y1,x2,y2) 또는 None
         self._suppress = False      # 모달 다이얼로그 표시 중 True
 
         self._autosave_remaining = DEFAULT_AUTOSAVE_S
+        self.autosaves_skipped = 0       # 바뀐 것이 없어 건너뛴 자동저장 수
+
+        # 라벨 갱신 스케줄러: 이벤트마다 after(0) 대신 더티 플래그(engine.dirty) + 고정 주기 갱신
+        self._label_text = {}            # 라벨 -> 마지막으로 그린 텍스트
+        self.redraws_skipped = 0         # _ui_pump 통계 라벨 중 값이 그대로라 건너뛴 갱신 수
 
         self.build_ui()
         # 창 이동/리사이즈 시 자기 영역 갱신(메인 스레드)
@@ -179,6 +144,8 @@ class MouseAnalytics(tk.Tk):
             self.keyboard_listener = None
 
         self.after(1000, self.tick)
+        self.after(WORKER_POLL_MS, self._poll_worker)
+        self.after(1000 // UI_REFRESH_HZ, self._ui_pump)
 
         messagebox.showinfo(
             "안내",
@@ -197,7 +164,9 @@ class MouseAnalytics(tk.Tk):
 
         self.status_label = tk.Label(self, text="○ 대기 중", fg="gray",
                                      font=("맑은 고딕", 11, "bold"))
-        self.status_label.pack(pady=(10, 4))
+        self.status_label.pack(pady=(10, 0))
+        self.job_label = tk.Label(self, text="", fg="gray", font=("맑은 고딕", 8))
+        self.job_label.pack(pady=(0, 4))
 
         self.start_button = tk.Button(
             self, text="▶ 녹화 시작 (Ctrl+Shift+F9)",
@@ -226,6 +195,9 @@ class MouseAnalytics(tk.Tk):
         self.monitor_label = tk.Label(stat, text="모니터  —",
                                       anchor="w", font=("맑은 고딕", 9), fg="gray")
         self.monitor_label.pack(fill="x", **pad)
+        self.pipeline_label = tk.Label(stat, text="입력 큐  0  ·  처리 지연  0.0 ms",
+                                       anchor="w", font=("맑은 고딕", 8), fg="gray")
+        self.pipeline_label.pack(fill="x", **pad)
 
         tk.Label(self,
                  text="단축키:  시작/정지 Ctrl+Shift+F9   ·   다음 단계 저장 Ctrl+Shift+F10",
@@ -287,6 +259,14 @@ class MouseAnalytics(tk.Tk):
         tk.Scale(cfg, variable=self.blue_base_var, from_=0.0, to=0.4, resolution=0.01,
                  orient="horizontal", showvalue=True, length=150).grid(
             row=7, column=1, columnspan=3, sticky="w", **pad)
+        self.db_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(cfg, text=f"세션 DB 기록 (저장 폴더/{DB_FILE_NAME})",
+                       variable=self.db_var).grid(row=8, column=0, columnspan=4,
+                                                  sticky="w", **pad)
+        self.all_monitors_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(cfg, text="모든 모니터 기록 (가상 데스크톱 전체 히트맵)",
+                       variable=self.all_monitors_var).grid(row=9, column=0, columnspan=4,
+                                                            sticky="w", **pad)
 
         act = tk.Frame(self)
         act.pack(fill="x", padx=10, pady=(4, 10))
@@ -418,33 +398,22 @@ class MouseAnalytics(tk.Tk):
         if self.is_recording:
             return
         # 모니터/DPI/옵션을 시작 시점에 고정(리스너 스레드는 Tk 위젯을 못 읽음)
-        self._active_monitor_idx = self.monitor_combo.current()
-        self._active_monitor = self.monitors[self._active_monitor_idx]
-        self._ppm = self.pixels_per_mm()
+        if self.all_monitors_var.get():
+            recorded = range(len(self.monitors))
+        else:
+            recorded = [self.monitor_combo.current()]
         self._rec_move = bool(self.move_var.get())
         self._rec_scroll = bool(self.scroll_var.get())
         self._rec_key = bool(self.kbd_var.get())
 
-        self.session_start = datetime.datetime.now()
-        self.session_file = os.path.join(
-            self.save_dir(), f"MouseAnalytics_{self.session_start:%Y%m%d_%H%M%S}.xlsx")
-
-        with self.lock:
-            self.click_positions.clear()
-            self.click_counts = {Button.left: 0, Button.right: 0, Button.middle: 0}
-            self.total_distance_mm = 0.0
-            self.scroll_count = 0
-            self.key_count = 0
-            self._keys_down.clear()
-            self.events.clear()
-            self._last_move_pos = None
-            self._last_sample_pos = None
-            self._last_sample_t = 0.0
-            self._win_dist = 0.0
-        self._last_heatmap_png = None
-        self._steps = []
-        self._step_no = 1
-        self._step_start = self.session_start
+        session_start = datetime.datetime.now()
+        self.engine.start(
+            os.path.join(self.save_dir(), f"MouseAnalytics_{session_start:%Y%m%d_%H%M%S}.xlsx"),
+            self.monitors, recorded, ppm=self.pixels_per_mm(), rec_key=self._rec_key,
+            heatmap_mode=self._heatmap_mode(),
+            db_path=os.path.join(self.save_dir(), DB_FILE_NAME) if self.db_var.get() else None,
+            session_start=session_start)
+        self.autosaves_skipped = 0
         self._autosave_remaining = self._autosave_interval()
 
         self.listener = mouse.Listener(
@@ -455,6 +424,7 @@ class MouseAnalytics(tk.Tk):
             logging.error("Mouse listener start failed: %s", e)
             messagebox.showerror("오류", f"마우스 리스너 시작 실패:\n{e}")
             self.listener = None
+            self.engine.end_session()
             return
 
         # 키보드 입력 수 집계용 리스너(별개). GlobalHotKeys 와 공존. 키 내용은 안 받음.
@@ -471,10 +441,14 @@ class MouseAnalytics(tk.Tk):
         self.is_recording = True
         self.monitor_combo.config(state="disabled")
         self.start_button.config(text="■ 정지 (Ctrl+Shift+F9)", bg="#d9534f")
-        m = self._active_monitor
-        self.monitor_label.config(
-            text=f"모니터  {self._active_monitor_idx} ({m.width}x{m.height})")
-        logging.info("Recording started -> %s", self.session_file)
+        m = self.engine.active_monitor
+        if self.engine.active_monitor_index < 0:
+            self.monitor_label.config(
+                text=f"모니터  전체 {len(recorded)}대 ({m.width}x{m.height} 가상 데스크톱)")
+        else:
+            self.monitor_label.config(
+                text=f"모니터  {self.engine.active_monitor_index} ({m.width}x{m.height})")
+        logging.info("Recording started -> %s", self.engine.session_file)
         self._grab_session_shot()      # 단계 1 배경 캡처(우리 창은 숨기고)
         self.status_label.config(text="● 녹화 중 · 단계 1", fg="#d9534f")
         self.refresh_labels()
@@ -500,12 +474,23 @@ class MouseAnalytics(tk.Tk):
         self.start_button.config(text="▶ 녹화 시작 (Ctrl+Shift+F9)", bg="#5cb85c")
         self.status_label.config(text="○ 대기 중", fg="gray")
 
+        engine = self.engine
         self._finalize_step()          # 마지막(현재) 단계 저장
-        self.export_excel("stop")
+        recorded = sum(s["left"] + s["right"] + s["middle"] + s["span"][1] - s["span"][0]
+                       for s in engine.steps)
+        self.export_excel("stop", on_saved=lambda: self._notify_stopped(recorded))
+        engine.optimize_step_pngs()
+        engine.end_session()
         self.refresh_labels()
-        logging.info("Recording stopped (%d step(s)).", len(self._steps))
-        recorded = sum(s["left"] + s["right"] + s["middle"] + len(s["events"])
-                       for s in self._steps)
+        logging.info("Recording stopped (%d step(s)).", len(engine.steps))
+        st = engine.ingest_stats()
+        logging.info("Ingest: %d events in %d batches, max depth %d, max latency %.1f ms, "
+                     "%d label redraws skipped, %d idle autosaves skipped",
+                     st["events"], st["batches"], st["max_depth"], st["max_latency_ms"],
+                     self.redraws_skipped, self.autosaves_skipped)
+
+    def _notify_stopped(self, recorded):
+        """정지 후 최종 저장이 끝나면(작업 스레드 완료 콜백) 결과를 알린다."""
         self._suppress = True
         try:
             if recorded == 0:   # 선택 모니터에서 아무 입력도 안 잡혔을 때 안내
@@ -514,7 +499,7 @@ class MouseAnalytics(tk.Tk):
                     "선택한 모니터에서 마우스 입력이 감지되지 않았습니다.\n"
                     "설정의 '모니터'가 작업 중인 화면과 같은지 확인하세요.")
             else:
-                messagebox.showinfo("저장 완료", f"세션이 저장되었습니다:\n{self.session_file}")
+                messagebox.showinfo("저장 완료", f"세션이 저장되었습니다:\n{self.engine.session_file}")
         finally:
             self._suppress = False
 
@@ -526,66 +511,40 @@ class MouseAnalytics(tk.Tk):
             return "blank"
 
     def _grab_session_shot(self):
-        """현재 단계의 배경을 캡처한다. '화면 배경 포함'이 꺼져 있으면 건너뛴다.
-
-        우리 창을 잠깐 withdraw 해 배경에 안 찍히게 하고, 실제로 사라질 시간을 둔 뒤
-        선택 모니터를 캡처한다. 최소화 옵션이면 캡처 후 작업표시줄에 최소화로 둔다."""
-        self._session_shot = None
-        try:
-            if not self.bg_include_var.get():
-                return
-        except Exception:
+        """현재 단계의 배경 캡처를 시작한다. '화면 배경 포함'이 꺼져 있으면 건너뛴다.
+
+        우리 창을 withdraw 해 배경에 안 찍히게 하고, 엔진의 캡처 스레드가
+        CAPTURE_HIDE_DELAY_MS 기다렸다가 기록 모니터를 찍는다. 메인 스레드는 바로 돌아가
+        UI·단축키가 살아 있고, 단계 렌더가 필요할 때 결과(Future)를 기다린다. 창이 숨은
+        동안의 입력은 평소처럼 타임스탬프를 달아 기록한다(우리 창이 없으니 자기 영역도 비움).
+        캡처가 끝나면 _poll_worker 가 창을 되돌린다(최소화 옵션이면 최소화로)."""
+        if self._heatmap_mode() != "screenshot":
             return
-        m = self._active_monitor
+        self._own_rect = None
         try:
             self.withdraw()
-            self.update()
-            time.sleep(0.2)            # 창이 화면에서 실제로 사라질 시간
-            self._session_shot = ImageGrab.grab(
-                bbox=(m.x, m.y, m.x + m.width, m.y + m.height),
-                all_screens=True).convert("RGBA")
         except Exception as e:
-            logging.error("Session screenshot failed: %s", e)
-        finally:
-            try:
-                self.iconify() if self.minimize_var.get() else self.deiconify()
-            except Exception:
+            logging.error("Window hide before capture failed: %s", e)
+        self._capture_hide = self.engine.capture_background(CAPTURE_HIDE_DELAY_MS / 1000)
+
+    def _restore_after_capture(self):
+        """배경 캡처가 끝난 뒤 창을 되돌린다(메인 스레드)."""
+        try:
+            if self.is_recording and self.minimize_var.get():
+                self.iconify()
+            else:
                 self.deiconify()
+        except Exception:
+            self.deiconify()
+        self._update_own_rect()
 
     def _finalize_step(self):
-        """현재 단계의 히트맵을 만들어 저장하고, 단계 통계를 기록한 뒤 카운터를 리셋한다."""
-        png = None
-        try:                           # 히트맵 빌드는 락 안에서 click_positions 를 스냅샷
-            png = self._build_heatmap_png(self._heatmap_mode(),
-                                          out_name=f"heatmap_step{self._step_no}.png")
-        except Exception as e:
-            logging.error("Step %d heatmap build failed: %s", self._step_no, e)
-        with self.lock:
-            self._steps.append({
-                "no": self._step_no, "png": png,
-                "left": self.click_counts[Button.left],
-                "right": self.click_counts[Button.right],
-                "middle": self.click_counts[Button.middle],
-                "scroll": self.scroll_count,
-                "keys": self.key_count,
-                "distance_mm": self.total_distance_mm,
-                "events": list(self.events),
-                "start": self._step_start or self.session_start,
-                "end": datetime.datetime.now(),
-            })
-            self.click_positions.clear()
-            self.click_counts = {Button.left: 0, Button.right: 0, Button.middle: 0}
-            self.total_distance_mm = 0.0
-            self.scroll_count = 0
-            self.key_count = 0
-            self._keys_down.clear()
-            self.events.clear()
-            self._last_move_pos = None
-            self._last_sample_pos = None
-            self._last_sample_t = 0.0
-            self._win_dist = 0.0
-        self._step_no += 1
-        self._step_start = datetime.datetime.now()
+        """현재 단계를 엔진에 마무리시킨다(통계 기록 + 카운터 리셋, 히트맵은 렌더 스레드)."""
+        try:
+            base_a = float(self.blue_base_var.get())
+        except Exception:
+            base_a = BLUE_BASE_DEFAULT
+        self.engine.finalize_step(self._heatmap_mode(), base_a)
 
     def advance_step(self):
         """현재 단계를 저장하고 다음 단계로 넘어간다(새 배경 캡처 + 카운터 리셋)."""
@@ -593,9 +552,9 @@ class MouseAnalytics(tk.Tk):
             return
         self._finalize_step()
         self._grab_session_shot()      # 다음 단계 화면을 새 배경으로
-        self.status_label.config(text=f"● 녹화 중 · 단계 {self._step_no}", fg="#d9534f")
+        self.status_label.config(text=f"● 녹화 중 · 단계 {self.engine.step_no}", fg="#d9534f")
         self.refresh_labels()
-        logging.info("Advanced to step %d", self._step_no)
+        logging.info("Advanced to step %d", self.engine.step_no)
 
     # --- 리스너 콜백 (리스너 스레드) ----------------------------------------
     def _safe(self, fn, *args):
@@ -605,6 +564,9 @@ class MouseAnalytics(tk.Tk):
         except Exception as e:
             logging.error("Listener callback error in %s: %s", fn.__name__, e)
 
+    # 콜백은 검사 몇 개만 하고 원시 이벤트를 엔진 입력 큐(engine.put)에 넣은 뒤 바로
+    # 돌아간다. 락/거리 계산/코얼레싱은 엔진 집계 스레드가 묶음으로 한다.
+    # OS 입력 훅 스레드를 붙잡지 않아야 시스템 커서가 끊기지 않는다.
     def on_click(self, x, y, button, pressed):
         self._safe(self._on_click, x, y, button, pressed)
 
@@ -613,22 +575,8 @@ class MouseAnalytics(tk.Tk):
             return
         if self._is_self_event(x, y):
             return
-        m = self._active_monitor
-        if not (m.x <= x < m.x + m.width and m.y <= y < m.y + m.height):
-            return
-        rx, ry = x - m.x, y - m.y
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        with self.lock:
-            if button in self.click_counts:
-                self.click_counts[button] += 1
-            self.click_positions.append((rx, ry))
-            if len(self.click_positions) > POINT_CAP:
-                self.click_positions.pop(0)
-            self.events.append((ts, "click", button.name, rx, ry,
-                                self._active_monitor_idx, ""))
-            if len(self.events) > POINT_CAP:
-                self.events.pop(0)
-        self.after(0, self.refresh_labels)
+        self.engine.put((EVT_CLICK, time.time_ns(), time.monotonic_ns(), x, y,
+                         BUTTON_CODES.get(button.name, 0), None))
 
     def on_move(self, x, y):
         self._safe(self._on_move, x, y)
@@ -638,32 +586,7 @@ class MouseAnalytics(tk.Tk):
             return
         if self._is_self_event(x, y):
             return
-        now = time.monotonic()
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        m = self._active_monitor
-        with self.lock:
-            if self._last_move_pos is not None:
-                d = math.hypot(x - self._last_move_pos[0], y - self._last_move_pos[1])
-                self.total_distance_mm += d / self._ppm   # 거리는 매 이벤트 누적
-                self._win_dist += d
-            self._last_move_pos = (x, y)
-
-            if self._last_sample_pos is None:
-                moved = float("inf")
-            else:
-                moved = math.hypot(x - self._last_sample_pos[0],
-                                   y - self._last_sample_pos[1])
-            # 코얼레싱: 100ms 경과 또는 50px 이동 시에만 샘플 1행 기록
-            if (now - self._last_sample_t) >= MOVE_MIN_INTERVAL_S or moved >= MOVE_MIN_DIST_PX:
-                if m.x <= x < m.x + m.width and m.y <= y < m.y + m.height:
-                    self.events.append((ts, "move", "", x - m.x, y - m.y,
-                                        self._active_monitor_idx, round(self._win_dist, 1)))
-                    if len(self.events) > POINT_CAP:
-                        self.events.pop(0)
-                self._last_sample_pos = (x, y)
-                self._last_sample_t = now
-                self._win_dist = 0.0
-        self.after(0, self.refresh_labels)
+        self.engine.put((EVT_MOVE, time.time_ns(), time.monotonic_ns(), x, y, 0, None))
 
     def on_scroll(self, x, y, dx, dy):
         self._safe(self._on_scroll, x, y, dx, dy)
@@ -673,17 +596,8 @@ class MouseAnalytics(tk.Tk):
             return
         if self._is_self_event(x, y):
             return
-        m = self._active_monitor
-        if not (m.x <= x < m.x + m.width and m.y <= y < m.y + m.height):
-            return
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        with self.lock:
-            self.scroll_count += abs(int(dy))
-            self.events.append((ts, "scroll", "", x - m.x, y - m.y,
-                                self._active_monitor_idx, ""))
-            if len(self.events) > POINT_CAP:
-                self.events.pop(0)
-        self.after(0, self.refresh_labels)
+        self.engine.put((EVT_SCROLL, time.time_ns(), time.monotonic_ns(), x, y,
+                         abs(int(dy)), None))
 
     def on_key_press(self, key):
         self._safe(self._on_key_press, key)
@@ -691,48 +605,74 @@ class MouseAnalytics(tk.Tk):
     def _on_key_press(self, key):
         """키 입력 '횟수'만 센다. 어떤 키인지(내용)는 events/엑셀에 절대 저장하지 않는다.
 
-        key 객체는 오토리피트 중복 제거(_keys_down)를 위해 메모리에서만 잠시 쓰이고
+        key 객체는 오토리피트 중복 제거(엔진의 _keys_down)를 위해 메모리에서만 잠시 쓰이고
         release 시 버려지며, 어디에도 기록되지 않는다."""
         if not self.is_recording or not self._rec_key or self._suppress:
             return
-        with self.lock:
-            if key in self._keys_down:      # 키를 누르고 있는 동안의 오토리피트 무시
-                return
-            self._keys_down.add(key)
-            self.key_count += 1
-        self.after(0, self.refresh_labels)
+        self.engine.put((_KEY_DOWN, 0, time.monotonic_ns(), 0, 0, 0, key))
 
     def on_key_release(self, key):
         self._safe(self._on_key_release, key)
 
     def _on_key_release(self, key):
-        with self.lock:
-            self._keys_down.discard(key)
+        self.engine.put((_KEY_UP, 0, time.monotonic_ns(), 0, 0, 0, key))
 
     # --- 라이브 UI 갱신 (메인 스레드) ---------------------------------------
     def refresh_labels(self):
-        with self.lock:
-            left = self.click_counts[Button.left]
-            right = self.click_counts[Button.right]
-            middle = self.click_counts[Button.middle]
-            dist_mm = self.total_distance_mm
-            scrolls = self.scroll_count
-            keys = self.key_count
+        """통계 라벨 4개를 갱신한다 -> 값이 그대로라 건너뛴 라벨 수."""
+        left, right, middle, dist_mm, scrolls, keys = self.engine.totals()
         total = left + right + middle
-        px = dist_mm * self._ppm
+        px = dist_mm * self.engine.ppm
         cm = dist_mm * MM_TO_CM
-        self.clicks_label.config(
-            text=f"클릭  총 {total}  (좌 {left} · 우 {right} · 휠 {middle})")
-        self.distance_label.config(text=f"이동 거리  {px:,.0f} px  /  {cm:.1f} cm")
-        self.scroll_label.config(text=f"스크롤  {scrolls} 칸")
-        self.key_label.config(text=f"키 입력  {keys} 회")
+        return sum((
+            self._set_label(self.clicks_label,
+                            f"클릭  총 {total}  (좌 {left} · 우 {right} · 휠 {middle})"),
+            self._set_label(self.distance_label, f"이동 거리  {px:,.0f} px  /  {cm:.1f} cm"),
+            self._set_label(self.scroll_label, f"스크롤  {scrolls} 칸"),
+            self._set_label(self.key_label, f"키 입력  {keys} 회"),
+        ))
+
+    def _set_label(self, label, text):
+        """텍스트가 바뀐 라벨만 다시 그린다 -> 같아서 건너뛰었으면 True."""
+        if self._label_text.get(label) == text:
+            return True
+        self._label_text[label] = text
+        label.config(text=text)
+        return False
+
+    def _ui_pump(self):
+        """UI_REFRESH_HZ 주기로, 새 이벤트가 집계됐을 때만 통계 라벨을 갱신한다."""
+        if self.engine.dirty:
+            self.redraws_skipped += self.refresh_labels()   # totals() 가 dirty 를 내린다
+        self.after(1000 // UI_REFRESH_HZ, self._ui_pump)
+
+    def _poll_worker(self):
+        """작업 스레드 완료 콜백 실행 + 진행 상태 표시(WORKER_POLL_MS 마다)."""
+        self.engine.poll()
+        running, waiting, renders = self.engine.status()
+        if self._capture_hide is not None and self._capture_hide.done():
+            self._capture_hide = None
+            self._restore_after_capture()
+        text = ""
+        if running is not None:
+            text = f"⏳ {running} 중…" + (f"  (대기 {waiting}건)" if waiting else "")
+        elif renders:
+            text = f"⏳ 단계 히트맵 {renders}건 렌더 중…"
+        self._set_label(self.job_label, text)
+        self.after(WORKER_POLL_MS, self._poll_worker)
 
     def tick(self):
         """1초마다: 경과시간 갱신 + 자동저장 카운트다운 + 자기영역 안전망 갱신."""
         self._update_own_rect()
-        if self.is_recording and self.session_start is not None:
-            elapsed = (datetime.datetime.now() - self.session_start).total_seconds()
-            self.time_label.config(text=f"경과 시간  {self._fmt_hms(elapsed)}")
+        st = self.engine.ingest_stats()
+        self._set_label(
+            self.pipeline_label,
+            f"입력 큐  {st['depth']}  ·  처리 지연  {st['latency_ms']:.1f} ms"
+            f"  (최대 {st['max_latency_ms']:.1f})")
+        self.engine.sync()                 # 1초마다 디스크로(비정상 종료 시 손실 최소화)
+        if self.is_recording and self.engine.session_start is not None:
+            elapsed = (datetime.datetime.now() - self.engine.session_start).total_seconds()
+            self.time_label.config(text=f"경과 시간  {AnalyticsEngine.fmt_hms(elapsed)}")
             self._autosave_remaining -= 1
             if self._autosave_remaining <= 0:
                 self.autosave()
@@ -740,226 +680,36 @@ class MouseAnalytics(tk.Tk):
         self.after(1000, self.tick)
 
     def autosave(self):
-        if self.is_recording and self.autosave_var.get():
-            self.export_excel("autosave")
-
-    @staticmethod
-    def _fmt_hms(seconds):
-        s = int(seconds)
-        return f"{s // 3600:02d}:{(s % 3600) // 60:02d}:{s % 60:02d}"
-
-    # --- 히트맵 -------------------------------------------------------------
-    def _build_heatmap_png(self, mode, out_name="heatmap.png"):
-        """클릭 위치 히트맵 PNG 생성 (mouse_click_move2.py:275-324 재사용).
-
-        mode='screenshot'면 화면 캡처 위에, 'blank'면 흰 캔버스 위에 합성한다.
-        out_name 으로 단계별 파일명을 분리한다.
-        """
-        monitor = self._active_monitor or self.current_monitor()
-        if mode == "screenshot" and self._session_shot is not None:
-            # 녹화 시작 때 캡처해 둔 세션 배경 사용(우리 창이 안 찍히고 안정적)
-            background = self._session_shot.copy()
-            actual_w, actual_h = background.size
-        elif mode == "screenshot":
-            # 세션 캡처가 없으면(녹화 중이 아닐 때 등) 즉시 캡처. ImageGrab bbox 는
-            # (left, top, right, bottom), all_screens=True 로 보조/음수 좌표까지 정확히.
-            bbox = (monitor.x, monitor.y,
-                    monitor.x + monitor.width, monitor.y + monitor.height)
-            self._suppress = True   # 캡처 순간의 자기 이벤트 무시
-            try:
-                background = ImageGrab.grab(bbox=bbox, all_screens=True).convert("RGBA")
-            finally:
-                self._suppress = False
-            actual_w, actual_h = background.size
-        else:
-            actual_w, actual_h = monitor.width, monitor.height
-            background = Image.new("RGBA", (actual_w, actual_h), (255, 255, 255, 255))
-
-        if actual_w <= 0 or actual_h <= 0:   # 방어: 잘못된 화면 크기
-            raise ValueError(f"화면 크기가 잘못됨({actual_w}x{actual_h}) — 모니터 선택을 확인하세요.")
-
-        with self.lock:
-            points = list(self.click_positions)
-
-        # 4K 빈 캔버스는 float32 ~33MB. 버튼/정지 시에만 호출되므로 허용.
-        heatmap_data = np.zeros((actual_h, actual_w), dtype=np.float32)
-        for px, py in points:
-            ix, iy = int(px), int(py)
-            if 0 <= ix < actual_w and 0 <= iy < actual_h:
-                heatmap_data[iy, ix] += 1
-
-        # 가우시안 블러를 float 로 수행(희소 클릭도 보존). 그 뒤 정규화.
-        blurred = _gaussian_blur(heatmap_data, GAUSS_SIGMA)
-        peak = float(blurred.max())
-        if peak > 0:                       # 빈 세션 NaN 방지
-            blurred = blurred / peak
-
-        # 색: turbo 컬러맵(부드러운 그라데이션) + 밀도 비례 알파(빈 곳 투명, 핫스팟 진하게)
-        norm = np.clip(blurred, 0.0, 1.0)
-        rgb = _turbo_rgb(norm)
-        colored = np.empty((actual_h, actual_w, 4), dtype=np.uint8)
-        colored[..., :3] = (rgb * 255).astype(np.uint8)
-        colored[..., 3] = ((norm ** HEAT_ALPHA_GAMMA) * HEAT_MAX_ALPHA * 255).astype(np.uint8)
-        heatmap_image = Image.fromarray(colored, mode="RGBA")
-
-        # 옅은 파란 베이스 한 겹(슬라이더로 조절) → 배경 위·히트맵 아래에 합성
-        try:
-            base_a = float(self.blue_base_var.get())
-        except Exception:
-            base_a = BLUE_BASE_DEFAULT
-        if base_a > 0:
-            base = Image.new("RGBA", (actual_w, actual_h),
-                             BLUE_BASE_RGB + (int(np.clip(base_a, 0.0, 1.0) * 255),))
-            background = Image.alpha_composite(background, base)
-
-        combined = Image.alpha_composite(background, heatmap_image)
-        png_path = os.path.join(self.temp_dir, out_name)
-        combined.convert("RGB").save(png_path, format="PNG")
-        return png_path
+        """마지막 저장 이후 바뀐 것이 없으면(유휴) 아무것도 하지 않는다."""
+        if not (self.is_recording and self.autosave_var.get()):
+            return
+        if not self.engine.unsaved():
+            self.autosaves_skipped += 1
+            return
+        self.export_excel("autosave")
 
     # --- 엑셀 저장 ----------------------------------------------------------
-    def export_excel(self, reason):
-        """summary(단계별 표) + 단계별 히트맵 시트(step1, step2…) + events 를 저장."""
-        if not self.session_start:
-            self.session_start = datetime.datetime.now()
-        if not self.session_file:
-            self.session_file = os.path.join(
-                self.save_dir(),
-                f"MouseAnalytics_{self.session_start:%Y%m%d_%H%M%S}.xlsx")
-
-        steps = list(self._steps)                       # 완료된 단계
-        with self.lock:                                  # 진행 중인 현재 단계 스냅샷
-            cur = {
-                "left": self.click_counts[Button.left],
-                "right": self.click_counts[Button.right],
-                "middle": self.click_counts[Button.middle],
-                "scroll": self.scroll_count,
-                "keys": self.key_count,
-                "distance_mm": self.total_distance_mm,
-                "n_events": len(self.events),
-            }
-        end = datetime.datetime.now()
-        monitor = self._active_monitor or self.current_monitor()
-
-        try:
-            wb = openpyxl.Workbook()
-            wb.remove(wb.active)
-            self._write_summary_sheet(wb, steps, cur, self.session_start, end, monitor)
-            for rec in steps:
-                ws = wb.create_sheet(f"step{rec['no']}")
-                if rec["png"] and os.path.exists(rec["png"]):
-                    try:
-                        ws.add_image(XLImage(rec["png"]), "A1")
-                    except Exception as e:
-                        logging.error("Embed step%d image failed: %s", rec["no"], e)
-            self._write_events_sheet(wb, steps)
-            self._atomic_save(wb, reason)
-        except Exception as e:
-            logging.error("Excel export failed (%s): %s", reason, e)
-            if reason != "autosave":
-                self._suppress = True
-                try:
-                    messagebox.showerror("오류", f"엑셀 저장 실패:\n{e}")
-                finally:
-                    self._suppress = False
-
-    def _write_summary_sheet(self, wb, steps, cur, start, end, monitor):
-        ws = wb.create_sheet("summary")
-        dpi = self._ppm * INCH_TO_MM
-        try:
-            mon_idx = self.monitors.index(monitor)
-        except ValueError:
-            mon_idx = self._active_monitor_idx
-        bg = "화면 캡처" if self._heatmap_mode() == "screenshot" else "빈 캔버스"
-        cur_active = (cur["left"] + cur["right"] + cur["middle"] + cur["n_events"]) > 0
-
-        info = [
-            ("세션 시작", start.strftime("%Y-%m-%d %H:%M:%S")),
-            ("세션 종료", end.strftime("%Y-%m-%d %H:%M:%S")),
-            ("지속 시간", self._fmt_hms((end - start).total_seconds())),
-            ("모니터", f"{mon_idx}: {monitor.width}x{monitor.height} at ({monitor.x},{monitor.y})"),
-            ("사용 DPI", round(dpi, 1)),
-            ("히트맵 배경", bg),
-            ("키보드 기록", "켜짐(횟수만)" if self._rec_key else "꺼짐"),
-            ("단계 수", len(steps) + (1 if cur_active else 0)),
-        ]
-        r = 1
-        for label, value in info:
-            ws.cell(row=r, column=1, value=label)
-            ws.cell(row=r, column=2, value=value)
-            r += 1
-        r += 1                                          # 빈 줄
-
-        header = ["단계", "좌클릭", "우클릭", "휠클릭", "총클릭",
-                  "스크롤(칸)", "키입력", "이동(cm)", "지속"]
-        for c, h in enumerate(header, start=1):
-            cell = ws.cell(row=r, column=c, value=h)
-            cell.font = openpyxl.styles.Font(bold=True)
-        r += 1
-
-        tot = {"left": 0, "right": 0, "middle": 0, "scroll": 0, "keys": 0, "dist": 0.0}
-
-        def step_row(rownum, label, left, right, middle, scroll, keys, dist_mm, dur):
-            vals = [label, left, right, middle, left + right + middle,
-                    scroll, keys, round(dist_mm * MM_TO_CM, 1), dur]
-            for c, v in enumerate(vals, start=1):
-                ws.cell(row=rownum, column=c, value=v)
-
-        for rec in steps:
-            step_row(r, rec["no"], rec["left"], rec["right"], rec["middle"],
-                     rec["scroll"], rec["keys"], rec["distance_mm"],
-                     self._fmt_hms((rec["end"] - rec["start"]).total_seconds()))
-            tot["left"] += rec["left"]; tot["right"] += rec["right"]
-            tot["middle"] += rec["middle"]; tot["scroll"] += rec["scroll"]
-            tot["keys"] += rec["keys"]; tot["dist"] += rec["distance_mm"]
-            r += 1
-        if cur_active:
-            step_row(r, "현재(진행중)", cur["left"], cur["right"], cur["middle"],
-                     cur["scroll"], cur["keys"], cur["distance_mm"], "")
-            tot["left"] += cur["left"]; tot["right"] += cur["right"]
-            tot["middle"] += cur["middle"]; tot["scroll"] += cur["scroll"]
-            tot["keys"] += cur["keys"]; tot["dist"] += cur["distance_mm"]
-            r += 1
-
-        step_row(r, "합계", tot["left"], tot["right"], tot["middle"],
-                 tot["scroll"], tot["keys"], tot["dist"], "")
-        for c in range(1, 10):
-            ws.cell(row=r, column=c).font = openpyxl.styles.Font(bold=True)
-
-        ws.column_dimensions["A"].width = 14
-        for col in "BCDEFGHI":
-            ws.column_dimensions[col].width = 10
-
-    def _write_events_sheet(self, wb, steps):
-        ws = wb.create_sheet("events")
-        ws.append(["step", "timestamp", "event_type", "button", "x", "y",
-                   "monitor_index", "distance_delta_px"])
-        for rec in steps:
-            for row in rec["events"]:
-                ws.append([rec["no"]] + list(row))
-
-    def _atomic_save(self, wb, reason):
-        """temp 파일에 쓴 뒤 원자적 교체. 원본이 잠겨 있으면 백업본으로 저장."""
-        final = self.session_file
-        tmp = final + ".tmp"
-        wb.save(tmp)
-        try:
-            os.replace(tmp, final)
-            logging.info("Excel saved (%s): %s", reason, final)
-        except (PermissionError, OSError):
-            stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup = os.path.join(os.path.dirname(final),
-                                  f"MouseAnalytics_backup_{stamp}.xlsx")
-            os.replace(tmp, backup)
-            logging.warning("Final locked; saved backup: %s", backup)
-            if reason != "autosave":
-                self._suppress = True
-                try:
+    def export_excel(self, reason, on_saved=None):
+        """엔진에 통합문서 저장을 건다(쓰기는 작업 스레드). 끝나면 on_saved() 를 메인 스레드에서."""
+        self.engine.export(
+            reason, on_done=lambda backup, error: self._on_export_done(reason, backup, error,
+                                                                       on_saved))
+
+    def _on_export_done(self, reason, backup, error, on_saved):
+        """엑셀 저장 완료 콜백(메인 스레드): 실패/백업 알림. 자동저장은 조용히 넘어간다."""
+        if reason != "autosave" and (error is not None or backup):
+            self._suppress = True
+            try:
+                if error is not None:
+                    messagebox.showerror("오류", f"엑셀 저장 실패:\n{error}")
+                else:
                     messagebox.showwarning(
                         "파일 잠금",
                         f"원본 파일이 열려 있어 백업으로 저장했습니다:\n{backup}")
-                finally:
-                    self._suppress = False
+            finally:
+                self._suppress = False
+        if error is None and on_saved is not None:
+            on_saved()
 
     # --- 종료 ---------------------------------------------------------------
     def on_closing(self):
@@ -985,6 +735,11 @@ class MouseAnalytics(tk.Tk):
                 self.export_excel("close")
             except Exception as e:
                 logging.error("Final export on close failed: %s", e)
+            self.engine.end_session()
+        # 남은 렌더/저장 작업이 끝날 때까지 기다린다(종료 시에만 블로킹)
+        self.status_label.config(text="저장 마무리 중…", fg="gray")
+        self.update_idletasks()
+        self.engine.close()
         if self.keyboard_listener is not None:
             try:
                 self.keyboard_listener.stop()
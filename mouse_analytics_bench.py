@@ -0,0 +1,552 @@
+"""mouse_analytics(analytics_engine) 히트맵 파이프라인 벤치마크.
+
+블러 엔진(_gaussian_blur)을 예전 행/열 루프 구현과 비교해
+  · 결과가 같은지(parity: 최대 오차 / 피크) 확인하고
+  · 1080p / 1440p / 4K 해상도별 소요 시간을 표로 출력한다.
+밀도 계산의 스탬프 찍기 경로(_splat_density)도 전체 화면 블러와 비교한다.
+events 시트 저장은 예전 방식(일반 통합문서에 셀 단위 append)과 지금 방식(write_only
+통합문서 + 단계별 행 XML 조각), 조각을 재사용하는 두 번째 저장(자동저장), 시트 대신
+gzip CSV 사이드카로 쓰는 경우를 이벤트 수별로 비교한다(시간 · tracemalloc 최대 할당 · RSS 증가(psutil 있을 때)).
+정지 시 단계 히트맵 렌더(4K 배경, 여러 단계)를 렌더 스레드 수별로 잰다.
+파이프라인 벤치마크는 해상도(1080p / 4K / 8K …)마다 합성 세션(시드 고정 클릭 · 이동,
+생성한 가짜 스크린샷)을 엔진에 넣어 단계별(누적 · 블러 · 정규화 · 색표 · 합성 · 인코딩 ·
+임베드 · 저장) 시간과 tracemalloc 최대 할당을 재고, 예전 mouse_click_move2
+SettingsWindow.save_heatmap 을 (scipy · matplotlib 가 있으면) 같은 입력으로 비교한다.
+--json 을 주면 모든 결과를 실행끼리 diff 할 수 있는 JSON 으로 남긴다.
+
+사용법:
+    python mouse_analytics_bench.py [--sigma 30] [--points 300] [--repeat 3]
+                                    [--events 10000,100000,1000000] [--render-steps 10]
+                                    [--pipeline 1080p,4K,8K] [--pipeline-steps 3]
+                                    [--moves 20000] [--seed 0] [--json out.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType, SimpleNamespace
+
+import numpy as np
+import openpyxl
+
+try:
+    import psutil
+except ImportError:          # RSS 측정은 선택(없으면 tracemalloc 만)
+    psutil = None
+
+from event_store import EVENT_DTYPE, EVENT_COLUMNS, EVT_CLICK, EVT_MOVE, event_rows
+import PIL
+from PIL import Image
+
+from analytics_engine import (GAUSS_SIGMA, HEAT_GRID_SCALE, BLUE_BASE_DEFAULT, RENDER_WORKERS,
+                              RENDER_PNG_PROFILE, AnalyticsEngine, _gaussian_blur,
+                              _new_heat_grid, _render_step_png, _splat_density, _sidecar_path,
+                              _splice_sheet_parts, _grid_density, _density_levels,
+                              _composite_tables,
+                              _save_png, _overlay_bytes, _embed_bytes)
+
+RESOLUTIONS = [("1080p", 1920, 1080), ("1440p", 2560, 1440), ("4K", 3840, 2160)]
+PARITY_TOL = 1e-5            # 피크 대비 허용 오차(float32 누적 오차 수준)
+EXPORT_SIZES = (10_000, 100_000, 1_000_000)
+EXPORT_STEPS = 4             # 합성 세션의 단계 수(이벤트를 고르게 나눔)
+PIPELINE_RESOLUTIONS = {"1080p": (1920, 1080), "1440p": (2560, 1440),
+                        "4K": (3840, 2160), "8K": (7680, 4320)}
+PIPELINE_STAGES = ("accumulate", "blur", "normalize", "colormap", "composite",
+                   "encode", "embed", "save")
+STAGE_LABELS = {"accumulate": "누적", "blur": "블러", "normalize": "정규화", "colormap": "색표",
+                "composite": "합성", "encode": "인코딩", "embed": "임베드", "save": "저장",
+                "render": "렌더"}
+LEGACY_MAX_PIXELS = 3840 * 2160   # 예전 save_heatmap 비교 상한(8K 는 float64 RGBA 컬러맵만 1GB)
+
+
+def _gaussian_blur_loop(arr, sigma):
+    """비교 기준: 예전 구현(행마다, 열마다 np.convolve 를 파이썬 루프로 호출)."""
+    arr = np.asarray(arr, dtype=np.float32)
+    radius = int(max(1, round(3.0 * sigma)))
+    xs = np.arange(-radius, radius + 1, dtype=np.float32)
+    k = np.exp(-(xs * xs) / (2.0 * sigma * sigma)).astype(np.float32)
+    k /= k.sum()
+    out = np.empty_like(arr)
+    for i in range(arr.shape[0]):
+        out[i] = np.convolve(arr[i], k, mode="same")
+    for j in range(out.shape[1]):
+        out[:, j] = np.convolve(out[:, j], k, mode="same")
+    return out
+
+
+def _synthetic_points(w, h, n, seed=0):
+    """재현 가능한 클릭 좌표 (n, 2). 몇 개의 핫스팟 주변에 몰리게 만든다."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform((0, 0), (w, h), size=(8, 2))
+    pts = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 60, size=(n, 2))
+    xs = np.clip(pts[:, 0].astype(int), 0, w - 1)
+    ys = np.clip(pts[:, 1].astype(int), 0, h - 1)
+    return np.stack([xs, ys], axis=1)
+
+
+def _synthetic_clicks(w, h, n, seed=0):
+    """_synthetic_points 를 누적한 클릭 격자(float32)."""
+    pts = _synthetic_points(w, h, n, seed)
+    grid = np.zeros((h, w), dtype=np.float32)
+    np.add.at(grid, (pts[:, 1], pts[:, 0]), 1)
+    return grid
+
+
+def _synthetic_events(n, seed=0):
+    """재현 가능한 EVENT_DTYPE 배열: 이동 9 : 클릭 1, 1ms 간격."""
+    rng = np.random.default_rng(seed)
+    ev = np.zeros(n, dtype=EVENT_DTYPE)
+    ev["wall_ns"] = time.time_ns() + np.arange(n, dtype=np.int64) * 1_000_000
+    ev["mono_ns"] = ev["wall_ns"]
+    click = rng.random(n) < 0.1
+    ev["type"] = np.where(click, EVT_CLICK, EVT_MOVE)
+    ev["button"] = np.where(click, 1, 0)
+    ev["x"] = rng.integers(0, 1920, n)
+    ev["y"] = rng.integers(0, 1080, n)
+    ev["dist"] = np.where(click, np.nan, rng.uniform(0, 80, n))
+    return ev
+
+
+def _write_events_inmemory(path, steps, ev):
+    """비교 기준: 예전 저장(일반 통합문서에 단계별 전체 이벤트를 한 행씩 append)."""
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    ws = wb.create_sheet("events")
+    ws.append(["step"] + EVENT_COLUMNS)
+    for rec in steps:
+        for row in event_rows(ev[slice(*rec["span"])]):
+            ws.append((rec["no"],) + row)
+    wb.save(path)
+
+
+def _write_events_streaming(path, steps, ev):
+    """지금 저장 경로: write_only 통합문서 + AnalyticsEngine._write_events 조각."""
+    wb = openpyxl.Workbook(write_only=True)
+    layout = AnalyticsEngine._events_layout(steps, xlsx_path=path, ring=(0, ev))
+    parts = AnalyticsEngine._write_events(wb, steps, layout, part_dir=os.path.dirname(path))
+    wb.save(path)
+    _splice_sheet_parts(path, {ws.path.lstrip("/"): c for ws, c in parts.items()})
+
+
+def _write_events_sidecar(path, steps, ev):
+    """사이드카 경로: 이벤트 수와 상관없이 gzip CSV 로 쓴다."""
+    wb = openpyxl.Workbook(write_only=True)
+    layout = AnalyticsEngine._events_layout(steps, xlsx_path=path, ring=(0, ev))
+    layout.update(sidecar=_sidecar_path(path), shards=None)
+    AnalyticsEngine._write_events(wb, steps, layout, part_dir=os.path.dirname(path))
+
+
+def _measure(fn):
+    """fn() 한 번의 (초, tracemalloc 최대 MB, RSS 증가 MB 또는 None)."""
+    proc = psutil.Process() if psutil is not None else None
+    rss0 = proc.memory_info().rss if proc is not None else 0
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    rss = (proc.memory_info().rss - rss0) / 2**20 if proc is not None else None
+    tracemalloc.start()            # 할당 추적은 느려서 시간 측정과 따로 한 번 더 돌린다
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak, rss
+
+
+def bench_export(sizes=EXPORT_SIZES):
+    """이벤트 수별 (n, 방식, 초, 최대 할당 MB, RSS 증가 MB) 목록을 돌려준다."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.xlsx")
+        for n in sizes:
+            ev = _synthetic_events(n)
+            bounds = np.linspace(0, n, EXPORT_STEPS + 1).astype(int)
+            steps = [{"no": i + 1, "span": (int(bounds[i]), int(bounds[i + 1]))}
+                     for i in range(EXPORT_STEPS)]
+            fresh = lambda: [dict(rec) for rec in steps]      # 조각 캐시 없는 단계 기록
+            cached = fresh()
+            _write_events_streaming(path, cached, ev)         # 조각을 한 번 만들어 둔다
+            for name, fn in (("예전", lambda: _write_events_inmemory(path, fresh(), ev)),
+                             ("새 저장", lambda: _write_events_streaming(path, fresh(), ev)),
+                             ("재저장", lambda: _write_events_streaming(path, cached, ev)),
+                             ("사이드카", lambda: _write_events_sidecar(path, fresh(), ev))):
+                rows.append((n, name) + _measure(fn))
+    return rows
+
+
+def bench_render(steps=10, points=300):
+    """4K 단계 steps 개 렌더를 스레드 1, 2, 4 … RENDER_WORKERS 개로 -> (스레드 수, 초) 목록."""
+    w, h = 3840, 2160
+    rng = np.random.default_rng(0)
+    background = Image.fromarray(rng.integers(0, 255, (h, w, 3), dtype=np.uint8))
+    grids = []
+    for i in range(steps):
+        grid = _new_heat_grid(w, h)
+        pts = _synthetic_points(w, h, points, seed=i)
+        np.add.at(grid, (pts[:, 1] // HEAT_GRID_SCALE, pts[:, 0] // HEAT_GRID_SCALE), 1)
+        grids.append(grid)
+    counts = sorted({1, RENDER_WORKERS} | {n for n in (2, 4, 8, 16) if n < RENDER_WORKERS})
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in counts:
+            def run():
+                with ThreadPoolExecutor(n) as pool:
+                    futures = [pool.submit(_render_step_png, g, background, BLUE_BASE_DEFAULT,
+                                           (w, h), os.path.join(tmp, f"step{i}.png"))
+                               for i, g in enumerate(grids)]
+                    return [f.result() for f in futures]       # 단계 순서대로
+            rows.append((n, _best_of(run, 1)[0]))
+    return rows
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def bench_blur(sigma=GAUSS_SIGMA, points=300, repeat=3):
+    """해상도별 (이름, 예전 초, 새 초, 오차/피크) 목록을 돌려준다."""
+    rows = []
+    for name, w, h in RESOLUTIONS:
+        grid = _synthetic_clicks(w, h, points)
+        t_old, ref = _best_of(lambda: _gaussian_blur_loop(grid, sigma), 1)
+        t_new, out = _best_of(lambda: _gaussian_blur(grid, sigma), repeat)
+        peak = float(ref.max()) or 1.0
+        err = float(np.abs(out - ref).max()) / peak
+        rows.append((name, t_old, t_new, err))
+    return rows
+
+
+def bench_splat(sigma=GAUSS_SIGMA, points=300, repeat=3):
+    """해상도별 (이름, 전체 블러 초, 스탬프 초, 오차/피크) 목록을 돌려준다."""
+    rows = []
+    for name, w, h in RESOLUTIONS:
+        pts = _synthetic_points(w, h, points)
+        grid = _synthetic_clicks(w, h, points)
+        t_blur, ref = _best_of(lambda: _gaussian_blur(grid, sigma), repeat)
+        t_splat, out = _best_of(lambda: _splat_density(pts, w, h, sigma), repeat)
+        peak = float(ref.max()) or 1.0
+        rows.append((name, t_blur, t_splat, float(np.abs(out - ref).max()) / peak))
+    return rows
+
+
+def _synthetic_screen(w, h, seed=0):
+    """헤드리스용 가짜 스크린샷(RGB): 세로 그라데이션 바탕 위에 제목 표시줄이 달린 창 사각형들."""
+    rng = np.random.default_rng(seed)
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    img[:] = np.linspace(40, 90, h).astype(np.uint8)[:, None, None]
+    bar = max(4, h // 60)
+    for _ in range(24):
+        x0, y0 = int(rng.integers(0, w - 40)), int(rng.integers(0, h - 40))
+        x1, y1 = min(w, x0 + int(rng.integers(40, w // 3))), min(h, y0 + int(rng.integers(30, h // 3)))
+        img[y0:y1, x0:x1] = rng.integers(120, 250, 3)
+        img[y0:y0 + bar, x0:x1] = (45, 90, 160)
+    return Image.fromarray(img, mode="RGB")
+
+
+def _synthetic_step(w, h, clicks, moves, seed=0):
+    """재현 가능한 한 단계 입력 -> (종류, x, y) 배열. 핫스팟 클릭과 무작위 걸음 이동을 섞는다."""
+    rng = np.random.default_rng(seed)
+    pts = _synthetic_points(w, h, clicks, seed)
+    walk = np.cumsum(rng.normal(0, 12, size=(moves, 2)), axis=0) + (w / 2, h / 2)
+    walk = np.clip(walk, 0, (w - 1, h - 1)).astype(np.int64)
+    kinds = np.concatenate([np.full(clicks, EVT_CLICK), np.full(moves, EVT_MOVE)])
+    xs = np.concatenate([pts[:, 0], walk[:, 0]])
+    ys = np.concatenate([pts[:, 1], walk[:, 1]])
+    order = rng.permutation(len(kinds))
+    return kinds[order], xs[order], ys[order]
+
+
+def _feed(engine, kinds, xs, ys):
+    """리스너 콜백처럼 이벤트 튜플을 engine.put 으로 넣고 집계가 끝날 때까지 기다린다."""
+    wall, mono = time.time_ns(), time.monotonic_ns()
+    for i, (kind, x, y) in enumerate(zip(kinds.tolist(), xs.tolist(), ys.tolist())):
+        engine.put((kind, wall + i * 1_000_000, mono + i * 1_000_000, x, y,
+                    1 if kind == EVT_CLICK else 0, None))
+    engine.flush(timeout=600)
+
+
+def _levels_at(density, peak, size):
+    """색표 단계 앞부분: 피크로 정규화한 밀도 -> 256 단계 -> 화면 크기(_composite_heatmap 과 같은 일)."""
+    levels = _density_levels(density, peak)
+    if levels.shape != (size[1], size[0]):
+        levels = np.asarray(Image.fromarray(levels, mode="L").resize(size, Image.BILINEAR))
+    return levels
+
+
+def _lookup(scale, offset, q):
+    """색표 단계 뒷부분: 행 묶음의 단계마다 합성 계수를 찾아 붙인다(프레임 전체 픽셀)."""
+    return scale[q][..., None], offset[q]
+
+
+def _blend(out, y0, s, o):
+    """합성 단계: 배경 행 묶음 × 계수 + 오프셋, 반올림해 RGB 버퍼에 덮어쓴다."""
+    blk = out[y0:y0 + len(s)] * s + o
+    np.rint(blk, out=blk)
+    out[y0:y0 + len(s)] = blk.clip(0, 255)
+
+
+def _colormap_composite(stage, density, background, base_a):
+    """_composite_heatmap 의 배경 합성 경로를 정규화 · 색표 · 합성 단계로 나눠 잰다 -> RGB 이미지.
+
+    행 묶음(약 1M 픽셀)마다 색표(계수 찾기)와 합성(곱·더하기·반올림)을 번갈아 하므로
+    stage 를 묶음마다 불러 단계별로 더한다. 결과는 _composite_heatmap 과 같다."""
+    w, h = background.size
+    peak = stage("normalize", lambda: float(density.max()))
+    levels = stage("colormap", _levels_at, density, peak, (w, h))
+    scale, offset = _composite_tables(base_a)
+    out = stage("composite", lambda: np.array(background.convert("RGB"), dtype=np.uint8))
+    rows = max(1, (1 << 20) // max(1, w))
+    for y0 in range(0, h, rows):
+        s, o = stage("colormap", _lookup, scale, offset, levels[y0:y0 + rows])
+        stage("composite", _blend, out, y0, s, o)
+    return Image.fromarray(out, mode="RGB")
+
+
+def _export(engine):
+    """저장 단계: 엔진 최종 저장(작업 스레드)을 걸고 끝날 때까지 기다린다."""
+    done = []
+    engine.export("stop", on_done=lambda backup, error: done.append(error))
+    while not done:
+        engine.poll()
+        time.sleep(0.005)
+    if done[0] is not None:
+        raise done[0]
+
+
+def _pipeline_pass(w, h, steps, clicks, moves, sigma, seed, traced):
+    """한 해상도의 합성 세션을 처음부터 저장까지 한 번 -> ({단계: 값}, 통합문서 MB).
+
+    값은 traced=False 면 단계 합계 초, True 면 그 단계가 더한 tracemalloc 최대 할당(MB,
+    단계들 중 최대). accumulate 와 save 는 엔진 그대로(put/flush, export), 그 사이는
+    _render_step_png 의 단계를 하나씩 떼어 같은 격자로 잰다. render 는 엔진이 실제로
+    렌더한 시간(finalize_step → 결과)으로 단계 합과 맞춰 볼 수 있다."""
+    screen = _synthetic_screen(w, h, seed)
+    monitor = SimpleNamespace(x=0, y=0, width=w, height=h, name="bench")
+    out = dict.fromkeys(PIPELINE_STAGES + ("render",), 0.0)
+
+    def stage(name, fn, *args):
+        if traced:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        result = fn(*args)
+        if traced:
+            out[name] = max(out[name], (tracemalloc.get_traced_memory()[1] - base) / 2**20)
+        else:
+            out[name] += time.perf_counter() - t0
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx = os.path.join(tmp, "bench.xlsx")
+        engine = AnalyticsEngine(tmp, grab=lambda m: screen)
+        try:
+            engine.start(xlsx, [monitor], [0], heatmap_mode="screenshot")
+            for k in range(steps):
+                engine.capture_background()
+                step = _synthetic_step(w, h, clicks, moves, seed + k)
+                stage("accumulate", _feed, engine, *step)
+                with engine.lock:
+                    grid = engine._heat_grids[0].copy()
+                stage("render", lambda: engine.finalize_step()["render"].result())
+                density = stage("blur", _grid_density, grid, sigma / HEAT_GRID_SCALE)
+                combined = _colormap_composite(stage, density, screen, BLUE_BASE_DEFAULT)
+                stage("encode", _save_png, combined, os.path.join(tmp, f"stage{k}.png"),
+                      RENDER_PNG_PROFILE)
+                stage("embed", _overlay_bytes, density, BLUE_BASE_DEFAULT, combined.size)
+                if k == 0:                     # 배경 미리보기는 배경마다 한 번(_BackgroundCache)
+                    stage("embed", _embed_bytes, screen)
+            stage("save", _export, engine)
+            engine.end_session()
+        finally:
+            engine.close()
+        return out, os.path.getsize(xlsx) / 2**20 if os.path.exists(xlsx) else None
+
+
+def bench_pipeline(names, steps=3, clicks=300, moves=20_000, sigma=GAUSS_SIGMA, seed=0):
+    """해상도별 파이프라인 결과 dict 목록(시간 패스 한 번 + tracemalloc 패스 한 번)."""
+    rows = []
+    for name in names:
+        w, h = PIPELINE_RESOLUTIONS[name]
+        seconds, xlsx_mb = _pipeline_pass(w, h, steps, clicks, moves, sigma, seed, traced=False)
+        tracemalloc.start()            # 할당 추적은 느려서 시간 측정과 따로 한 번 더 돌린다
+        try:
+            peaks, _ = _pipeline_pass(w, h, steps, clicks, moves, sigma, seed, traced=True)
+        finally:
+            tracemalloc.stop()
+        rows.append({"resolution": name, "width": w, "height": h, "steps": steps,
+                     "clicks_per_step": clicks, "moves_per_step": moves, "sigma": sigma,
+                     "seconds": seconds, "peak_mb": peaks,
+                     "total_s": sum(seconds[k] for k in PIPELINE_STAGES), "xlsx_mb": xlsx_mb})
+    return rows
+
+
+def _import_legacy(screen):
+    """예전 도구(mouse_click_move2)를 가짜 GUI 모듈 위에서 불러온다 -> (모듈, None) 또는 (None, 이유).
+
+    Tk · pynput · screeninfo 는 스트레스 하네스의 가짜 모듈, pyautogui 는 screen 을
+    돌려주는 가짜로 바꾼다. scipy · matplotlib 가 없으면 비교를 건너뛴다."""
+    from mouse_analytics_stress import _install_stubs
+    _install_stubs([])
+    pyautogui = ModuleType("pyautogui")
+    pyautogui.screenshot = lambda region=None: screen[0]
+    sys.modules["pyautogui"] = pyautogui
+    try:
+        import mouse_click_move2
+    except ImportError as e:
+        return None, str(e)
+    return mouse_click_move2, None
+
+
+def bench_legacy(names, clicks=300, moves=20_000, seed=0):
+    """해상도별 예전 SettingsWindow.save_heatmap 한 장 -> dict 목록(또는 건너뛴 이유)."""
+    screen = [None]
+    legacy, reason = _import_legacy(screen)
+    rows = []
+    for name in names:
+        w, h = PIPELINE_RESOLUTIONS[name]
+        if legacy is None or w * h > LEGACY_MAX_PIXELS:
+            rows.append({"resolution": name, "skipped": reason or "LEGACY_MAX_PIXELS 초과"})
+            continue
+        screen[0] = _synthetic_screen(w, h, seed)
+        kinds, xs, ys = _synthetic_step(w, h, clicks, moves, seed)
+        pos = list(zip(xs.tolist(), ys.tolist()))
+        click = (kinds == EVT_CLICK).tolist()
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy.filedialog.asksaveasfile = lambda **kw: open(os.path.join(tmp, "legacy.png"), "wb")
+            fake = SimpleNamespace(
+                lock=threading.Lock(),
+                click_positions=[p for p, c in zip(pos, click) if c],
+                move_positions=[p for p, c in zip(pos, click) if not c],
+                input_monitor=SimpleNamespace(x=0, y=0, width=w, height=h),
+                record_clicks_var=SimpleNamespace(get=lambda: True),
+                record_movement_var=SimpleNamespace(get=lambda: True),
+                cmap_combo=SimpleNamespace(get=lambda: "jet"),
+                colormap_alpha_var=SimpleNamespace(get=lambda: 0.6))
+            run = lambda: legacy.SettingsWindow.save_heatmap(fake)
+            sec, peak, _ = _measure(run)
+        rows.append({"resolution": name, "seconds": sec, "peak_mb": peak})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="히트맵 블러 엔진 parity/속도 벤치마크")
+    ap.add_argument("--sigma", type=float, default=GAUSS_SIGMA)
+    ap.add_argument("--points", type=int, default=300)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--events", default=",".join(str(n) for n in EXPORT_SIZES),
+                    help="events 시트 저장 벤치마크 이벤트 수(쉼표 구분, 빈 값이면 생략)")
+    ap.add_argument("--render-steps", type=int, default=10,
+                    help="병렬 렌더 벤치마크 단계 수(0 이면 생략)")
+    ap.add_argument("--pipeline", default="1080p,4K,8K",
+                    help=f"파이프라인 벤치마크 해상도(쉼표 구분, 빈 값이면 생략): "
+                         f"{', '.join(PIPELINE_RESOLUTIONS)}")
+    ap.add_argument("--pipeline-steps", type=int, default=3, help="파이프라인 합성 세션 단계 수")
+    ap.add_argument("--moves", type=int, default=20_000, help="파이프라인 단계당 이동 이벤트 수")
+    ap.add_argument("--seed", type=int, default=0, help="합성 데이터 시드")
+    ap.add_argument("--json", help="모든 결과를 이 JSON 파일로 저장(실행끼리 diff 용)")
+    args = ap.parse_args()
+    pipeline = [n for n in args.pipeline.split(",") if n.strip()]
+    for name in pipeline:
+        if name not in PIPELINE_RESOLUTIONS:
+            ap.error(f"알 수 없는 해상도: {name} (가능: {', '.join(PIPELINE_RESOLUTIONS)})")
+    results = {
+        "meta": {"time": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "platform": platform.platform(), "python": platform.python_version(),
+                 "cpu_count": os.cpu_count(), "numpy": np.__version__,
+                 "pillow": PIL.__version__, "openpyxl": openpyxl.__version__},
+        "params": vars(args),
+    }
+
+    print(f"가우시안 블러 (sigma={args.sigma:g}, 클릭 {args.points}개)")
+    print(f"{'해상도':<8}{'예전(s)':>10}{'새(s)':>10}{'배속':>8}{'오차/피크':>12}")
+    ok = True
+    results["blur"] = []
+    for name, t_old, t_new, err in bench_blur(args.sigma, args.points, args.repeat):
+        print(f"{name:<8}{t_old:>10.3f}{t_new:>10.3f}{t_old / t_new:>7.1f}x{err:>12.2e}")
+        ok = ok and err <= PARITY_TOL
+        results["blur"].append({"resolution": name, "loop_s": t_old, "new_s": t_new,
+                                "err_over_peak": err})
+
+    print()
+    print(f"밀도 계산: 전체 블러 vs 스탬프 찍기 (클릭 {args.points}개)")
+    print(f"{'해상도':<8}{'블러(s)':>10}{'스탬프(s)':>10}{'배속':>8}{'오차/피크':>12}")
+    results["splat"] = []
+    for name, t_blur, t_splat, err in bench_splat(args.sigma, args.points, args.repeat):
+        print(f"{name:<8}{t_blur:>10.3f}{t_splat:>10.3f}{t_blur / t_splat:>7.1f}x{err:>12.2e}")
+        ok = ok and err <= PARITY_TOL
+        results["splat"].append({"resolution": name, "blur_s": t_blur, "splat_s": t_splat,
+                                 "err_over_peak": err})
+    print("parity: OK" if ok else f"parity: 실패 (허용 {PARITY_TOL:g} 초과)")
+    results["parity_ok"] = ok
+
+    sizes = [int(n) for n in args.events.split(",") if n.strip()]
+    if sizes:
+        print()
+        print("events 저장: 일반 통합문서 vs write_only + 조각 (재저장 = 조각 재사용) vs 사이드카")
+        print(f"{'이벤트':>10}  {'방식':<8}{'시간(s)':>10}{'최대할당(MB)':>14}{'RSS증가(MB)':>13}")
+        results["export"] = []
+        for n, name, sec, peak, rss in bench_export(sizes):
+            results["export"].append({"events": n, "method": name, "seconds": sec,
+                                      "peak_mb": peak, "rss_mb": rss})
+            rss = f"{rss:>13.1f}" if rss is not None else f"{'-':>13}"
+            print(f"{n:>10,}  {name:<8}{sec:>10.2f}{peak:>14.1f}{rss}")
+
+    if args.render_steps:
+        print()
+        print(f"단계 히트맵 렌더: 4K 배경 {args.render_steps}단계 (코어 {os.cpu_count()}개)")
+        print(f"{'스레드':>6}{'시간(s)':>10}{'배속':>8}")
+        rows = bench_render(args.render_steps, args.points)
+        for n, sec in rows:
+            print(f"{n:>6}{sec:>10.2f}{rows[0][1] / sec:>7.1f}x")
+        results["render"] = [{"threads": n, "seconds": sec} for n, sec in rows]
+
+    if pipeline:
+        print()
+        print(f"파이프라인 단계별 시간(s) · 최대 할당(MB): {args.pipeline_steps}단계 합계, "
+              f"단계당 클릭 {args.points} · 이동 {args.moves:,}, sigma {args.sigma:g}")
+        stages = PIPELINE_STAGES + ("render",)
+        print(f"{'해상도':<7}{'':<4}" + "".join(f"{STAGE_LABELS[k]:>8}" for k in stages)
+              + f"{'합계':>8}{'xlsx MB':>9}")
+        results["pipeline"] = bench_pipeline(pipeline, args.pipeline_steps, args.points,
+                                             args.moves, args.sigma, args.seed)
+        for r in results["pipeline"]:
+            print(f"{r['resolution']:<7}{'s':<4}" + "".join(f"{r['seconds'][k]:>8.3f}" for k in stages)
+                  + f"{r['total_s']:>8.2f}{r['xlsx_mb'] or 0:>9.1f}")
+            print(f"{'':<7}{'MB':<4}" + "".join(f"{r['peak_mb'][k]:>8.1f}" for k in stages))
+        print("(렌더 = 엔진이 실제로 단계를 렌더한 시간. 블러~임베드를 한 번에 한다)")
+
+        print()
+        print("예전 mouse_click_move2 SettingsWindow.save_heatmap (한 장) vs 지금 렌더(단계당)")
+        results["legacy"] = bench_legacy(pipeline, args.points, args.moves, args.seed)
+        for r, new in zip(results["legacy"], results["pipeline"]):
+            if "skipped" in r:
+                print(f"{r['resolution']:<7}건너뜀: {r['skipped']}")
+                continue
+            per_step = new["seconds"]["render"] / max(1, new["steps"])
+            print(f"{r['resolution']:<7}예전 {r['seconds']:.2f} s ({r['peak_mb']:.0f} MB)  ·  "
+                  f"지금 {per_step:.2f} s  ·  {r['seconds'] / per_step:.1f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print()
+        print(f"결과 저장: {args.json}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
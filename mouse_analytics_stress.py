@@ -0,0 +1,396 @@
+"""mouse_analytics 입력 경로 스트레스 하네스 (헤드리스).
+
+1000~8000 Hz 고폴링 마우스를 흉내 내, 생성 스레드가 리스너 콜백(on_move / on_click /
+on_scroll)을 정해진 빈도와 패턴(직선 · 원 · 미세 떨림 · 클릭 연타)으로 부른다. 리스너
+스레드 대신이므로 콜백이 느리면 그만큼 OS 입력 훅(=커서)이 밀린다. 측정 항목:
+  · 콜백 1회 지연 백분위(p50 / p99 / p99.9 / 최대, µs) — 리스너 스레드를 붙잡는 시간
+  · 실제 호출률(목표 대비)과 밀림(예정보다 LATE_MS 넘게 늦게 부른 호출 수, 최대 밀림 ms)
+  · 유실: 보낸 이벤트 수 대 엔진 집계 스레드가 받은 수
+  · 입력 큐 최대 깊이 · 최대 처리 지연(엔진 ingest_stats)
+  · Tk after 큐 길이(시작 → 최대 → 끝) — 이벤트 수에 따라 늘면 UI 가 밀리는 것
+  · CPU: 프로세스 전체(코어 1개 = 100%)와 생성(=리스너) 스레드 몫
+마지막으로 속도 제한 없이 on_move 를 몰아 불러 콜백 호출 한계와 집계 처리 한계를 잰다.
+
+pynput · tkinter · screeninfo 는 가짜 모듈을 sys.modules 에 끼워 넣고 mouse_analytics 를
+불러오므로 디스플레이 없는 리눅스(CI)에서도 실제 GUI 코드(자기 창 제외 검사 포함)를
+그대로 지난다. 화면 배경 캡처는 끈다.
+
+사용법:
+    python mouse_analytics_stress.py [--rates 1000,2000,4000,8000]
+                                     [--patterns line,circle,jitter,burst]
+                                     [--seconds 3] [--ceiling-events 200000] [--seed 0]
+"""
+
+import sys
+import time
+import heapq
+import shutil
+import argparse
+import tempfile
+import threading
+from types import ModuleType, SimpleNamespace
+
+import numpy as np
+
+SCREEN_W, SCREEN_H = 1920, 1080
+PATTERNS = ("line", "circle", "jitter", "burst")
+DEFAULT_RATES = (1000, 2000, 4000, 8000)
+PACE_SLEEP_S = 0.0005        # 생성 스레드가 다음 호출 시각을 기다릴 때 한 번에 자는 시간
+LATE_MS = 2.0                # 예정보다 이만큼 넘게 늦게 부른 호출을 '밀림'으로 센다(잠 오차보다 크게)
+TK_PUMP_S = 0.002            # 가짜 Tk 메인 루프가 after 콜백을 확인하는 주기
+SETTLE_TIMEOUT_S = 120       # 측정 사이에 저장/렌더 작업이 끝나길 기다리는 최대 시간
+
+
+# --- 가짜 모듈 ---------------------------------------------------------------
+class _Var:
+    def __init__(self, master=None, value=None):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class _Widget:
+    """pack/grid/config 만 받아 두는 위젯. Entry/Combobox 값도 여기 보관한다."""
+
+    def __init__(self, master=None, **kw):
+        self._kw = dict(kw)
+        self._text = ""
+        self._current = 0
+
+    def pack(self, **kw):
+        pass
+
+    grid = pack
+
+    def config(self, **kw):
+        self._kw.update(kw)
+
+    configure = config
+
+    def get(self):
+        return self._text
+
+    def insert(self, index, text):
+        self._text = str(text) + self._text
+
+    def delete(self, first, last=None):
+        self._text = ""
+
+    def current(self, index=None):
+        if index is None:
+            return self._current
+        self._current = index
+
+
+class _Tk(_Widget):
+    """after() 큐만 실제로 도는 가짜 Tk 루트. pump() 가 메인 루프 한 바퀴."""
+
+    def __init__(self):
+        super().__init__()
+        self._after = []             # (예정 시각, 순번, fn, args) 힙
+        self._seq = 0
+        self._state = "normal"
+
+    def after(self, ms, fn=None, *args):
+        self._seq += 1
+        heapq.heappush(self._after, (time.monotonic() + ms / 1000, self._seq, fn, args))
+        return self._seq
+
+    def after_idle(self, fn, *args):
+        return self.after(0, fn, *args)
+
+    def pump(self):
+        """예정 시각이 된 after 콜백을 실행한다 -> 실행한 수."""
+        now, ran = time.monotonic(), 0
+        while self._after and self._after[0][0] <= now:
+            _, _, fn, args = heapq.heappop(self._after)
+            if fn is not None:
+                fn(*args)
+            ran += 1
+        return ran
+
+    def pending(self):
+        return len(self._after)
+
+    def state(self):
+        return self._state
+
+    def withdraw(self):
+        self._state = "withdrawn"
+
+    def deiconify(self):
+        self._state = "normal"
+
+    def iconify(self):
+        self._state = "iconic"
+
+    def winfo_rootx(self):           # 자기 창은 화면 밖 — 생성 좌표와 겹치지 않게
+        return -10000
+
+    winfo_rooty = winfo_rootx
+
+    def winfo_width(self):
+        return 400
+
+    winfo_height = winfo_width
+
+    def winfo_id(self):
+        return 0
+
+    def _noop(self, *args, **kw):
+        pass
+
+    title = resizable = bind = protocol = update = update_idletasks = destroy = mainloop = _noop
+
+
+class _Listener:
+    def __init__(self, *args, **kw):
+        pass
+
+    def start(self):
+        pass
+
+    stop = join = start
+
+
+def _install_stubs(monitors):
+    """pynput / tkinter / screeninfo 가짜 모듈을 sys.modules 에 넣는다(mouse_analytics import 전에)."""
+    def module(name, **attrs):
+        mod = ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+        return mod
+
+    widgets = {name: _Widget for name in ("Label", "Button", "LabelFrame", "Frame",
+                                          "Entry", "Checkbutton", "Scale")}
+    tk = module("tkinter", Tk=_Tk, END="end", BooleanVar=_Var, DoubleVar=_Var,
+                IntVar=_Var, StringVar=_Var, **widgets)
+    tk.ttk = module("tkinter.ttk", Combobox=_Widget)
+    tk.messagebox = module("tkinter.messagebox", showinfo=_Tk._noop, showwarning=_Tk._noop,
+                           showerror=_Tk._noop)
+    tk.filedialog = module("tkinter.filedialog", askdirectory=lambda **kw: "")
+    pynput = module("pynput")
+    pynput.mouse = module("pynput.mouse", Listener=_Listener)
+    pynput.keyboard = module("pynput.keyboard", Listener=_Listener, GlobalHotKeys=_Listener)
+    module("screeninfo", get_monitors=lambda: list(monitors))
+
+
+# --- 입력 패턴 ---------------------------------------------------------------
+_LEFT = SimpleNamespace(name="left")
+KIND_MOVE, KIND_CLICK, KIND_SCROLL = 0, 1, 2
+
+
+def _pattern(name, rate, n, rng):
+    """패턴 -> (종류 배열, x 배열, y 배열). 미리 만들어 두어 생성 비용이 측정에 안 섞이게 한다.
+
+    line   : 2000 px/s 로 화면을 가로지르는 직선(줄마다 아래로)
+    circle : 반지름 300px 원을 초당 한 바퀴
+    jitter : 한 점 주변 ±2px 떨림(코얼레싱이 대부분 버리는 경우)
+    burst  : 직선 이동 중 0.25초마다 클릭 20번(누름+뗌) 연타와 스크롤 한 칸"""
+    t = np.arange(n) / rate
+    kinds = np.zeros(n, dtype=np.int8)
+    if name == "line" or name == "burst":
+        travel = t * 2000
+        row = (travel // SCREEN_W).astype(np.int64)
+        xs = travel % SCREEN_W
+        ys = (row * 40) % SCREEN_H
+    elif name == "circle":
+        xs = SCREEN_W / 2 + 300 * np.cos(2 * np.pi * t)
+        ys = SCREEN_H / 2 + 300 * np.sin(2 * np.pi * t)
+    elif name == "jitter":
+        xs = SCREEN_W / 2 + rng.integers(-2, 3, n)
+        ys = SCREEN_H / 2 + rng.integers(-2, 3, n)
+    else:
+        raise ValueError(f"알 수 없는 패턴: {name}")
+    if name == "burst":
+        phase = np.arange(n) % max(1, int(rate * 0.25))
+        kinds[phase < 20] = KIND_CLICK
+        kinds[phase == 20] = KIND_SCROLL
+    xs = np.clip(xs, 0, SCREEN_W - 1).astype(np.int64)
+    ys = np.clip(ys, 0, SCREEN_H - 1).astype(np.int64)
+    return kinds.tolist(), xs.tolist(), ys.tolist()
+
+
+def _call(app, kind, x, y):
+    """리스너 스레드가 하는 그대로 콜백을 부른다 -> 입력 큐에 들어갈 이벤트 수(클릭은 누름만)."""
+    if kind == KIND_MOVE:
+        app.on_move(x, y)
+    elif kind == KIND_CLICK:
+        app.on_click(x, y, _LEFT, True)
+        app.on_click(x, y, _LEFT, False)
+    else:
+        app.on_scroll(x, y, 0, -1)
+    return 1
+
+
+# --- 측정 --------------------------------------------------------------------
+def _percentiles_us(lat_ns):
+    if len(lat_ns) == 0:
+        return dict(p50=0.0, p99=0.0, p999=0.0, max=0.0)
+    p50, p99, p999 = np.percentile(lat_ns, (50, 99, 99.9)) / 1e3
+    return dict(p50=p50, p99=p99, p999=p999, max=float(lat_ns.max()) / 1e3)
+
+
+def _settle(app):
+    """렌더/저장 작업이 모두 끝날 때까지 가짜 Tk 루프를 돌린다(측정끼리 섞이지 않게)."""
+    deadline = time.monotonic() + SETTLE_TIMEOUT_S
+    while time.monotonic() < deadline:
+        app.pump()
+        running, waiting, renders = app.engine.status()
+        if running is None and not waiting and not renders:
+            return
+        time.sleep(TK_PUMP_S)
+
+
+def run_paced(app, pattern, rate, seconds, rng):
+    """rate Hz 로 seconds 동안 콜백을 부르고 지표 dict 를 돌려준다.
+
+    생성 스레드는 '지금까지 불렀어야 할 호출 수'만큼 몰아서 부르고 잠깐 잔다(OS 입력
+    훅이 쌓인 이벤트를 내놓는 것과 같다). 메인 스레드는 그동안 가짜 Tk 루프를 돌린다."""
+    n = int(rate * seconds)
+    kinds, xs, ys = _pattern(pattern, rate, n, rng)
+    lat = np.zeros(n, dtype=np.int64)
+    out = {}
+
+    def generate():
+        period_ns = 1e9 / rate
+        late_ns = LATE_MS * 1e6
+        late = sent = 0
+        max_lag_ns = 0
+        clock = time.perf_counter_ns
+        cpu0 = time.thread_time()
+        t0 = clock()
+        i = 0
+        while i < n:
+            now = clock()
+            due = min(n, int((now - t0) / period_ns) + 1)
+            if due <= i:
+                time.sleep(PACE_SLEEP_S)
+                continue
+            while i < due:
+                start = clock()
+                lag = start - (t0 + i * period_ns)
+                if lag > late_ns:
+                    late += 1
+                    max_lag_ns = max(max_lag_ns, lag)
+                sent += _call(app, kinds[i], xs[i], ys[i])
+                lat[i] = clock() - start
+                i += 1
+        out.update(sent=sent, late=late, max_lag_ms=max_lag_ns / 1e6,
+                   wall=(clock() - t0) / 1e9, gen_cpu=time.thread_time() - cpu0)
+
+    app.start_recording()
+    tk_start = app.pending()
+    tk_max = tk_start
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    gen = threading.Thread(target=generate, name="stress-listener")
+    gen.start()
+    while gen.is_alive():
+        app.pump()
+        tk_max = max(tk_max, app.pending())
+        time.sleep(TK_PUMP_S)
+    gen.join()
+    app.engine.flush(timeout=SETTLE_TIMEOUT_S)
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    st = app.engine.ingest_stats()
+    tk_end = app.pending()
+    app.stop_recording()
+    _settle(app)
+    return dict(
+        pattern=pattern, rate=rate, sent=out["sent"],
+        received=st["events"] - 1,             # 집계 스레드가 꺼낸 수(flush 표시 하나 제외)
+        achieved_hz=out["sent"] / out["wall"], late=out["late"], max_lag_ms=out["max_lag_ms"],
+        latency_us=_percentiles_us(lat), max_depth=st["max_depth"],
+        max_latency_ms=st["max_latency_ms"], tk_queue=(tk_start, tk_max, tk_end),
+        cpu_pct=100 * cpu / wall, listener_cpu_pct=100 * out["gen_cpu"] / out["wall"])
+
+
+def run_ceiling(app, n):
+    """속도 제한 없이 on_move 를 n 번 -> (콜백 호출 한계 calls/s, 집계 처리 한계 events/s)."""
+    rng = np.random.default_rng(0)
+    xs = rng.integers(0, SCREEN_W, n).tolist()
+    ys = rng.integers(0, SCREEN_H, n).tolist()
+    app.start_recording()
+    t0 = time.perf_counter()
+    for x, y in zip(xs, ys):
+        app.on_move(x, y)
+    t_call = time.perf_counter() - t0
+    app.engine.flush(timeout=SETTLE_TIMEOUT_S)
+    t_drain = time.perf_counter() - t0
+    st = app.engine.ingest_stats()
+    app.stop_recording()
+    _settle(app)
+    return n / t_call, n / t_drain, st["max_depth"]
+
+
+def make_app(folder):
+    """가짜 모듈 위에 실제 MouseAnalytics 창을 만든다(배경 캡처 끔, 저장 폴더 = folder).
+
+    앱 임시 폴더(error.log · 작업 파일, 종료 시 통째로 지움)도 folder 안에 만들도록
+    tempfile 기본 폴더를 바꿔 둔다 — 실제 앱의 <tmp>/mouse_analytics_app 을 건드리지 않게."""
+    _install_stubs([SimpleNamespace(x=0, y=0, width=SCREEN_W, height=SCREEN_H,
+                                    name="stress", is_primary=True)])
+    tempfile.tempdir = folder
+    import mouse_analytics
+    app = mouse_analytics.MouseAnalytics()
+    app.folder_entry.delete(0)
+    app.folder_entry.insert(0, folder)
+    app.bg_include_var.set(False)
+    app.autosave_var.set(False)
+    app.minimize_var.set(False)
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description="mouse_analytics 입력 경로 스트레스 하네스")
+    ap.add_argument("--rates", default=",".join(map(str, DEFAULT_RATES)),
+                    help="콜백 호출 빈도(Hz), 쉼표 구분")
+    ap.add_argument("--patterns", default=",".join(PATTERNS), help="입력 패턴, 쉼표 구분")
+    ap.add_argument("--seconds", type=float, default=3.0, help="빈도·패턴마다 측정 시간(초)")
+    ap.add_argument("--ceiling-events", type=int, default=200_000,
+                    help="처리 한계 측정에 몰아 넣을 이동 이벤트 수(0 = 건너뜀)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    rates = [int(r) for r in args.rates.split(",") if r]
+    patterns = [p for p in args.patterns.split(",") if p]
+    for p in patterns:
+        if p not in PATTERNS:
+            ap.error(f"알 수 없는 패턴: {p} (가능: {', '.join(PATTERNS)})")
+
+    folder = tempfile.mkdtemp(prefix="mouse_analytics_stress_")
+    app = make_app(folder)
+    rng = np.random.default_rng(args.seed)
+    try:
+        print(f"콜백 스트레스 ({args.seconds:g}초씩, 화면 {SCREEN_W}x{SCREEN_H})")
+        print(f"{'패턴':<8}{'목표Hz':>7}{'실제Hz':>8}{'밀림':>7}{'밀림ms':>8}"
+              f"{'p50µs':>8}{'p99µs':>8}{'p99.9µs':>9}{'최대µs':>9}{'유실':>6}"
+              f"{'큐최대':>8}{'지연ms':>8}{'Tk큐':>12}{'CPU%':>7}{'리스너%':>8}")
+        for pattern in patterns:
+            for rate in rates:
+                r = run_paced(app, pattern, rate, args.seconds, rng)
+                lat = r["latency_us"]
+                print(f"{pattern:<8}{rate:>7}{r['achieved_hz']:>8.0f}{r['late']:>7}"
+                      f"{r['max_lag_ms']:>8.1f}{lat['p50']:>8.1f}{lat['p99']:>8.1f}"
+                      f"{lat['p999']:>9.1f}{lat['max']:>9.0f}"
+                      f"{r['sent'] - r['received']:>6}{r['max_depth']:>8}"
+                      f"{r['max_latency_ms']:>8.1f}{'%d→%d→%d' % r['tk_queue']:>12}"
+                      f"{r['cpu_pct']:>7.0f}{r['listener_cpu_pct']:>8.0f}")
+        if args.ceiling_events > 0:
+            calls, drain, depth = run_ceiling(app, args.ceiling_events)
+            print()
+            print(f"처리 한계 (on_move {args.ceiling_events:,}번 연속)")
+            print(f"  콜백 호출  {calls:>12,.0f} calls/s")
+            print(f"  집계 처리  {drain:>12,.0f} events/s   (입력 큐 최대 {depth:,})")
+    finally:
+        app.on_closing()
+        shutil.rmtree(folder, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
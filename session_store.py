@@ -0,0 +1,274 @@
+"""여러 세션을 한곳에 모으는 SQLite 저장소 + 조회 CLI.
+
+세션마다 따로 남는 MouseAnalytics_YYYYMMDD_HHMMSS.xlsx 를 하나하나 열지 않고도
+"몇 주 동안 모니터별 시간당 클릭 수" 같은 질문에 답할 수 있게, 녹화하면서 이벤트를
+로컬 SQLite 파일 하나에 함께 쌓는다(앱의 '세션 DB 기록' 옵션).
+
+  · sessions : 세션 1행(시작/종료 ns, 통합문서·저널 경로, 모니터 배치, DPI)
+  · steps    : 단계 1행(세션, 단계 번호, 시작/종료, 버튼별 클릭·스크롤·키·이동 mm)
+  · events   : 이벤트 1행(EVENT_DTYPE 과 같은 열 + 세션/단계). 시각·단계·종류 인덱스
+
+WAL 모드로 열어 기록 중에도 다른 프로세스(CLI)가 읽을 수 있다. 이벤트는 집계 스레드가
+묶음째 넘기면 DB_BATCH_ROWS 개 또는 DB_FLUSH_S 초마다 한 트랜잭션으로 넣는다.
+조회(aggregate / heatmap_grid)는 SQL 로 묶어서 결과만 가져오므로 세션 전체를 파이썬으로
+읽어 들이지 않는다. GUI/pynput 의존성이 없다.
+
+사용법:
+    python session_store.py [--db PATH] sessions
+    python session_store.py [--db PATH] aggregate [--by hour] [--since 2026-10-01] [--until ...]
+    python session_store.py [--db PATH] heatmap --width 1920 --height 1080 [--monitor 0]
+                                                [--scale 2] [--out grid.npy]
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+
+import numpy as np
+
+from event_store import EVT_CLICK, EVT_MOVE, EVT_SCROLL
+
+DB_FILE_NAME = "MouseAnalytics.sqlite3"
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser("~"), "Desktop", "MouseAnalytics",
+                               DB_FILE_NAME)
+DB_BATCH_ROWS = 8192         # 이 이상 쌓이면 바로 한 트랜잭션으로 기록
+DB_FLUSH_S = 1.0             # 덜 쌓였어도 이 시간이 지나면 기록
+
+# aggregate(by=...) 묶음 단위 -> SQLite strftime 형식(로컬 시각)
+BUCKET_FORMATS = {"minute": "%Y-%m-%d %H:%M", "hour": "%Y-%m-%d %H:00",
+                  "day": "%Y-%m-%d", "month": "%Y-%m"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_ns INTEGER NOT NULL,
+    ended_ns INTEGER,
+    workbook TEXT,
+    journal TEXT,
+    monitor_index INTEGER,
+    monitor_x INTEGER, monitor_y INTEGER, monitor_w INTEGER, monitor_h INTEGER,
+    dpi REAL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    no INTEGER NOT NULL,
+    started_ns INTEGER, ended_ns INTEGER,
+    left_clicks INTEGER, right_clicks INTEGER, middle_clicks INTEGER,
+    scroll INTEGER, keys INTEGER, distance_mm REAL,
+    PRIMARY KEY (session_id, no)
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    wall_ns INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    button INTEGER NOT NULL,
+    monitor INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    dist REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (wall_ns);
+CREATE INDEX IF NOT EXISTS idx_events_step ON events (session_id, step);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events (type, wall_ns);
+"""
+
+
+def _ns(text):
+    """'YYYY-MM-DD[ HH:MM[:SS]]'(로컬 시각) -> epoch ns. None 은 그대로."""
+    if text is None:
+        return None
+    return int(datetime.datetime.fromisoformat(text).timestamp() * 1e9)
+
+
+class SessionStore:
+    """세션/단계/이벤트를 SQLite 에 쌓고 조회한다.
+
+    메인 스레드(세션·단계)와 집계 스레드(이벤트)가 함께 쓰므로 연결 하나를 내부 락으로
+    보호한다. 이벤트는 add_events 로 모았다가 묶어서 기록한다(flush 로 강제)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pending = []              # [(session_id, step, EVENT_DTYPE 배열), ...]
+        self._pending_rows = 0
+        self._last_flush = time.monotonic()
+
+    # --- 기록 ---------------------------------------------------------------
+    def begin_session(self, started_ns, monitor, monitor_index, dpi,
+                      workbook=None, journal=None):
+        """세션 행을 만들고 id 를 돌려준다. monitor 는 x/y/width/height 속성을 가진 객체."""
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO sessions (started_ns, workbook, journal, monitor_index,"
+                " monitor_x, monitor_y, monitor_w, monitor_h, dpi)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_ns, workbook, journal, monitor_index,
+                 monitor.x, monitor.y, monitor.width, monitor.height, dpi))
+            return cur.lastrowid
+
+    def end_session(self, session_id, ended_ns):
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute("UPDATE sessions SET ended_ns = ? WHERE id = ?",
+                               (ended_ns, session_id))
+
+    def add_step(self, session_id, no, started_ns, ended_ns, left, right, middle,
+                 scroll, keys, distance_mm):
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, no, started_ns, ended_ns, left, right, middle,
+                 scroll, keys, distance_mm))
+
+    def add_events(self, session_id, step, records):
+        """EVENT_DTYPE 배열을 기록 대기열에 넣는다. 충분히 쌓였거나 오래됐으면 기록."""
+        if len(records) == 0:
+            return
+        with self._lock:
+            self._pending.append((session_id, step, records))
+            self._pending_rows += len(records)
+            if (self._pending_rows >= DB_BATCH_ROWS
+                    or time.monotonic() - self._last_flush >= DB_FLUSH_S):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        pending, self._pending, self._pending_rows = self._pending, [], 0
+        self._conn.execute("BEGIN")
+        try:
+            for session_id, step, r in pending:
+                dist = [None if d != d else d for d in r["dist"].astype(np.float64).tolist()]
+                n = len(r)
+                self._conn.executemany(
+                    "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    zip([session_id] * n, [step] * n, r["wall_ns"].tolist(),
+                        r["type"].tolist(), r["button"].tolist(), r["monitor"].tolist(),
+                        r["x"].tolist(), r["y"].tolist(), dist))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        with self._lock:
+            try:
+                self._flush_locked()
+            finally:
+                self._conn.close()
+
+    # --- 조회 ---------------------------------------------------------------
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(start_ns=None, end_ns=None, monitor=None, session_id=None, etype=None):
+        clauses, params = [], []
+        for cond, value in (("wall_ns >= ?", start_ns), ("wall_ns < ?", end_ns),
+                            ("monitor = ?", monitor), ("session_id = ?", session_id),
+                            ("type = ?", etype)):
+            if value is not None:
+                clauses.append(cond)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def sessions(self):
+        """세션 목록(dict). 이벤트 수는 단계 인덱스로 센다."""
+        rows = self._query(
+            "SELECT s.id, s.started_ns, s.ended_ns, s.workbook, s.monitor_index, s.dpi,"
+            " (SELECT COUNT(*) FROM steps WHERE session_id = s.id),"
+            " (SELECT COUNT(*) FROM events WHERE session_id = s.id)"
+            " FROM sessions s ORDER BY s.started_ns")
+        keys = ("id", "started_ns", "ended_ns", "workbook", "monitor_index", "dpi",
+                "steps", "events")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def aggregate(self, by="hour", start_ns=None, end_ns=None, monitor=None,
+                  session_id=None):
+        """(구간, 모니터, 클릭, 이동 샘플, 스크롤, 이동 px) 목록. 구간은 로컬 시각 문자열."""
+        fmt = BUCKET_FORMATS[by]
+        where, params = self._where(start_ns, end_ns, monitor, session_id)
+        return self._query(
+            "SELECT strftime(?, wall_ns / 1000000000, 'unixepoch', 'localtime') AS bucket,"
+            f" monitor, SUM(type = {EVT_CLICK}), SUM(type = {EVT_MOVE}),"
+            f" SUM(type = {EVT_SCROLL}), ROUND(TOTAL(dist), 1)"
+            f" FROM events{where} GROUP BY bucket, monitor ORDER BY bucket, monitor",
+            [fmt] + params)
+
+    def heatmap_grid(self, w, h, scale=1, start_ns=None, end_ns=None, monitor=None,
+                     session_id=None):
+        """클릭 위치를 (ceil(h/scale), ceil(w/scale)) 격자로 센다(SQL 에서 묶음)."""
+        grid = np.zeros((-(-h // scale), -(-w // scale)), dtype=np.float32)
+        where, params = self._where(start_ns, end_ns, monitor, session_id, EVT_CLICK)
+        rows = self._query(
+            f"SELECT x / ?, y / ?, COUNT(*) FROM events{where}"
+            " AND x >= 0 AND y >= 0 AND x < ? AND y < ? GROUP BY 1, 2",
+            [scale, scale] + params + [w, h])
+        if rows:
+            gx, gy, n = np.asarray(rows, dtype=np.int64).T
+            grid[gy, gx] = n
+        return grid
+
+
+def main():
+    ap = argparse.ArgumentParser(description="마우스 분석 세션 DB 조회")
+    ap.add_argument("--db", default=DEFAULT_DB_PATH)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("sessions", help="기록된 세션 목록")
+    for name in ("aggregate", "heatmap"):
+        p = sub.add_parser(name)
+        p.add_argument("--since", help="시작 시각(로컬, 예: 2026-10-01 09:00)")
+        p.add_argument("--until", help="끝 시각(로컬, 포함 안 함)")
+        p.add_argument("--monitor", type=int)
+        p.add_argument("--session", type=int)
+    sub.choices["aggregate"].add_argument("--by", choices=list(BUCKET_FORMATS), default="hour")
+    hp = sub.choices["heatmap"]
+    hp.add_argument("--width", type=int, required=True)
+    hp.add_argument("--height", type=int, required=True)
+    hp.add_argument("--scale", type=int, default=1)
+    hp.add_argument("--out", default="heatmap_grid.npy")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.db):
+        ap.error(f"DB 파일이 없음: {args.db}")
+    store = SessionStore(args.db)
+    try:
+        if args.cmd == "sessions":
+            print(f"{'id':>4}  {'시작':<19}  {'종료':<19}  {'단계':>4}  {'이벤트':>10}  통합문서")
+            for s in store.sessions():
+                fmt = lambda ns: (datetime.datetime.fromtimestamp(ns / 1e9)
+                                  .strftime("%Y-%m-%d %H:%M:%S") if ns else "-")
+                print(f"{s['id']:>4}  {fmt(s['started_ns']):<19}  {fmt(s['ended_ns']):<19}"
+                      f"  {s['steps']:>4}  {s['events']:>10,}  {s['workbook'] or ''}")
+        elif args.cmd == "aggregate":
+            print(f"{'구간':<16}  {'모니터':>4}  {'클릭':>8}  {'이동':>8}  {'스크롤':>8}  {'이동(px)':>12}")
+            for bucket, mon, clicks, moves, scrolls, px in store.aggregate(
+                    args.by, _ns(args.since), _ns(args.until), args.monitor, args.session):
+                print(f"{bucket:<16}  {mon:>4}  {clicks:>8}  {moves:>8}  {scrolls:>8}  {px:>12,.1f}")
+        else:
+            grid = store.heatmap_grid(args.width, args.height, args.scale, _ns(args.since),
+                                      _ns(args.until), args.monitor, args.session)
+            np.save(args.out, grid)
+            print(f"클릭 {int(grid.sum()):,}개 -> {args.out} ({grid.shape[1]}x{grid.shape[0]})")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,35 @@
+"""event_store 회귀 테스트(pytest)."""
+
+import numpy as np
+
+from event_store import (EVENT_DTYPE, EVT_CLICK, EVT_MOVE, MINUTE_ACTIVITY_MAX,
+                         minute_activity)
+
+_MIN = 60 * 10 ** 9
+
+
+def _events(minutes, types):
+    ev = np.zeros(len(minutes), dtype=EVENT_DTYPE)
+    ev["wall_ns"] = np.asarray(minutes, dtype=np.int64) * _MIN
+    ev["type"] = types
+    ev["dist"] = np.nan
+    return ev
+
+
+def test_minute_activity_clock_stepped_back():
+    """벽시계가 뒤로 간 세션(NTP 조정)도 최소~최대 분으로 센다."""
+    ev = _events([200, 100, 150], [EVT_CLICK, EVT_CLICK, EVT_MOVE])
+    m0, clicks, scrolls, dist = minute_activity(ev, chunk=2)
+    assert m0 == 100
+    assert len(clicks) == 101
+    assert clicks[0] == 1 and clicks[100] == 1 and clicks.sum() == 2
+    assert scrolls.sum() == 0 and len(dist) == 101
+
+
+def test_minute_activity_forward_jump_is_capped():
+    """시계가 앞으로 크게 튀어도 배열은 MINUTE_ACTIVITY_MAX 분, 넘친 이벤트는 마지막 분에."""
+    ev = _events([0, 1, 10 ** 8], [EVT_CLICK, EVT_CLICK, EVT_CLICK])
+    m0, clicks, _, _ = minute_activity(ev)
+    assert m0 == 0
+    assert len(clicks) == MINUTE_ACTIVITY_MAX
+    assert clicks[0] == 1 and clicks[1] == 1 and clicks[-1] == 1